@@ -0,0 +1,165 @@
+# scripts/answer_cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from corpus_version import get_corpus_version
+from scoring import CandidateMatrix, as_matrix
+
+# ---------- CONFIG ----------
+CACHE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../cache/answer_cache.sqlite"))
+SIMILARITY_THRESHOLD = 0.95   # cosine similarity between query embeddings to count as "the same question"
+TTL_SEC = 24 * 3600
+MAX_ENTRIES = 1000            # least-recently-used answers are evicted past this
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _storable_doc(doc: Dict) -> Dict:
+    # Stored vectors would dominate the record and nothing downstream of the answer needs them
+    return {key: value for key, value in doc.items() if key != "embedding"}
+
+
+class AnswerCache:
+    """
+    Semantic cache of RAG answers in front of the LLM.
+
+    A lookup matches when a stored query for the same index and corpus version has cosine
+    similarity >= `threshold` with the new query and is younger than `ttl_sec`. Entries from
+    an older corpus version are never served (the version is bumped on every ingest), and
+    are dropped on the next write along with expired and least-recently-used entries.
+    """
+
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        threshold: float = SIMILARITY_THRESHOLD,
+        ttl_sec: float = TTL_SEC,
+        max_entries: int = MAX_ENTRIES
+    ):
+        self.threshold = threshold
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._matrices: Dict[tuple, tuple] = {}   # (index, version) -> (ids, created_at, CandidateMatrix)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "id INTEGER PRIMARY KEY, index_name TEXT NOT NULL, corpus_version INTEGER NOT NULL, "
+            "query TEXT NOT NULL, embedding BLOB NOT NULL, answer TEXT NOT NULL, docs TEXT NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS answers_scope ON answers (index_name, corpus_version)")
+        self.conn.commit()
+
+    def _scope_matrix(self, index_name: str, version: int):
+        # Query vectors of one scope, loaded once and kept until the next write
+        key = (index_name, version)
+        if key not in self._matrices:
+            rows = self.conn.execute(
+                "SELECT id, created_at, embedding FROM answers WHERE index_name = ? AND corpus_version = ?",
+                (index_name, version),
+            ).fetchall()
+            if rows:
+                ids = np.array([row[0] for row in rows])
+                created_at = np.array([row[1] for row in rows])
+                vectors = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+                self._matrices[key] = (ids, created_at, CandidateMatrix(vectors))
+            else:
+                self._matrices[key] = None
+        return self._matrices[key]
+
+    def lookup(self, query_embedding: List[float], index_name: str) -> Optional[Dict]:
+        """Best cached answer for a semantically equivalent query, or None."""
+        version = get_corpus_version()
+        now = time.time()
+        with self._lock:
+            scope = self._scope_matrix(index_name, version)
+            match = None
+            if scope is not None:
+                ids, created_at, matrix = scope
+                sims = matrix.cosine(query_embedding)[0]
+                sims[now - created_at > self.ttl_sec] = -np.inf
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    match = (int(ids[best]), float(sims[best]))
+
+            if match is None:
+                self.misses += 1
+                return None
+
+            entry_id, similarity = match
+            query, answer, docs = self.conn.execute(
+                "SELECT query, answer, docs FROM answers WHERE id = ?", (entry_id,)
+            ).fetchone()
+            self.conn.execute("UPDATE answers SET last_access = ? WHERE id = ?", (now, entry_id))
+            self.conn.commit()
+
+        self.hits += 1
+        return {"query": query, "answer": answer, "docs": json.loads(docs), "similarity": similarity}
+
+    def store(self, query_text: str, query_embedding: List[float], index_name: str, answer: str, docs: List[Dict]) -> None:
+        version = get_corpus_version()
+        now = time.time()
+        vector = as_matrix(query_embedding)[0]
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO answers (index_name, corpus_version, query, embedding, answer, docs, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (index_name, version, query_text, vector.tobytes(), answer,
+                 json.dumps([_storable_doc(doc) for doc in docs]), now, now),
+            )
+            self._evict(version, now)
+            self.conn.commit()
+            self._matrices.clear()
+
+    def _evict(self, version: int, now: float) -> None:
+        # Stale corpus versions and expired entries first, then LRU down to max_entries
+        removed = self.conn.execute(
+            "DELETE FROM answers WHERE corpus_version != ? OR created_at < ?", (version, now - self.ttl_sec)
+        ).rowcount
+        overflow = self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            removed += self.conn.execute(
+                "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY last_access ASC LIMIT ?)", (overflow,)
+            ).rowcount
+        self.evictions += removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM answers")
+            self.conn.commit()
+            self._matrices.clear()
+
+    def stats(self) -> Dict[str, float]:
+        entries = self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "corpus_version": get_corpus_version(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+def get_answer_cache() -> AnswerCache:
+    """Process-wide answer cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnswerCache()
+    return _cache
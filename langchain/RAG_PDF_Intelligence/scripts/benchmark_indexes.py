@@ -0,0 +1,350 @@
+# scripts/benchmark_indexes.py
+import csv
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from opensearchpy import helpers
+
+from opensearch_connector import client
+from scoring import CandidateMatrix
+from indexes import (
+    FLAT_EF_SEARCH as DEPLOYED_FLAT_EF_SEARCH, HNSW_EF_SEARCH as DEPLOYED_HNSW_EF_SEARCH, HNSW_M as DEPLOYED_HNSW_M,
+    VECTOR_ENCODING, create_flat_index, create_hnsw_index,
+)
+from faiss_backend import INDEX_TYPE, NLIST, NPROBE, RESCORE_FACTOR, build_faiss_index, get_faiss_retriever
+from retriever_pipeline import build_knn_query
+
+# ---------- CONFIG ----------
+SOURCE_INDEX = "pdf_flat_index"      # corpus is read back from here
+RESULTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../outputs/benchmarks"))
+LATEST_RESULTS = os.path.join(RESULTS_DIR, "benchmark_latest.json")
+K = 5                                # recall@K
+N_QUERIES = 200
+QUERY_NOISE = 0.05                   # synthetic queries = corpus vectors + Gaussian noise
+CONCURRENCY = 8                      # threads for the QPS measurement
+SEED = 42
+
+# Each sweep always includes the deployed setting (indexes.py / faiss_backend.py), so every
+# index has one row flagged "deployed": that row is what metrics_analysis routes on
+FLAT_EF_SEARCH = sorted({512, DEPLOYED_FLAT_EF_SEARCH})
+HNSW_M = sorted({8, 16, 32, DEPLOYED_HNSW_M})
+HNSW_EF_SEARCH = sorted({16, 64, 128, 256, 512, DEPLOYED_HNSW_EF_SEARCH})
+IVF_NLIST = sorted({16, 64, 100, NLIST})
+IVF_NPROBE = sorted({1, 4, 10, 32, NPROBE})
+QUANTIZED_TYPES = ["flat", "sqfp16", "sq8", "ivfsq8"]   # 'flat' is the fp32 size/recall baseline
+RESCORE_FACTORS = [1, 2, 4]                             # 1 = no fp32 rescoring
+
+BENCH_PREFIX = "bench_"
+
+# How each backend's latency is measured; OpenSearch numbers include the REST round trip
+TRANSPORTS = {
+    "http": "client-side timing of an OpenSearch _search request (serialization + network + k-NN)",
+    "in_process": "timing of a FAISS search in this process, no network hop",
+}
+
+
+def _index_key(index_name: str, variant: str, deployed_variant: str) -> str:
+    """
+    Result key for a row: the live index name only for the variant that index is deployed
+    with; other variants get their own key (e.g. 'pdf_hnsw_index:fp16'), so their numbers are
+    reported but never stand in for the live index when metrics_analysis routes.
+    """
+    return index_name if variant == deployed_variant else f"{index_name}:{variant}"
+
+
+# ---------- CORPUS / QUERIES ----------
+def load_corpus(index_name: str = SOURCE_INDEX) -> List[Dict]:
+    """Scroll every document (id, text, metadata, embedding) out of an OpenSearch index."""
+    corpus = []
+    for hit in helpers.scan(client, index=index_name, query={"query": {"match_all": {}}}):
+        source = hit["_source"]
+        corpus.append({
+            "id": hit["_id"],
+            "content": source["text"],
+            "embedding": source["embedding"],
+            "metadata": {k: v for k, v in source.items() if k not in ("text", "embedding")},
+        })
+    return corpus
+
+
+def make_query_set(corpus_vectors: np.ndarray, n: int = N_QUERIES, noise: float = QUERY_NOISE, seed: int = SEED) -> np.ndarray:
+    """Perturbed copies of random corpus vectors (a stand-in when no real query log exists)."""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(corpus_vectors), size=n)
+    queries = corpus_vectors[picks] + noise * rng.normal(size=(n, corpus_vectors.shape[1]))
+    return queries.astype(np.float32)
+
+
+def load_query_set(path: str) -> np.ndarray:
+    """Queries from a .npy matrix or a JSON list of vectors."""
+    if path.endswith(".npy"):
+        return np.load(path).astype(np.float32)
+    with open(path) as f:
+        return np.asarray(json.load(f), dtype=np.float32)
+
+
+def exact_neighbours(queries: np.ndarray, corpus_vectors: np.ndarray, k: int = K) -> np.ndarray:
+    """Brute-force ground truth: positions of the true top-k cosine neighbours per query."""
+    idx, _ = CandidateMatrix(corpus_vectors).top_k(queries, k, "cosine")
+    return idx
+
+
+# ---------- MEASUREMENT ----------
+def _percentile_ms(latencies: List[float], q: float) -> float:
+    return round(float(np.percentile(latencies, q)) * 1000, 3)
+
+
+def measure(search_fn: Callable[[np.ndarray], List[int]], queries: np.ndarray, truth: np.ndarray, k: int = K) -> Dict:
+    """
+    recall@k and latency percentiles from a sequential pass, then QPS with CONCURRENCY threads.
+    `search_fn(query)` returns corpus positions of the retrieved neighbours.
+    """
+    latencies, hits = [], 0
+    for query, true_ids in zip(queries, truth):
+        start_time = time.perf_counter()
+        found = search_fn(query)
+        latencies.append(time.perf_counter() - start_time)
+        hits += len(set(found[:k]) & set(true_ids[:k].tolist()))
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        list(pool.map(search_fn, queries))
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        f"recall_at_{k}": round(hits / (len(queries) * k), 4),
+        "p50_ms": _percentile_ms(latencies, 50),
+        "p95_ms": _percentile_ms(latencies, 95),
+        "p99_ms": _percentile_ms(latencies, 99),
+        "qps": round(len(queries) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def _opensearch_index_bytes(index_name: str) -> int:
+    """Native k-NN graph memory if the plugin reports it, else primary store size."""
+    try:
+        stats = client.transport.perform_request("GET", "/_plugins/_knn/stats")
+        graph_kb = sum(
+            node.get("indices_in_cache", {}).get(index_name, {}).get("graph_memory_usage", 0)
+            for node in stats.get("nodes", {}).values()
+        )
+        if graph_kb:
+            return int(graph_kb * 1024)
+    except Exception:
+        pass
+    return client.indices.stats(index=index_name)["_all"]["primaries"]["store"]["size_in_bytes"]
+
+
+# ---------- BACKENDS ----------
+def _load_opensearch_index(index_name: str, corpus: List[Dict]) -> float:
+    """Bulk-load the corpus (same ids) into a fresh index; returns build seconds."""
+    start_time = time.perf_counter()
+    helpers.bulk(client, (
+        {"_index": index_name, "_id": doc["id"], "_source": {"text": doc["content"], "embedding": doc["embedding"]}}
+        for doc in corpus
+    ))
+    client.indices.refresh(index=index_name)
+    client.indices.forcemerge(index=index_name, max_num_segments=1)
+    try:
+        client.transport.perform_request("GET", f"/_plugins/_knn/warmup/{index_name}")
+    except Exception:
+        pass  # warmup is best-effort; older plugins / engines don't support it
+    return time.perf_counter() - start_time
+
+
+def _opensearch_search_fn(index_name: str, positions: Dict[str, int]):
+    def search(query: np.ndarray) -> List[int]:
+        body = build_knn_query(query.tolist(), K)
+        body["_source"] = False
+        hits = client.search(index=index_name, body=body)["hits"]["hits"]
+        return [positions[hit["_id"]] for hit in hits if hit["_id"] in positions]
+    return search
+
+
+def bench_opensearch(kind: str, corpus: List[Dict], queries: np.ndarray, truth: np.ndarray) -> List[Dict]:
+    """
+    Sweep m (one rebuilt index each) x ef_search (a dynamic setting) for flat/HNSW.
+    'hnsw_fp16' is the same sweep on the faiss-engine HNSW with the sq fp16 encoder. Rows for
+    the encoding pdf_hnsw_index is not deployed with are keyed 'pdf_hnsw_index:<encoding>'.
+    """
+    positions = {doc["id"]: i for i, doc in enumerate(corpus)}
+    rows = []
+    builds = [(None, FLAT_EF_SEARCH)] if kind == "flat" else [(m, HNSW_EF_SEARCH) for m in HNSW_M]
+
+    for m, ef_values in builds:
+        index_name = f"{BENCH_PREFIX}{kind}" + (f"_m{m}" if m else "")
+        if client.indices.exists(index=index_name):
+            client.indices.delete(index=index_name)
+        if kind == "flat":
+            create_flat_index(index_name)
+        else:
+            create_hnsw_index(index_name, m=m, encoding="fp16" if kind == "hnsw_fp16" else "fp32")
+
+        try:
+            build_sec = _load_opensearch_index(index_name, corpus)
+            index_bytes = _opensearch_index_bytes(index_name)
+            for ef in ef_values:
+                client.indices.put_settings(index=index_name, body={"index": {"knn.algo_param.ef_search": ef}})
+                params = {"m": m, "ef_search": ef} if m else {"ef_search": ef}
+                if kind == "hnsw_fp16":
+                    params["encoder"] = "sq_fp16"
+                if kind == "flat":
+                    key = "pdf_flat_index"
+                    deployed = ef == DEPLOYED_FLAT_EF_SEARCH
+                else:
+                    key = _index_key("pdf_hnsw_index", "fp16" if kind == "hnsw_fp16" else "fp32", VECTOR_ENCODING)
+                    deployed = key == "pdf_hnsw_index" and m == DEPLOYED_HNSW_M and ef == DEPLOYED_HNSW_EF_SEARCH
+                rows.append({
+                    "backend": kind,
+                    "index": key,
+                    "params": params,
+                    "deployed": deployed,
+                    "transport": "http",
+                    **measure(_opensearch_search_fn(index_name, positions), queries, truth),
+                    "build_time_sec": round(build_sec, 4),
+                    "index_bytes": index_bytes,
+                })
+                print(f"   {kind} {rows[-1]['params']}: recall@{K}={rows[-1][f'recall_at_{K}']} p95={rows[-1]['p95_ms']}ms")
+        finally:
+            client.indices.delete(index=index_name)
+    return rows
+
+
+def bench_ivf(corpus: List[Dict], queries: np.ndarray, truth: np.ndarray) -> List[Dict]:
+    """Sweep nlist (one trained FAISS index each) x nprobe (per-query)."""
+    rows = []
+    store_dir = tempfile.mkdtemp(prefix="faiss_bench_")
+    try:
+        for nlist in IVF_NLIST:
+            name = f"{BENCH_PREFIX}ivf_{nlist}"
+            build = build_faiss_index(corpus, name=name, index_type="ivf", nlist=nlist, store_dir=store_dir)
+            retriever = get_faiss_retriever(name, store_dir)
+            for nprobe in IVF_NPROBE:
+                def search(query, nprobe=nprobe):
+                    _, ids = retriever.search([query], K, nprobe)
+                    return [int(i) for i in ids[0] if i >= 0]
+
+                key = _index_key("pdf_ivf_index", "ivf", INDEX_TYPE)
+                rows.append({
+                    "backend": "ivf",
+                    "index": key,
+                    "params": {"nlist": nlist, "nprobe": nprobe, "factory": build["factory"]},
+                    "deployed": key == "pdf_ivf_index" and nlist == NLIST and nprobe == NPROBE,
+                    "transport": "in_process",
+                    **measure(search, queries, truth),
+                    "build_time_sec": build["build_time_sec"],
+                    "index_bytes": build["index_bytes"],
+                })
+                print(f"   ivf {rows[-1]['params']}: recall@{K}={rows[-1][f'recall_at_{K}']} p95={rows[-1]['p95_ms']}ms")
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+    return rows
+
+
+def bench_quantized(corpus: List[Dict], queries: np.ndarray, truth: np.ndarray) -> List[Dict]:
+    """
+    Size vs recall of compressed FAISS stores: each QUANTIZED_TYPES index (calibrated on the
+    corpus) x RESCORE_FACTORS. Rows are keyed 'pdf_ivf_index:<type>' unless that type is the
+    one pdf_ivf_index is deployed with (faiss_backend.INDEX_TYPE).
+    """
+    rows = []
+    store_dir = tempfile.mkdtemp(prefix="faiss_quant_bench_")
+    try:
+        baseline_bytes = None
+        for index_type in QUANTIZED_TYPES:
+            name = f"{BENCH_PREFIX}{index_type}"
+            build = build_faiss_index(corpus, name=name, index_type=index_type, store_dir=store_dir)
+            retriever = get_faiss_retriever(name, store_dir)
+            if index_type == "flat":
+                baseline_bytes = build["index_bytes"]
+
+            for factor in RESCORE_FACTORS if retriever.lossy else [1]:
+                def search(query, factor=factor):
+                    _, ids = retriever.search([query], K, rescore_factor=factor)
+                    return [int(i) for i in ids[0] if i >= 0]
+
+                key = _index_key("pdf_ivf_index", index_type, INDEX_TYPE)
+                rows.append({
+                    "backend": f"faiss_{index_type}",
+                    "index": key,
+                    "params": {"factory": build["factory"], "rescore_factor": factor},
+                    "deployed": key == "pdf_ivf_index" and factor == (RESCORE_FACTOR if retriever.lossy else 1),
+                    "transport": "in_process",
+                    **measure(search, queries, truth),
+                    "build_time_sec": build["build_time_sec"],
+                    "index_bytes": build["index_bytes"],
+                })
+                ratio = f" ({build['index_bytes'] / baseline_bytes:.2f}x fp32)" if baseline_bytes else ""
+                print(f"   {build['factory']} rescore x{factor}: recall@{K}={rows[-1][f'recall_at_{K}']} "
+                      f"p95={rows[-1]['p95_ms']}ms size={build['index_bytes']}B{ratio}")
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+    return rows
+
+
+# ---------- RESULTS ----------
+def write_results(rows: List[Dict], meta: Dict, results_dir: str = RESULTS_DIR) -> Dict[str, str]:
+    """Write JSON (with run metadata) and a flat CSV; also refresh benchmark_latest.json."""
+    os.makedirs(results_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    json_path = os.path.join(results_dir, f"benchmark_{stamp}.json")
+    csv_path = os.path.join(results_dir, f"benchmark_{stamp}.csv")
+
+    payload = {**meta, "results": rows}
+    with open(json_path, "w") as f:
+        json.dump(payload, f, indent=2)
+    shutil.copyfile(json_path, os.path.join(results_dir, "benchmark_latest.json"))
+
+    fields = ["backend", "index", "params", "deployed", "transport", f"recall_at_{K}", "p50_ms", "p95_ms", "p99_ms", "qps", "build_time_sec", "index_bytes"]
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, "params": json.dumps(row["params"])})
+
+    return {"json": json_path, "csv": csv_path}
+
+
+def run_benchmark(
+    query_path: Optional[str] = None, backends=("flat", "hnsw", "hnsw_fp16", "ivf", "quantized")
+) -> Dict:
+    """
+    Full suite: load corpus, build queries + brute-force ground truth, sweep every backend,
+    and persist the results. Returns the JSON payload.
+    """
+    corpus = load_corpus()
+    if not corpus:
+        raise ValueError(f"⚠️ {SOURCE_INDEX} is empty. Run insert_embeddings.py first.")
+
+    corpus_vectors = np.asarray([doc["embedding"] for doc in corpus], dtype=np.float32)
+    queries = load_query_set(query_path) if query_path else make_query_set(corpus_vectors)
+    truth = exact_neighbours(queries, corpus_vectors, K)
+    print(f"📚 Corpus: {len(corpus)} vectors | 🔎 Queries: {len(queries)} | k={K}")
+
+    rows = []
+    for backend in backends:
+        print(f"\n⚙️  Benchmarking {backend}...")
+        if backend == "ivf":
+            rows += bench_ivf(corpus, queries, truth)
+        elif backend == "quantized":
+            rows += bench_quantized(corpus, queries, truth)
+        else:
+            rows += bench_opensearch(backend, corpus, queries, truth)
+
+    meta = {
+        "created_at": time.time(), "corpus_size": len(corpus), "n_queries": len(queries), "k": K,
+        "transports": TRANSPORTS,
+    }
+    paths = write_results(rows, meta)
+    print(f"\n💾 Results written to {paths['json']} and {paths['csv']}")
+    return {**meta, "results": rows}
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,146 @@
+# scripts/benchmark_tables.py
+import glob
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+from extract_tables import TABLE_BACKENDS, extract_page_tables, page_may_have_tables
+from page_source import PageSource
+
+# ---------- CONFIG ----------
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../data"))
+RESULTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../outputs/benchmarks"))
+REFERENCE_BACKEND = "pdfplumber"     # exhaustive run of this backend is the ground truth
+
+
+def _normalize(content: str) -> str:
+    return re.sub(r"\s+", " ", content).strip()
+
+
+def profile_pages(pdf_paths: List[str]) -> List[Dict]:
+    """
+    One exhaustive pass per page: pre-classifier verdict and every backend's tables, each timed.
+    The pre-classified variants are derived from these rows (skipped pages cost only the classifier).
+    """
+    pages = []
+    for pdf_path in pdf_paths:
+        with PageSource(pdf_path) as source:
+            for view in source.pages():
+                start_time = time.perf_counter()
+                candidate = page_may_have_tables(view)
+                row = {
+                    "pdf": os.path.basename(pdf_path),
+                    "page": view.number,
+                    "candidate": candidate,
+                    "classify_sec": time.perf_counter() - start_time,
+                    "tables": {},
+                    "seconds": {},
+                }
+                for backend in TABLE_BACKENDS:
+                    start_time = time.perf_counter()
+                    chunks = extract_page_tables(view, backend, preclassify=False)
+                    row["seconds"][backend] = time.perf_counter() - start_time
+                    row["tables"][backend] = [_normalize(chunk.content) for chunk in chunks]
+                pages.append(row)
+    return pages
+
+
+def _ratio(numerator: int, denominator: int) -> Optional[float]:
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def score(pages: List[Dict], backend: str, preclassify: bool) -> Dict:
+    """
+    Page- and table-level precision / recall of one configuration against the exhaustive
+    reference backend, plus total wall time and how many pages reached the table finder.
+    """
+    tp_pages = fp_pages = fn_pages = 0
+    matched = predicted = reference = 0
+    seconds = 0.0
+    scanned = 0
+
+    for row in pages:
+        truth = row["tables"][REFERENCE_BACKEND]
+        if preclassify:
+            seconds += row["classify_sec"]
+        runs = row["candidate"] or not preclassify
+        found = row["tables"][backend] if runs else []
+        if runs:
+            seconds += row["seconds"][backend]
+            scanned += 1
+
+        tp_pages += bool(found) and bool(truth)
+        fp_pages += bool(found) and not truth
+        fn_pages += bool(truth) and not found
+        remaining = list(truth)
+        for table in found:
+            if table in remaining:
+                remaining.remove(table)
+                matched += 1
+        predicted += len(found)
+        reference += len(truth)
+
+    return {
+        "backend": backend,
+        "preclassify": preclassify,
+        "pages_scanned": scanned,
+        "seconds": round(seconds, 4),
+        "page_precision": _ratio(tp_pages, tp_pages + fp_pages),
+        "page_recall": _ratio(tp_pages, tp_pages + fn_pages),
+        "table_precision": _ratio(matched, predicted),
+        "table_recall": _ratio(matched, reference),
+    }
+
+
+def classifier_report(pages: List[Dict]) -> Dict:
+    """How well 'has ruling lines' predicts 'the reference backend found a table'."""
+    truth = [bool(row["tables"][REFERENCE_BACKEND]) for row in pages]
+    flagged = [row["candidate"] for row in pages]
+    tp = sum(t and f for t, f in zip(truth, flagged))
+    return {
+        "pages": len(pages),
+        "table_pages": sum(truth),
+        "candidates": sum(flagged),
+        "precision": _ratio(tp, sum(flagged)),
+        "recall": _ratio(tp, sum(truth)),
+        "missed": [f"{row['pdf']}#{row['page']}" for row, t, f in zip(pages, truth, flagged) if t and not f],
+    }
+
+
+def run_benchmark(pdf_paths: Optional[List[str]] = None, results_dir: str = RESULTS_DIR) -> Dict:
+    pdf_paths = pdf_paths or sorted(glob.glob(os.path.join(DATA_DIR, "*.pdf")))
+    if not pdf_paths:
+        raise ValueError(f"⚠️ No PDFs found in {DATA_DIR}.")
+
+    pages = profile_pages(pdf_paths)
+    classifier = classifier_report(pages)
+    print(f"📄 {len(pdf_paths)} PDFs | {classifier['pages']} pages | {classifier['table_pages']} with tables "
+          f"| pre-classifier: {classifier['candidates']} candidates, "
+          f"precision={classifier['precision']} recall={classifier['recall']}")
+
+    rows = [score(pages, backend, preclassify) for backend in TABLE_BACKENDS for preclassify in (False, True)]
+    for row in rows:
+        print(f"   {row['backend']:<10} preclassify={str(row['preclassify']):<5} "
+              f"scanned={row['pages_scanned']:<5} {row['seconds']}s "
+              f"page P/R={row['page_precision']}/{row['page_recall']} "
+              f"table P/R={row['table_precision']}/{row['table_recall']}")
+
+    payload = {
+        "created_at": time.time(),
+        "pdfs": [os.path.basename(path) for path in pdf_paths],
+        "reference": REFERENCE_BACKEND,
+        "classifier": classifier,
+        "results": rows,
+    }
+    os.makedirs(results_dir, exist_ok=True)
+    json_path = os.path.join(results_dir, f"tables_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(json_path, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"\n💾 Results written to {json_path}")
+    return payload
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,176 @@
+# scripts/bulk_ingest.py
+import hashlib
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from opensearchpy import helpers
+
+from corpus_version import bump_corpus_version
+
+# ---------- CONFIG ----------
+INDEX_NAMES = ["pdf_flat_index", "pdf_hnsw_index"]  # pdf_ivf_index lives in faiss_backend
+BATCH_SIZE = 500          # documents per _bulk request
+THREAD_COUNT = 4          # concurrent _bulk requests
+MAX_CHUNK_BYTES = 10 * 1024 * 1024
+REFRESH = "end"           # False | True | 'wait_for' per batch, or 'end' for one refresh after ingestion
+VECTOR_DECIMALS = None    # e.g. 4 (~fp16 precision for unit vectors) cuts each vector's JSON ~3x; None = full repr
+SOURCE_FIELD = "source.keyword"   # exact-match view of the dynamically mapped 'source' text field
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_doc_id(metadata: Dict[str, Any], content: str) -> str:
+    """
+    Deterministic document id from source file, page and content hash,
+    so re-ingesting the same chunk overwrites it instead of duplicating it.
+    """
+    key = f"{metadata.get('source', '')}|{metadata.get('page', '')}|{content_hash(content)}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def build_document(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape an embedded chunk into the document stored in OpenSearch."""
+    embedding = chunk["embedding"]
+    if VECTOR_DECIMALS is not None:
+        embedding = [round(float(x), VECTOR_DECIMALS) for x in embedding]
+    return {
+        "text": chunk["content"],
+        "embedding": embedding,
+        **chunk["metadata"]  # page, type, chunk_id, source
+    }
+
+
+def iter_bulk_actions(
+    embedded_chunks: Iterable[Dict[str, Any]],
+    index_names: List[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """Lazily yield one 'index' action per chunk per index (an upsert, since ids are deterministic)."""
+    for chunk in embedded_chunks:
+        doc = build_document(chunk)
+        doc_id = make_doc_id(chunk["metadata"], chunk["content"])
+        for index_name in index_names or INDEX_NAMES:
+            yield {
+                "_op_type": "index",
+                "_index": index_name,
+                "_id": doc_id,
+                "_source": doc,
+            }
+
+
+def bulk_insert(
+    embedded_chunks: Iterable[Dict[str, Any]],
+    index_names: List[str] = None,
+    client=None,
+    batch_size: int = BATCH_SIZE,
+    thread_count: int = THREAD_COUNT,
+    refresh: Union[bool, str] = REFRESH,
+) -> Dict[str, Any]:
+    """
+    Stream embedded chunks into OpenSearch through helpers.parallel_bulk.
+
+    `embedded_chunks` can be any iterable (including a generator), so callers can pipeline
+    embedding with ingestion. `client` defaults to the shared connector client; any object
+    exposing the OpenSearch `bulk`/`indices.refresh` API (e.g. a local stand-in) works.
+
+    Returns:
+        Dict with indexed/failed counts, elapsed seconds, docs/sec and error samples.
+    """
+    if client is None:
+        from opensearch_connector import client
+
+    index_names = index_names or INDEX_NAMES
+    bulk_kwargs = {}
+    if refresh not in ("end", False, None):
+        bulk_kwargs["refresh"] = refresh
+
+    indexed, failed, errors = 0, 0, []
+    start_time = time.time()
+
+    for ok, info in helpers.parallel_bulk(
+        client,
+        iter_bulk_actions(embedded_chunks, index_names),
+        thread_count=thread_count,
+        chunk_size=batch_size,
+        max_chunk_bytes=MAX_CHUNK_BYTES,
+        raise_on_error=False,
+        **bulk_kwargs,
+    ):
+        if ok:
+            indexed += 1
+        else:
+            failed += 1
+            if len(errors) < 10:
+                errors.append(info)
+
+    if refresh == "end":
+        client.indices.refresh(index=",".join(index_names))
+    if indexed:
+        bump_corpus_version(f"bulk_insert into {','.join(index_names)}")
+
+    elapsed = time.time() - start_time
+    stats = {
+        "indexed": indexed,
+        "failed": failed,
+        "elapsed_sec": round(elapsed, 4),
+        "docs_per_sec": round(indexed / elapsed, 2) if elapsed > 0 else 0.0,
+        "errors": errors,
+    }
+    print(f"⚡ Bulk indexed {indexed} docs ({failed} failed) in {stats['elapsed_sec']}s "
+          f"→ {stats['docs_per_sec']} docs/sec")
+    return stats
+
+
+def delete_stale_chunks(
+    source: str,
+    pages: Optional[Iterable[int]] = None,
+    keep_ids: Iterable[str] = (),
+    index_names: List[str] = None,
+    client=None,
+    refresh: bool = False,
+) -> int:
+    """
+    Delete a source file's chunks on `pages` (all of its pages if None) except `keep_ids`,
+    across every index in one delete_by_query. Run it after upserting the re-extracted pages,
+    so the old chunks are only removed once their replacements are indexed.
+
+    Returns:
+        Number of deleted documents (summed over indexes).
+    """
+    if client is None:
+        from opensearch_connector import client
+
+    index_names = index_names or INDEX_NAMES
+    filters = [{"term": {SOURCE_FIELD: source}}]
+    if pages is not None:
+        pages = sorted(set(pages))
+        if not pages:
+            return 0
+        filters.append({"terms": {"page": pages}})
+    query = {"bool": {"filter": filters}}
+    keep_ids = list(keep_ids)
+    if keep_ids:
+        query["bool"]["must_not"] = [{"ids": {"values": keep_ids}}]
+
+    response = client.delete_by_query(
+        index=",".join(index_names), body={"query": query}, conflicts="proceed", refresh=refresh
+    )
+    deleted = response.get("deleted", 0)
+    if deleted:
+        bump_corpus_version(f"delete_stale_chunks {source}")
+    return deleted
+
+
+def scan_embedded(index_name: str, client=None) -> Iterator[Dict[str, Any]]:
+    """Stream every embedded chunk back out of an index (input for the FAISS build)."""
+    if client is None:
+        from opensearch_connector import client
+
+    for hit in helpers.scan(client, index=index_name, query={"query": {"match_all": {}}}):
+        source = hit["_source"]
+        yield {
+            "content": source["text"],
+            "embedding": source["embedding"],
+            "metadata": {k: v for k, v in source.items() if k not in ("text", "embedding")},
+        }
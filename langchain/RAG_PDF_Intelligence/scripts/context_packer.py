@@ -0,0 +1,126 @@
+# scripts/context_packer.py
+from functools import lru_cache
+from typing import Dict, List
+
+import nltk
+import numpy as np
+import tiktoken
+from nltk.tokenize import sent_tokenize
+
+from model_registry import DEFAULT_MODEL_NAME
+from embedding_cache import embed_texts
+from scoring import CandidateMatrix, as_matrix, normalize_rows
+
+nltk.download("punkt", quiet=True)
+
+# ---------- CONFIG ----------
+LLM_MODEL = "gpt-4o-mini"        # tokenizer used for counting
+CONTEXT_TOKEN_BUDGET = 1500      # max tokens of context sent to the LLM
+DEDUP_THRESHOLD = 0.95           # chunks this similar to a higher-ranked one are dropped
+MIN_SENTENCE_SIMILARITY = 0.2    # sentences below this similarity to the query are trimmed...
+MIN_SENTENCES_PER_CHUNK = 2      # ...but each kept chunk retains at least its best sentences
+CHUNK_SEPARATOR = "\n\n"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = LLM_MODEL):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = LLM_MODEL) -> int:
+    return len(get_encoding(model).encode(text))
+
+
+def dedup_indices(embeddings, threshold: float = DEDUP_THRESHOLD) -> List[int]:
+    """Positions to keep, in rank order: each one is < threshold similar to every earlier keeper."""
+    normed = normalize_rows(as_matrix(embeddings))
+    sims = normed @ normed.T
+    kept = []
+    for i in range(len(normed)):
+        if not kept or sims[i, kept].max() < threshold:
+            kept.append(i)
+    return kept
+
+
+def _doc_embeddings(docs: List[Dict], model_name: str) -> np.ndarray:
+    # Stored vectors come back with include_embeddings=True; embed only what's missing
+    missing = [i for i, doc in enumerate(docs) if doc.get("embedding") is None]
+    vectors = [doc.get("embedding") for doc in docs]
+    if missing:
+        for i, vector in zip(missing, embed_texts([docs[i]["text"] for i in missing], model_name)):
+            vectors[i] = vector
+    return as_matrix(vectors)
+
+
+def pack_context(
+    query_embedding: List[float],
+    docs: List[Dict],
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    dedup_threshold: float = DEDUP_THRESHOLD,
+    min_sentence_similarity: float = MIN_SENTENCE_SIMILARITY,
+    min_sentences: int = MIN_SENTENCES_PER_CHUNK,
+    model: str = LLM_MODEL,
+    model_name: str = DEFAULT_MODEL_NAME
+) -> Dict:
+    """
+    Build the LLM context from ranked docs within a token budget.
+
+    1. drop near-duplicates (e.g. the same table from pdfplumber and OCR) by embedding similarity
+    2. trim each chunk to the sentences most similar to the query, keeping their original order
+    3. fill `token_budget` in rank order; the first chunk that doesn't fit contributes its best
+       sentences that still do, then packing stops
+
+    Returns:
+        Dict with the packed context text, the docs it came from (text trimmed), the token
+        count before/after, tokens saved and how many duplicates were dropped.
+    """
+    original_tokens = count_tokens(CHUNK_SEPARATOR.join(doc["text"] for doc in docs), model)
+    packed = {"text": "", "docs": [], "tokens": 0, "original_tokens": original_tokens,
+              "tokens_saved": original_tokens, "duplicates_dropped": 0}
+    if not docs:
+        return packed
+
+    kept = dedup_indices(_doc_embeddings(docs, model_name), dedup_threshold)
+    packed["duplicates_dropped"] = len(docs) - len(kept)
+
+    # Score every sentence of every kept doc against the query in one embedding pass
+    sentences = [sent_tokenize(docs[i]["text"]) or [docs[i]["text"]] for i in kept]
+    flat = [sentence for doc_sentences in sentences for sentence in doc_sentences]
+    sims = CandidateMatrix(embed_texts(flat, model_name)).cosine(query_embedding)[0]
+
+    separator_tokens = count_tokens(CHUNK_SEPARATOR, model)
+    remaining = token_budget
+    offset = 0
+    for i, doc_sentences in zip(kept, sentences):
+        doc_sims = sims[offset:offset + len(doc_sentences)]
+        offset += len(doc_sentences)
+
+        by_similarity = np.argsort(-doc_sims, kind="stable")
+        keep = set(by_similarity[:min_sentences].tolist())
+        keep.update(np.flatnonzero(doc_sims >= min_sentence_similarity).tolist())
+
+        cost = separator_tokens if packed["docs"] else 0
+        trimmed = " ".join(doc_sentences[j] for j in sorted(keep))
+        truncated = False
+        if cost + count_tokens(trimmed, model) > remaining:
+            # Budget boundary: take this chunk's best sentences that still fit, then stop
+            chosen = []
+            for j in by_similarity:
+                if j in keep and cost + count_tokens(" ".join(doc_sentences[k] for k in sorted(chosen + [j])), model) <= remaining:
+                    chosen.append(j)
+            trimmed = " ".join(doc_sentences[j] for j in sorted(chosen))
+            truncated = True
+
+        if trimmed:
+            packed["docs"].append({**docs[i], "text": trimmed})
+            remaining -= cost + count_tokens(trimmed, model)
+        if truncated:
+            break
+
+    packed["text"] = CHUNK_SEPARATOR.join(doc["text"] for doc in packed["docs"])
+    packed["tokens"] = count_tokens(packed["text"], model)
+    packed["tokens_saved"] = original_tokens - packed["tokens"]
+    return packed
@@ -0,0 +1,58 @@
+# scripts/corpus_version.py
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+# ---------- CONFIG ----------
+VERSION_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../cache/corpus_version.sqlite"))
+LEGACY_VERSION_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../cache/corpus_version.json"))
+
+
+def _legacy_version() -> int:
+    # The counter used to live in a JSON file; carry it over so versions never repeat
+    try:
+        with open(LEGACY_VERSION_PATH) as f:
+            return int(json.load(f)["version"])
+    except (FileNotFoundError, ValueError, KeyError):
+        return 0
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS corpus_version ("
+        "id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL, updated_at REAL, reason TEXT)"
+    )
+    if conn.execute("SELECT 1 FROM corpus_version WHERE id = 0").fetchone() is None:
+        conn.execute("INSERT OR IGNORE INTO corpus_version (id, version) VALUES (0, ?)", (_legacy_version(),))
+    return conn
+
+
+def get_corpus_version(path: str = VERSION_PATH) -> int:
+    """Monotonic counter of corpus writes; anything derived from the corpus is keyed on it."""
+    with closing(_connect(path)) as conn:
+        return int(conn.execute("SELECT version FROM corpus_version WHERE id = 0").fetchone()[0])
+
+
+def bump_corpus_version(reason: str = "", path: str = VERSION_PATH) -> int:
+    """
+    Record that the indexed corpus changed (called by the ingestion paths). Returns the new version.
+    The increment is one sqlite transaction, so concurrent ingest processes never lose a bump.
+    """
+    with closing(_connect(path)) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE corpus_version SET version = version + 1, updated_at = ?, reason = ? WHERE id = 0",
+                (time.time(), reason),
+            )
+            version = conn.execute("SELECT version FROM corpus_version WHERE id = 0").fetchone()[0]
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    return int(version)
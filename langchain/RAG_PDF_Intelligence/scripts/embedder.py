@@ -1,21 +1,25 @@
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from typing import List, Dict, Any
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+from model_registry import DEFAULT_MODEL_NAME
+from embedding_cache import embed_texts
 
 
 def generate_embeddings(
     chunks: List[Dict[str, Any]],
-    model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+    model_name: str = DEFAULT_MODEL_NAME,
+    device: Optional[str] = None,
+    use_cache: bool = True
 ) -> List[Dict[str, Any]]:
     """
-    Use LangChain's HuggingFaceEmbeddings to embed semantic chunks.
+    Embed semantic chunks with the shared sentence-transformers model from model_registry,
+    so the model is only constructed once per process. Texts go through embedding_cache,
+    so chunks that were embedded before (or repeat within the batch) skip the model.
 
     Returns:
         List of dicts with 'embedding', 'content', and 'metadata'
     """
-    embedder = HuggingFaceEmbeddings(model_name=model_name)
-
     texts = [chunk["content"] for chunk in chunks]
-    vectors = embedder.embed_documents(texts)
+    vectors = embed_texts(texts, model_name=model_name, device=device, use_cache=use_cache).tolist()
 
     embedded_chunks = []
     for i, chunk in enumerate(chunks):
@@ -28,6 +32,26 @@ def generate_embeddings(
     return embedded_chunks
 
 
+def iter_embeddings(
+    chunks: Iterable[Dict[str, Any]],
+    batch_size: int = 64,
+    model_name: str = DEFAULT_MODEL_NAME,
+    device: Optional[str] = None,
+    use_cache: bool = True
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming generate_embeddings: pull chunks from any iterable (e.g. iter_semantic_chunks),
+    embed them in micro-batches and yield embedded chunks immediately, so bulk insertion can
+    run while extraction is still going.
+    """
+    chunks = iter(chunks)
+    while True:
+        batch = list(islice(chunks, batch_size))
+        if not batch:
+            break
+        yield from generate_embeddings(batch, model_name=model_name, device=device, use_cache=use_cache)
+
+
 # Optional test
 if __name__ == "__main__":
     from semantic_chunker import semantic_chunking
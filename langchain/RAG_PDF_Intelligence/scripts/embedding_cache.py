@@ -0,0 +1,252 @@
+# scripts/embedding_cache.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from model_registry import DEFAULT_MODEL_NAME, canonical_model_name, get_model
+
+# ---------- CONFIG ----------
+CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../cache/embeddings"))
+MAX_CACHE_BYTES = 256 * 1024 * 1024   # vector bytes per model; LRU slots are recycled past this
+ENCODE_BATCH_SIZE = 64
+TAG_BYTES = 16                        # per-slot digest of (key, vector), checked on every read
+TOUCH_AFTER_SEC = 60.0                # a hit only rewrites last_access once it is older than this
+
+_caches: Dict[str, "EmbeddingCache"] = {}
+_caches_lock = threading.Lock()
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace (incl. newlines) so trivially different copies share one entry."""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_key(model_name: str, text: str) -> str:
+    return hashlib.sha1(f"{canonical_model_name(model_name)}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _slot_tag(key: str, vector: np.ndarray) -> np.ndarray:
+    digest = hashlib.blake2b(key.encode("ascii"), digest_size=TAG_BYTES)
+    digest.update(np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+    return np.frombuffer(digest.digest(), dtype=np.uint8)
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache for one model.
+
+    Vectors live in a fixed-size float32 memory-mapped array (`vectors.f32`); `index.sqlite`
+    maps text key -> slot and tracks last access. The slot count is derived from the byte
+    budget, and when every slot is used the least-recently-used ones are recycled. Each
+    (dim, capacity) layout gets its own directory, so opening with another budget never
+    resizes files a live reader has mapped. Access times are coarse: a hit only writes
+    last_access back once the stored value is `touch_after_sec` old, so repeated lookups
+    (e.g. query embeddings) stay read-only.
+
+    Several processes may share one cache: slots are allocated and written inside a single
+    `BEGIN IMMEDIATE` transaction, and each slot carries a digest of its key and vector
+    (`tags.u8`), so a slot recycled or half-written by another process reads as a miss.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        dim: int,
+        max_bytes: int = MAX_CACHE_BYTES,
+        cache_dir: str = CACHE_DIR,
+        touch_after_sec: float = TOUCH_AFTER_SEC
+    ):
+        self.model_name = canonical_model_name(model_name)
+        self.dim = dim
+        self.capacity = max(1, max_bytes // (dim * 4))
+        self.touch_after_sec = touch_after_sec
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self.dir = os.path.join(
+            cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", self.model_name), f"{dim}x{self.capacity}"
+        )
+        os.makedirs(self.dir, exist_ok=True)
+        self.conn = sqlite3.connect(
+            os.path.join(self.dir, "index.sqlite"), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER UNIQUE NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+        vectors_path = os.path.join(self.dir, "vectors.f32")
+        tags_path = os.path.join(self.dir, "tags.u8")
+        with self._transaction():
+            meta = dict(self.conn.execute("SELECT name, value FROM meta").fetchall())
+            if meta and (meta.get("dim"), meta.get("capacity")) != (dim, self.capacity):
+                raise ValueError(
+                    f"❌ {self.dir} holds a {meta.get('dim')}x{meta.get('capacity')} store, not {dim}x{self.capacity}."
+                )
+            fresh = not os.path.exists(vectors_path) or not os.path.exists(tags_path)
+            if fresh:
+                # First use of this layout: start from an empty store
+                self.conn.execute("DELETE FROM entries")
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                    [("dim", dim), ("capacity", self.capacity)],
+                )
+            mode = "w+" if fresh else "r+"
+            self.vectors = np.memmap(vectors_path, dtype=np.float32, mode=mode, shape=(self.capacity, dim))
+            self.tags = np.memmap(tags_path, dtype=np.uint8, mode=mode, shape=(self.capacity, TAG_BYTES))
+
+    @contextmanager
+    def _transaction(self):
+        """Short write transaction; IMMEDIATE takes the lock up front so slot choices cannot race."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def _lookup(self, keys: List[str], columns: str = "key, slot") -> List[tuple]:
+        rows = []
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows += self.conn.execute(
+                f"SELECT {columns} FROM entries WHERE key IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+        return rows
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        if not keys:
+            return found
+
+        now, stale = time.time(), []
+        with self._lock:
+            for key, slot, last_access in self._lookup(keys, "key, slot, last_access"):
+                vector = np.array(self.vectors[slot])
+                if np.array_equal(self.tags[slot], _slot_tag(key, vector)):
+                    found[key] = vector
+                    if now - last_access >= self.touch_after_sec:
+                        stale.append((now, key))
+            if stale:
+                with self._transaction():
+                    self.conn.executemany("UPDATE entries SET last_access = ? WHERE key = ?", stale)
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, keys: List[str], vectors: np.ndarray) -> None:
+        if not keys:
+            return
+
+        with self._lock, self._transaction():
+            # Skip keys another caller (or process) stored meanwhile
+            present = {row[0] for row in self._lookup(keys, "key")}
+            pairs = [(key, vector) for key, vector in zip(keys, vectors) if key not in present]
+            pairs = pairs[-self.capacity:]
+            if not pairs:
+                return
+            keys = [key for key, _ in pairs]
+            vectors = [vector for _, vector in pairs]
+
+            next_slot = self.conn.execute("SELECT COALESCE(MAX(slot) + 1, 0) FROM entries").fetchone()[0]
+            free_slots = list(range(next_slot, min(self.capacity, next_slot + len(keys))))
+
+            # Recycle least-recently-used slots once the byte budget is exhausted
+            shortfall = len(keys) - len(free_slots)
+            if shortfall > 0:
+                victims = self.conn.execute(
+                    "SELECT key, slot FROM entries ORDER BY last_access ASC LIMIT ?", (shortfall,)
+                ).fetchall()
+                self.conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in victims])
+                free_slots += [slot for _, slot in victims]
+                self.evictions += len(victims)
+
+            # Vector and tag reach the file before the entry is committed
+            now = time.time()
+            for key, slot, vector in zip(keys, free_slots, vectors):
+                self.vectors[slot] = vector
+                self.tags[slot] = _slot_tag(key, self.vectors[slot])
+            self.vectors.flush()
+            self.tags.flush()
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, slot, last_access) VALUES (?, ?, ?)",
+                [(key, slot, now) for key, slot in zip(keys, free_slots)],
+            )
+
+    def stats(self) -> Dict[str, float]:
+        entries = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": entries,
+            "capacity": self.capacity,
+            "size_bytes": entries * self.dim * 4,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+def get_embedding_cache(model_name: str = DEFAULT_MODEL_NAME, device: Optional[str] = None) -> EmbeddingCache:
+    """Process-wide cache instance per model (dimension taken from the loaded model)."""
+    name = canonical_model_name(model_name)
+    cache = _caches.get(name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(name)
+            if cache is None:
+                dim = get_model(model_name, device).get_sentence_embedding_dimension()
+                cache = _caches[name] = EmbeddingCache(name, dim)
+    return cache
+
+
+def embed_texts(
+    texts: List[str],
+    model_name: str = DEFAULT_MODEL_NAME,
+    device: Optional[str] = None,
+    use_cache: bool = True,
+    batch_size: int = ENCODE_BATCH_SIZE
+) -> np.ndarray:
+    """
+    Embed texts, returning a (len(texts), dim) float32 array in input order.
+
+    Identical (normalized) texts in the batch are encoded once, and texts already in the
+    persistent cache never reach the model, so re-indexing an edited document only
+    embeds the text that actually changed.
+    """
+    model = get_model(model_name, device)
+    normalized = [normalize_text(text) for text in texts]
+    if not normalized:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    # In-batch dedup: each distinct text is looked up / encoded once
+    unique_texts = list(dict.fromkeys(normalized))
+    keys = [text_key(model_name, text) for text in unique_texts]
+
+    cache = get_embedding_cache(model_name, device) if use_cache else None
+    found = cache.get_many(keys) if cache else {}
+
+    missing = [i for i, key in enumerate(keys) if key not in found]
+    if missing:
+        encoded = model.encode([unique_texts[i] for i in missing], batch_size=batch_size, convert_to_numpy=True)
+        encoded = np.asarray(encoded, dtype=np.float32)
+        missing_keys = [keys[i] for i in missing]
+        found.update(zip(missing_keys, encoded))
+        if cache:
+            cache.put_many(missing_keys, encoded)
+
+    vectors_by_text = {text: found[key] for text, key in zip(unique_texts, keys)}
+    return np.stack([vectors_by_text[text] for text in normalized]).astype(np.float32, copy=False)
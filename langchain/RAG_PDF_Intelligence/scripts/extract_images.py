@@ -1,30 +1,194 @@
 # scripts/extract_images.py
-import fitz
-from PIL import Image
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from PIL import Image, ImageOps
 import pytesseract
 import io
 from models import PDFChunk
+from page_source import PageSource
 
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 
-def extract_ocr_chunks(pdf_path):
-    doc = fitz.open(pdf_path)
-    chunks = []
+# ---------- CONFIG ----------
+OCR_WORKERS = 4                   # concurrent Tesseract processes per extraction process
+MIN_IMAGE_AREA = 64 * 64          # smaller images (icons, bullets, rules) are not OCR'd
+MAX_IMAGE_PIXELS = 4_000_000      # larger scans are downsampled to about this many pixels...
+BINARIZE_OVERSIZED = True         # ...and converted to black/white before OCR
+BINARIZE_THRESHOLD = 160
 
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        images = page.get_images(full=True)
+_ocr_pools: Dict[int, ThreadPoolExecutor] = {}   # worker count -> pool
+_ocr_pools_lock = threading.Lock()
 
-        for img_index, img in enumerate(images):
-            xref = img[0]
-            base_image = doc.extract_image(xref)
-            image = Image.open(io.BytesIO(base_image["image"]))
-            text = pytesseract.image_to_string(image)
 
-            if text.strip():
-                validated = PDFChunk(page=page_num + 1, type='image', content=text.strip())
-                chunks.append(validated)
+def limit_tesseract_threads() -> None:
+    """
+    Stop each Tesseract process from also spawning a thread per core, since OCR_WORKERS of
+    them run side by side. Called in the extraction worker processes only; in-process
+    extraction leaves the caller's environment alone.
+    """
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
 
-    return chunks
 
+def _get_ocr_pool(workers: Optional[int] = None) -> ThreadPoolExecutor:
+    """
+    Process-wide OCR pool of `workers` threads (they only wait on the tesseract subprocess),
+    created on first use and shared by every stage asking for that size.
+    """
+    workers = workers or OCR_WORKERS
+    with _ocr_pools_lock:
+        if workers not in _ocr_pools:
+            _ocr_pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
+        return _ocr_pools[workers]
+
+
+class OcrStage:
+    """
+    Per-document OCR with reuse.
+
+    Each image xref is OCR'd at most once, and so is each distinct bitmap (by content hash),
+    so a logo repeated on every page costs one Tesseract call. The text is still emitted
+    for every page it appears on. With an ExtractionCache, recognized text is also stored
+    by content hash, so the reuse spans shards, worker processes and documents. Images
+    under `min_area` pixels are skipped before they are decoded, and oversized scans are
+    downsampled (and optionally binarized) first. Recognition runs on a persistent thread
+    pool shared by all documents in the process, sized by `workers` (default OCR_WORKERS).
+
+    The cache is only touched from the thread calling submit_page / collect.
+    """
+
+    def __init__(
+        self,
+        min_area: int = MIN_IMAGE_AREA,
+        max_pixels: int = MAX_IMAGE_PIXELS,
+        binarize: bool = BINARIZE_OVERSIZED,
+        cache=None,
+        workers: Optional[int] = None
+    ):
+        self.min_area = min_area
+        self.max_pixels = max_pixels
+        self.binarize = binarize
+        self.cache = cache
+        self.workers = workers
+        self._by_xref: Dict[int, Future] = {}
+        self._by_hash: Dict[str, Future] = {}
+        self._unsaved: Dict[Future, str] = {}   # fresh OCR results not yet written to the cache
+        self._lock = threading.Lock()
+        self.counts = {"seen": 0, "skipped": 0, "cached": 0, "stored": 0, "ocr": 0}
+        self.seconds = {"extract": 0.0, "preprocess": 0.0, "ocr": 0.0}
+
+    def _prepare(self, image_bytes: bytes) -> Image.Image:
+        image = Image.open(io.BytesIO(image_bytes))
+        area = image.width * image.height
+        if area > self.max_pixels:
+            scale = (self.max_pixels / area) ** 0.5
+            image = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.LANCZOS)
+            if self.binarize:
+                gray = ImageOps.autocontrast(image.convert("L"))
+                image = gray.point(lambda p: 255 if p > BINARIZE_THRESHOLD else 0, mode="1")
+        return image
+
+    def _recognize(self, image_bytes: bytes) -> str:
+        start_time = time.perf_counter()
+        image = self._prepare(image_bytes)
+        prepared = time.perf_counter()
+        text = pytesseract.image_to_string(image).strip()
+        with self._lock:
+            self.seconds["preprocess"] += prepared - start_time
+            self.seconds["ocr"] += time.perf_counter() - prepared
+        return text
+
+    def _cache_key(self, digest: str) -> str:
+        # Preprocessing settings change the text Tesseract returns for the same bitmap
+        return f"{digest}|{self.max_pixels}|{int(self.binarize)}|{BINARIZE_THRESHOLD}"
+
+    def submit_page(self, view) -> List[Future]:
+        """
+        Queue OCR for a PageView's images; returns one future per image that will be read.
+        Must run on the thread owning the page (fitz is not thread-safe); recognition does not.
+        """
+        futures = []
+        for img in view.images:
+            xref, width, height = img[0], img[2], img[3]
+            self.counts["seen"] += 1
 
+            if xref in self._by_xref:
+                self.counts["cached"] += 1
+                futures.append(self._by_xref[xref])
+                continue
+            if width * height < self.min_area:
+                self.counts["skipped"] += 1
+                continue
+
+            start_time = time.perf_counter()
+            image_bytes = view.image_bytes(xref)
+            digest = hashlib.sha1(image_bytes).hexdigest()
+            self.seconds["extract"] += time.perf_counter() - start_time
+
+            future = self._by_hash.get(digest)
+            text = self.cache.get_ocr(self._cache_key(digest)) if future is None and self.cache else None
+            if future is not None:
+                self.counts["cached"] += 1
+            elif text is not None:
+                future = self._by_hash[digest] = Future()
+                future.set_result(text)
+                self.counts["stored"] += 1
+            else:
+                future = self._by_hash[digest] = _get_ocr_pool(self.workers).submit(self._recognize, image_bytes)
+                self.counts["ocr"] += 1
+                if self.cache:
+                    self._unsaved[future] = self._cache_key(digest)
+            self._by_xref[xref] = future
+            futures.append(future)
+        return futures
+
+    def collect(self, futures: List[Future], page_number: int) -> List[PDFChunk]:
+        """Wait for a page's OCR futures and build its image chunks (in image order)."""
+        chunks = []
+        for future in futures:
+            text = future.result()
+            key = self._unsaved.pop(future, None)
+            if key is not None:
+                self.cache.put_ocr(key, text)
+            if text:
+                chunks.append(PDFChunk(page=page_number, type='image', content=text))
+        return chunks
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "images_seen": self.counts["seen"],
+            "skipped": self.counts["skipped"],
+            "cached": self.counts["cached"],
+            "stored": self.counts["stored"],
+            "ocr": self.counts["ocr"],
+            **{f"{stage}_sec": round(sec, 4) for stage, sec in self.seconds.items()},
+        }
+
+
+def merge_ocr_stats(stats: List[Dict[str, float]]) -> Dict[str, float]:
+    """Sum OcrStage.stats() from several shards / documents."""
+    merged: Dict[str, float] = {}
+    for item in stats:
+        for key, value in item.items():
+            merged[key] = round(merged.get(key, 0) + value, 4)
+    return merged
+
+
+def extract_ocr_chunks(pdf_path, ocr_stats: Optional[Dict[str, float]] = None):
+    """OCR every image in the PDF; `ocr_stats`, if given, is updated with OcrStage.stats()."""
+    stage = OcrStage()
+
+    # Queue every page first so Tesseract workers stay busy while later pages are scanned
+    with PageSource(pdf_path) as source:
+        pending = [(view.number, stage.submit_page(view)) for view in source.pages()]
+    chunks = []
+    for page_number, futures in pending:
+        chunks.extend(stage.collect(futures, page_number))
+
+    if ocr_stats is not None:
+        ocr_stats.update(stage.stats())
+    return chunks
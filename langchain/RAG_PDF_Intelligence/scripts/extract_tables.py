@@ -1,24 +1,102 @@
 # scripts/extract_tables.py
-import pdfplumber
+from typing import Dict, List
+
 from models import PDFChunk
+from page_source import PageSource
+
+# ---------- CONFIG ----------
+TABLE_BACKEND = "pdfplumber"    # "pdfplumber" (reference) or "pymupdf" (page.find_tables, no second parser)
+PRECLASSIFY = True              # run the table finder only on pages with enough ruling lines
+MIN_RULING_LINES = 2            # per orientation; a lines-strategy cell needs 2 horizontal + 2 vertical edges
+MIN_EDGE_LENGTH = 1.0           # pt; shorter segments are dropped (pdfplumber's edge_min_length_prefilter)
+AXIS_TOLERANCE = 0.5            # pt a segment may drift and still count as horizontal / vertical
+
+TABLE_BACKENDS = ("pdfplumber", "pymupdf")
+
+
+def _count_segment(counts: Dict[str, int], p0, p1, diagonal_is_vertical: bool = True) -> None:
+    dx, dy = abs(p1.x - p0.x), abs(p1.y - p0.y)
+    if max(dx, dy) < MIN_EDGE_LENGTH:
+        return
+    if dy <= AXIS_TOLERANCE:
+        counts["h"] += 1
+    elif dx <= AXIS_TOLERANCE or diagonal_is_vertical:
+        # pdfplumber files every non-horizontal straight line under "v", diagonals included
+        counts["v"] += 1
+
+
+def ruling_stats(view) -> Dict[str, int]:
+    """Horizontal / vertical line segments drawn on a PageView (lines, rectangle and quad edges)."""
+    counts = {"h": 0, "v": 0}
+    for path in view.drawings:
+        for item in path["items"]:
+            kind = item[0]
+            if kind == "l":
+                _count_segment(counts, item[1], item[2])
+            elif kind == "re":
+                rect = item[1]
+                _count_segment(counts, rect.tl, rect.tr)
+                _count_segment(counts, rect.bl, rect.br)
+                _count_segment(counts, rect.tl, rect.bl)
+                _count_segment(counts, rect.tr, rect.br)
+            elif kind == "qu":
+                quad = item[1]
+                for p0, p1 in ((quad.ul, quad.ur), (quad.ll, quad.lr), (quad.ul, quad.ll), (quad.ur, quad.lr)):
+                    _count_segment(counts, p0, p1)
+            elif kind == "c":
+                # Curves become edges point-to-point, and only their axis-aligned steps count
+                for p0, p1 in zip(item[1:4], item[2:5]):
+                    _count_segment(counts, p0, p1, diagonal_is_vertical=False)
+    return counts
+
+
+def page_may_have_tables(view, min_lines: int = MIN_RULING_LINES) -> bool:
+    """
+    Cheap pre-classifier: both table finders use the "lines" strategy, so a page without at
+    least `min_lines` horizontal and vertical ruling segments cannot produce a table.
+    """
+    counts = ruling_stats(view)
+    return counts["h"] >= min_lines and counts["v"] >= min_lines
 
-def extract_table_chunks(pdf_path):
-    chunks = []
 
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_num, page in enumerate(pdf.pages):
-            tables = page.extract_tables()
-
-            for table_index, table in enumerate(tables):
-                if not table:
-                    continue
-                formatted = "\n".join([
-                    "\t".join([cell if cell else "" for cell in row])
-                    for row in table if any(row)
-                ])
-                if formatted.strip():
-                    validated = PDFChunk(page=page_num + 1, type='table', content=formatted.strip())
-                    chunks.append(validated)
+def _table_rows(view, backend: str) -> List[List[List]]:
+    if backend == "pdfplumber":
+        return view.plumber_page.extract_tables()
+    if backend == "pymupdf":
+        return [table.extract() for table in view.table_candidates]
+    raise ValueError(f"Unknown table backend '{backend}'. Expected one of {TABLE_BACKENDS}.")
+
+
+def extract_page_tables(view, backend: str = TABLE_BACKEND, preclassify: bool = PRECLASSIFY) -> List[PDFChunk]:
+    """
+    Table chunks for a single page_source.PageView.
+
+    With `preclassify`, pages without ruling lines return [] before any table finder runs.
+    The pymupdf backend reads the fitz page, so call it from the thread owning the PageSource.
+    """
+    if preclassify and not page_may_have_tables(view):
+        return []
+
+    chunks = []
+    for table in _table_rows(view, backend):
+        if not table:
+            continue
+        formatted = "\n".join([
+            "\t".join([cell if cell else "" for cell in row])
+            for row in table if any(row)
+        ])
+        if formatted.strip():
+            validated = PDFChunk(page=view.number, type='table', content=formatted.strip())
+            chunks.append(validated)
 
     return chunks
 
+
+def extract_table_chunks(pdf_path, backend: str = TABLE_BACKEND, preclassify: bool = PRECLASSIFY):
+    chunks = []
+
+    with PageSource(pdf_path) as source:
+        for view in source.pages():
+            chunks.extend(extract_page_tables(view, backend, preclassify))
+
+    return chunks
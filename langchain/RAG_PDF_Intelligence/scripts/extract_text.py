@@ -1,19 +1,21 @@
 # scripts/extract_text.py
-import fitz
 from models import PDFChunk
+from page_source import PageSource
 
-def extract_text_chunks(pdf_path):
-    doc = fitz.open(pdf_path)
-    chunks = []
+def extract_page_text(view):
+    """Text chunk for a single page_source.PageView."""
+    text = view.text
 
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        text = page.get_text()
+    if text.strip():
+        return [PDFChunk(page=view.number, type='text', content=text.strip())]
+    return []
 
-        if text.strip():
-            validated = PDFChunk(page=page_num + 1, type='text', content=text.strip())
-            chunks.append(validated)
 
-    return chunks
+def extract_text_chunks(pdf_path):
+    chunks = []
 
+    with PageSource(pdf_path) as source:
+        for view in source.pages():
+            chunks.extend(extract_page_text(view))
 
+    return chunks
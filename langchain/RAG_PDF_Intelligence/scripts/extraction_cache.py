@@ -0,0 +1,271 @@
+# scripts/extraction_cache.py
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set, Tuple
+
+from models import PDFChunk
+
+# ---------- CONFIG ----------
+# Bump whenever an extractor's output changes so stale records are never served
+EXTRACTOR_VERSION = "2"
+CACHE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../cache/extraction_cache.sqlite"))
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+EVICT_TO_RATIO = 0.9      # after eviction, keep the store at 90% of the budget
+
+_REF = re.compile(rb"(\d+) \d+ R")
+_BACK_REF = re.compile(rb"/(?:Parent|P)\s+\d+ \d+ R")   # links back up to the page tree
+
+
+def _source_digest(doc, source: bytes, memo: Dict[int, bytes], active: Set[int]) -> bytes:
+    """Digest of a PDF object's source with each indirect reference replaced by its target's digest."""
+    source = _BACK_REF.sub(b"", source)
+    digest = hashlib.sha256(_REF.sub(b"R", source))  # object numbers differ between files
+    for ref in _REF.findall(source):
+        digest.update(_object_digest(doc, int(ref), memo, active))
+    return digest.digest()
+
+
+def _object_digest(doc, xref: int, memo: Dict[int, bytes], active: Set[int]) -> bytes:
+    if xref in memo:
+        return memo[xref]
+    if xref in active or not 0 < xref < doc.xref_length():
+        return b""  # reference cycle or dangling reference
+    active.add(xref)
+    digest = hashlib.sha256(_source_digest(doc, doc.xref_object(xref, compressed=True).encode(), memo, active))
+    if doc.xref_is_stream(xref):
+        digest.update(doc.xref_stream_raw(xref) or b"")
+    active.discard(xref)
+    memo[xref] = digest.digest()
+    return memo[xref]
+
+
+def _page_resources(doc, page) -> bytes:
+    """The page's /Resources entry (an inline dict or a reference), inherited from the page tree if absent."""
+    xref, seen = page.xref, set()
+    while xref and xref not in seen:
+        seen.add(xref)
+        kind, value = doc.xref_get_key(xref, "Resources")
+        if kind != "null":
+            return value.encode()
+        kind, parent = doc.xref_get_key(xref, "Parent")
+        xref = int(parent.split()[0]) if kind == "xref" else 0
+    return b""
+
+
+def page_fingerprint(doc, page, variant: str = "", memo: Optional[Dict[int, bytes]] = None) -> str:
+    """
+    Hash of a fitz page's content stream(s) and everything its resources reach: form
+    XObjects (recursively), images, fonts and font files, graphics states. Object numbers
+    are normalized out, so identical pages in any PDF map to the same key. Also covers the
+    page geometry, the extractor version and `variant` (settings that change output, e.g.
+    the table backend and pre-classifier). Pass one `memo` dict per document to hash shared resources once.
+    """
+    memo = {} if memo is None else memo
+    digest = hashlib.sha256(EXTRACTOR_VERSION.encode())
+    digest.update(variant.encode())
+    digest.update(f"{tuple(page.mediabox)}|{page.rotation}".encode())
+    digest.update(page.read_contents())
+    digest.update(_source_digest(doc, _page_resources(doc, page), memo, set()))
+    return digest.hexdigest()
+
+
+def _encode(chunks: List[PDFChunk]) -> bytes:
+    records = [[chunk.type, chunk.content] for chunk in chunks]
+    return zlib.compress(json.dumps(records, separators=(",", ":")).encode("utf-8"))
+
+
+def _decode(blob: bytes, page_number: int) -> List[PDFChunk]:
+    records = json.loads(zlib.decompress(blob).decode("utf-8"))
+    return [PDFChunk(page=page_number, type=chunk_type, content=content) for chunk_type, content in records]
+
+
+class ExtractionCache:
+    """
+    On-disk (sqlite) cache of per-page extraction results keyed by page fingerprint.
+
+    Records are zlib-compressed JSON lists of (type, content); the page number is re-applied
+    on read so a page moved within a document still hits. Least-recently-used pages are
+    evicted once the store exceeds `max_bytes`; the byte total is kept in the `stats` table
+    and updated in the same transaction as each insert or delete. Safe to open from several
+    worker processes: the connection runs in autocommit mode and every write is its own short
+    transaction, so the write lock is never held across extraction work. Hit timestamps are
+    buffered and written in one transaction on flush / close.
+
+    A second table holds OCR text by image content hash (see extract_images.OcrStage), so a
+    bitmap repeated across shards and documents is recognized once. OCR rows count towards
+    the same byte budget and are evicted with the pages, least recently used first.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._touched: Dict[Tuple[str, str], float] = {}   # (table, key) -> last hit
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "key TEXT PRIMARY KEY, records BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS pages_lru ON pages (last_access)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        with self._transaction():
+            # The first OCR table had no size / last_access; its rows are cheap to recompute
+            ocr_columns = {row[1] for row in self.conn.execute("PRAGMA table_info(ocr)")}
+            if ocr_columns and "size" not in ocr_columns:
+                self.conn.execute("DROP TABLE ocr")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS ocr ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS ocr_lru ON ocr (last_access)")
+            # Stores written before the running total existed are summed once
+            if self.conn.execute("SELECT 1 FROM stats WHERE name = 'size_bytes'").fetchone() is None:
+                self.conn.execute(
+                    "INSERT INTO stats (name, value) SELECT 'size_bytes', "
+                    "(SELECT COALESCE(SUM(size), 0) FROM pages) + (SELECT COALESCE(SUM(size), 0) FROM ocr)"
+                )
+
+    @contextmanager
+    def _transaction(self):
+        """Short write transaction; IMMEDIATE takes the lock up front."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def _write(self, statements) -> None:
+        """Run (sql, params) pairs in one short transaction."""
+        with self._transaction():
+            for sql, params in statements:
+                self.conn.execute(sql, params)
+
+    def _add_size(self, delta: int) -> int:
+        """Adjust the running byte total (call inside a transaction); returns the new total."""
+        self.conn.execute(
+            "INSERT INTO stats (name, value) VALUES ('size_bytes', ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (delta,),
+        )
+        return self.conn.execute("SELECT value FROM stats WHERE name = 'size_bytes'").fetchone()[0]
+
+    def get(self, key: str, page_number: int) -> Optional[List[PDFChunk]]:
+        row = self.conn.execute("SELECT records FROM pages WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._touched[("pages", key)] = time.time()
+        return _decode(row[0], page_number)
+
+    def _store(self, table: str, column: str, key: str, value, size: int) -> None:
+        with self._transaction():
+            replaced = self.conn.execute(f"SELECT size FROM {table} WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO {table} (key, {column}, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            total = self._add_size(size - (replaced[0] if replaced else 0))
+        if total > self.max_bytes:
+            self._evict()
+
+    def put(self, key: str, chunks: List[PDFChunk]) -> None:
+        blob = _encode(chunks)
+        self._store("pages", "records", key, blob, len(blob))
+
+    def get_ocr(self, key: str) -> Optional[str]:
+        key = f"{EXTRACTOR_VERSION}|{key}"
+        row = self.conn.execute("SELECT text FROM ocr WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._touched[("ocr", key)] = time.time()
+        return row[0]
+
+    def put_ocr(self, key: str, text: str) -> None:
+        self._store("ocr", "text", f"{EXTRACTOR_VERSION}|{key}", text, len(text.encode("utf-8")))
+
+    def _evict(self) -> None:
+        target = int(self.max_bytes * EVICT_TO_RATIO)
+        with self._transaction():
+            total = self._add_size(0)   # another process may have evicted meanwhile
+            if total <= self.max_bytes:
+                return
+            victims, freed = [], 0
+            by_age = self.conn.execute(
+                "SELECT 'pages', key, size, last_access FROM pages "
+                "UNION ALL SELECT 'ocr', key, size, last_access FROM ocr ORDER BY last_access ASC"
+            )
+            for table, key, size, _ in by_age:
+                if total - freed <= target:
+                    break
+                victims.append((table, key))
+                freed += size
+            for table in ("pages", "ocr"):
+                self.conn.executemany(
+                    f"DELETE FROM {table} WHERE key = ?", [(key,) for name, key in victims if name == table]
+                )
+            self._add_size(-freed)
+        self.evictions += len(victims)
+
+    def flush(self) -> None:
+        """Write buffered hit timestamps and counters in one transaction."""
+        statements = [
+            (f"UPDATE {table} SET last_access = ? WHERE key = ?", (accessed, key))
+            for (table, key), accessed in self._touched.items()
+        ]
+        statements += [
+            (
+                "INSERT INTO stats (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, value),
+            )
+            for name, value in (("hits", self.hits), ("misses", self.misses), ("evictions", self.evictions))
+        ]
+        self._write(statements)
+        self._touched.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+    def stats(self) -> Dict[str, float]:
+        """Lifetime hit/miss/eviction counters plus current entry count and size."""
+        totals = dict(self.conn.execute("SELECT name, value FROM stats").fetchall())
+        hits = totals.get("hits", 0) + self.hits
+        misses = totals.get("misses", 0) + self.misses
+        entries = self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        ocr_entries = self.conn.execute("SELECT COUNT(*) FROM ocr").fetchone()[0]
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "evictions": totals.get("evictions", 0) + self.evictions,
+            "entries": entries,
+            "size_bytes": totals.get("size_bytes", 0),
+            "ocr_entries": ocr_entries,
+        }
+
+    def clear(self) -> None:
+        self._write([("DELETE FROM pages", ()), ("DELETE FROM stats", ()), ("DELETE FROM ocr", ())])
+        self._touched.clear()
+
+
+if __name__ == "__main__":
+    cache = ExtractionCache()
+    print(f"🗄️  Extraction cache at {cache.path}: {cache.stats()}")
+    cache.close()
@@ -0,0 +1,309 @@
+# scripts/faiss_backend.py
+import json
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import faiss
+import numpy as np
+
+from corpus_version import bump_corpus_version
+from scoring import as_matrix
+
+# ---------- CONFIG ----------
+FAISS_INDEX_NAME = "pdf_ivf_index"
+STORE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../vector_store"))
+INDEX_TYPE = "ivf"      # 'ivf' (IVF-Flat), 'ivfpq', 'opq' (OPQ + IVF-PQ), 'flat' (exact fp32),
+                        # 'sq8' / 'sqfp16' (int8 / fp16 scalar-quantized) or 'ivfsq8' (IVF + int8)
+NLIST = 100             # upper bound; capped at ~sqrt(n) for small corpora
+NPROBE = 10             # default lists probed per query (tunable per call)
+PQ_M = 16               # PQ sub-quantizers (must divide the embedding dim; 384 / 16 = 24)
+PQ_NBITS = 8
+TOP_K = 5
+SQ_CALIBRATION = "quantiles"   # int8 range per dimension: 'minmax', 'meanstd', 'quantiles' or 'optim'
+SQ_CALIBRATION_ARG = 0.001     # 'quantiles': clip this fraction of outliers at each end
+RESCORE_FACTOR = 4             # lossy (SQ/PQ) indexes: rescore top_k * this candidates with fp32 vectors
+
+_retrievers: Dict[str, "FaissRetriever"] = {}
+_retrievers_lock = threading.Lock()
+
+
+def index_paths(name: str = FAISS_INDEX_NAME, store_dir: str = STORE_DIR):
+    """(index file, sidecar metadata store) for a named FAISS index."""
+    return os.path.join(store_dir, f"{name}.faiss"), os.path.join(store_dir, f"{name}.meta.sqlite")
+
+
+def _factory_string(index_type: str, n: int, nlist: int, pq_m: int, pq_nbits: int) -> str:
+    # k-means wants ~39 points per centroid; keep small corpora trainable
+    nlist = max(1, min(nlist, int(math.sqrt(n)) or 1, n // 39 or 1))
+    if index_type == "ivf":
+        return f"IVF{nlist},Flat"
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "sq8":
+        return "SQ8"
+    if index_type == "sqfp16":
+        return "SQfp16"
+    if index_type == "ivfsq8":
+        return f"IVF{nlist},SQ8"
+
+    # PQ codebooks need >= 2^nbits training points
+    nbits = max(1, min(pq_nbits, int(math.log2(max(n, 2)))))
+    if index_type == "ivfpq":
+        return f"IVF{nlist},PQ{pq_m}x{nbits}"
+    if index_type == "opq":
+        return f"OPQ{pq_m},IVF{nlist},PQ{pq_m}x{nbits}"
+    raise ValueError("Unsupported FAISS index type. Choose 'ivf', 'ivfpq', 'opq', 'flat', 'sq8', 'sqfp16' or 'ivfsq8'.")
+
+
+def _calibrate(index, calibration: str = SQ_CALIBRATION, calibration_arg: float = SQ_CALIBRATION_ARG) -> None:
+    """
+    Choose how an int8 scalar quantizer derives each dimension's range during train().
+    Clipping rare outliers ('quantiles') spends the 256 levels on where the values actually are.
+    """
+    sq = getattr(index, "sq", None)
+    if sq is None or sq.qtype == faiss.ScalarQuantizer.QT_fp16:
+        return
+    sq.rangestat = getattr(faiss.ScalarQuantizer, f"RS_{calibration}")
+    sq.rangestat_arg = calibration_arg
+
+
+def is_lossy(factory: str) -> bool:
+    """Whether the index stores compressed codes (so scores benefit from fp32 rescoring)."""
+    return "SQ" in factory or "PQ" in factory
+
+
+def build_faiss_index(
+    embedded_chunks: Iterable[Dict[str, Any]],
+    name: str = FAISS_INDEX_NAME,
+    index_type: str = INDEX_TYPE,
+    nlist: int = NLIST,
+    pq_m: int = PQ_M,
+    pq_nbits: int = PQ_NBITS,
+    store_dir: str = STORE_DIR,
+    batch_size: int = 1024
+) -> Dict[str, Any]:
+    """
+    Train a FAISS IVF / IVF-PQ / OPQ index on real chunk embeddings (output of
+    generate_embeddings) and persist it next to an id -> text/metadata/vector sidecar.
+
+    `embedded_chunks` may be any iterable (e.g. bulk_ingest.scan_embedded) and is read once:
+    text and metadata go straight into the sidecar and the vectors into a spool file that is
+    memory-mapped for training, so the corpus is never held in memory as Python objects.
+
+    Vectors are L2-normalized and searched by inner product, so scores are cosine similarities.
+    Returns build stats (factory string, vector count, build time, file size).
+    """
+    start_time = time.time()
+    os.makedirs(store_dir, exist_ok=True)
+    index_path, meta_path = index_paths(name, store_dir)
+
+    # The sidecar is written under a temporary name and swapped in once the index is saved
+    staging_path = meta_path + ".tmp"
+    if os.path.exists(staging_path):
+        os.remove(staging_path)
+    conn = sqlite3.connect(staging_path)
+    conn.execute("CREATE TABLE docs (id INTEGER PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL, embedding BLOB NOT NULL)")
+    conn.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    n = dim = 0
+    try:
+        with tempfile.TemporaryFile(dir=store_dir) as spool:
+            batch = []
+
+            def _spool_batch():
+                nonlocal n, dim
+                vectors = as_matrix([chunk["embedding"] for chunk in batch]).copy()
+                if dim and vectors.shape[1] != dim:
+                    raise ValueError(f"⚠️ Embedding dimension changed from {dim} to {vectors.shape[1]}.")
+                dim = vectors.shape[1]
+                faiss.normalize_L2(vectors)
+                spool.write(vectors.tobytes())
+                conn.executemany(
+                    "INSERT INTO docs (id, text, metadata, embedding) VALUES (?, ?, ?, ?)",
+                    [
+                        (n + i, chunk["content"], json.dumps(chunk["metadata"]), vectors[i].tobytes())
+                        for i, chunk in enumerate(batch)
+                    ],
+                )
+                n += len(batch)
+                batch.clear()
+
+            for chunk in embedded_chunks:
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    _spool_batch()
+            if batch:
+                _spool_batch()
+            if not n:
+                raise ValueError("⚠️ No embedded chunks to index.")
+
+            spool.flush()
+            vectors = np.memmap(spool, dtype=np.float32, mode="c", shape=(n, dim))
+            factory = _factory_string(index_type, n, nlist, pq_m, pq_nbits)
+            index = faiss.index_factory(dim, factory, faiss.METRIC_INNER_PRODUCT)
+            _calibrate(index)
+            index.train(vectors)
+            index.add(vectors)  # fresh index: ids are row positions 0..n-1, matching the sidecar
+            del vectors
+    except BaseException:
+        conn.close()
+        os.remove(staging_path)
+        raise
+
+    faiss.write_index(index, index_path)
+    conn.execute("INSERT INTO meta (name, value) VALUES ('factory', ?)", (factory,))
+    conn.commit()
+    conn.close()
+    os.replace(staging_path, meta_path)
+
+    # Any already-loaded retriever for this name is now stale
+    with _retrievers_lock:
+        _retrievers.pop(os.path.join(store_dir, name), None)
+    if name == FAISS_INDEX_NAME and store_dir == STORE_DIR:
+        bump_corpus_version(f"build_faiss_index {name}")  # not for scratch/benchmark indexes
+
+    stats = {
+        "factory": factory,
+        "vectors": n,
+        "build_time_sec": round(time.time() - start_time, 4),
+        "index_bytes": os.path.getsize(index_path),
+        "bytes_per_vector": round(os.path.getsize(index_path) / n, 1),
+    }
+    print(f"[✓] FAISS {factory} index with {n} vectors saved to {index_path}")
+    return stats
+
+
+class FaissRetriever:
+    """
+    In-process ANN backend over a persisted FAISS index.
+
+    The index is memory-mapped read-only, so several processes can share the page cache
+    and load time doesn't grow with corpus size. Text/metadata come from the sqlite sidecar.
+    For quantized (SQ/PQ) indexes the top candidates are rescored against the full-precision
+    vectors kept in the sidecar, which restores most of the recall lost to compression.
+    """
+
+    def __init__(self, name: str = FAISS_INDEX_NAME, store_dir: str = STORE_DIR):
+        self.name = name
+        index_path, meta_path = index_paths(name, store_dir)
+        if not os.path.exists(index_path):
+            raise FileNotFoundError(f"⚠️ FAISS index not found at {index_path}. Run insert_embeddings.py first.")
+
+        self.index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        self.dim = self.index.d
+        self.conn = sqlite3.connect(meta_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        try:
+            self.factory = self.conn.execute("SELECT value FROM meta WHERE name = 'factory'").fetchone()[0]
+        except sqlite3.OperationalError:  # sidecar written before the meta table existed
+            self.factory = ""
+        self.lossy = is_lossy(self.factory)
+
+    def _search_params(self, nprobe: int):
+        if faiss.try_extract_index_ivf(self.index) is None:
+            return None  # flat / SQ indexes have nothing to probe
+        params = faiss.SearchParametersIVF(nprobe=nprobe)
+        if isinstance(self.index, faiss.IndexPreTransform):
+            params = faiss.SearchParametersPreTransform(index_params=params)
+        return params
+
+    def _fetch_vectors(self, ids: List[int]) -> Dict[int, np.ndarray]:
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT id, embedding FROM docs WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+        return {doc_id: np.frombuffer(embedding, dtype=np.float32) for doc_id, embedding in rows}
+
+    def _rescore(self, queries: np.ndarray, ids: np.ndarray, top_k: int):
+        """Re-rank candidate ids by exact inner product with the stored fp32 (normalized) vectors."""
+        vectors = self._fetch_vectors(sorted({int(i) for i in ids.ravel() if i >= 0}))
+        scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        top_ids = np.full((len(queries), top_k), -1, dtype=np.int64)
+        for row, (query, candidates) in enumerate(zip(queries, ids)):
+            candidates = [int(i) for i in candidates if i in vectors]
+            if not candidates:
+                continue
+            exact = np.stack([vectors[i] for i in candidates]) @ query
+            order = np.argsort(-exact, kind="stable")[:top_k]
+            scores[row, :len(order)] = exact[order]
+            top_ids[row, :len(order)] = np.asarray(candidates)[order]
+        return scores, top_ids
+
+    def search(
+        self, query_embeddings, top_k: int = TOP_K, nprobe: Optional[int] = None, rescore_factor: Optional[int] = None
+    ):
+        """
+        Raw batched search: (scores, ids), each of shape (n_queries, top_k).
+        rescore_factor=None uses RESCORE_FACTOR for lossy indexes (1 for exact ones); 1 disables rescoring.
+        """
+        queries = as_matrix(query_embeddings).copy()
+        faiss.normalize_L2(queries)
+        if rescore_factor is None:
+            rescore_factor = RESCORE_FACTOR if self.lossy else 1
+
+        params = self._search_params(nprobe or NPROBE)
+        if rescore_factor <= 1:
+            return self.index.search(queries, top_k, params=params)
+        _, candidates = self.index.search(queries, top_k * rescore_factor, params=params)
+        return self._rescore(queries, candidates, top_k)
+
+    def _fetch(self, ids: List[int], include_embeddings: bool) -> Dict[int, Dict]:
+        if not ids:
+            return {}
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT id, text, metadata, embedding FROM docs WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+
+        docs = {}
+        for doc_id, text, metadata, embedding in rows:
+            metadata = json.loads(metadata)
+            doc = {
+                "text": text,
+                "metadata": {
+                    "page_number": metadata.get("page_number", metadata.get("page")),
+                    "chunk_id": metadata.get("chunk_id")
+                }
+            }
+            if include_embeddings:
+                doc["embedding"] = np.frombuffer(embedding, dtype=np.float32).tolist()
+            docs[doc_id] = doc
+        return docs
+
+    def retrieve_batch(
+        self, query_embeddings, top_k: int = TOP_K, nprobe: Optional[int] = None, include_embeddings: bool = False
+    ) -> List[List[Dict]]:
+        """Top-k result dicts (text, metadata, score) for each query, in input order."""
+        scores, ids = self.search(query_embeddings, top_k, nprobe)
+        docs = self._fetch(sorted({int(i) for i in ids.ravel() if i >= 0}), include_embeddings)
+        return [
+            [
+                {**docs[int(doc_id)], "score": float(score)}
+                for doc_id, score in zip(row_ids, row_scores)
+                if doc_id >= 0 and int(doc_id) in docs
+            ]
+            for row_ids, row_scores in zip(ids, scores)
+        ]
+
+    def retrieve_top_k(
+        self, query_embedding: List[float], top_k: int = TOP_K, nprobe: Optional[int] = None, include_embeddings: bool = False
+    ) -> Dict[str, List[Dict]]:
+        """Same contract as retriever_pipeline.retrieve_top_k: {index_name: [result dicts]}."""
+        return {self.name: self.retrieve_batch([query_embedding], top_k, nprobe, include_embeddings)[0]}
+
+
+def get_faiss_retriever(name: str = FAISS_INDEX_NAME, store_dir: str = STORE_DIR) -> FaissRetriever:
+    """Process-wide retriever per index (loaded lazily, reloaded after a rebuild)."""
+    key = os.path.join(store_dir, name)
+    retriever = _retrievers.get(key)
+    if retriever is None:
+        with _retrievers_lock:
+            retriever = _retrievers.get(key)
+            if retriever is None:
+                retriever = _retrievers[key] = FaissRetriever(name, store_dir)
+    return retriever
@@ -0,0 +1,105 @@
+# scripts/index_router.py
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from metrics_analysis import BENCHMARK_RESULTS, RECALL_FLOOR, get_best_index, load_benchmark_results
+
+# ---------- CONFIG ----------
+DEFAULT_INDEX = "pdf_hnsw_index"     # used until benchmark results exist
+REFRESH_INTERVAL_SEC = 3600          # re-read benchmark results at least this often
+CORPUS_CHECK_INTERVAL_SEC = 60       # how often to poll the corpus size
+CORPUS_INDEX = "pdf_flat_index"      # index whose doc count defines "corpus size"
+AUTO_REBENCHMARK = False             # re-run benchmark_indexes when the corpus size changes
+
+
+def _opensearch_corpus_size() -> int:
+    from opensearch_connector import client
+    return client.count(index=CORPUS_INDEX)["count"]
+
+
+class IndexRouter:
+    """
+    Picks the single index to query: the one meeting `recall_floor` at the lowest p95 latency
+    in the latest benchmark_indexes results (see metrics_analysis.get_best_index).
+
+    The choice is cached and re-evaluated when REFRESH_INTERVAL_SEC has passed, when the
+    results file changes on disk, or when the corpus size differs from the last evaluation.
+    """
+
+    def __init__(
+        self,
+        results_path: str = BENCHMARK_RESULTS,
+        recall_floor: float = RECALL_FLOOR,
+        refresh_interval_sec: float = REFRESH_INTERVAL_SEC,
+        corpus_size_fn: Callable[[], int] = _opensearch_corpus_size,
+        default_index: str = DEFAULT_INDEX,
+        auto_rebenchmark: bool = AUTO_REBENCHMARK
+    ):
+        self.results_path = results_path
+        self.recall_floor = recall_floor
+        self.refresh_interval_sec = refresh_interval_sec
+        self.corpus_size_fn = corpus_size_fn
+        self.default_index = default_index
+        self.auto_rebenchmark = auto_rebenchmark
+
+        self.best_index: Optional[str] = None
+        self.evaluated_at = 0.0
+        self.results_mtime: Optional[float] = None
+        self.corpus_size: Optional[int] = None
+        self.corpus_checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _results_mtime(self) -> Optional[float]:
+        return os.path.getmtime(self.results_path) if os.path.exists(self.results_path) else None
+
+    def _current_corpus_size(self) -> Optional[int]:
+        try:
+            return self.corpus_size_fn()
+        except Exception as e:
+            print(f"⚠️ Could not read corpus size: {e}")
+            return self.corpus_size
+
+    def _needs_refresh(self, now: float) -> bool:
+        if self.best_index is None or now - self.evaluated_at >= self.refresh_interval_sec:
+            return True
+        if self._results_mtime() != self.results_mtime:
+            return True
+        if now - self.corpus_checked_at >= CORPUS_CHECK_INTERVAL_SEC:
+            self.corpus_checked_at = now
+            return self._current_corpus_size() != self.corpus_size
+        return False
+
+    def refresh(self) -> str:
+        """Re-evaluate now (re-benchmarking first if enabled and the corpus changed)."""
+        now = time.time()
+        corpus_size = self._current_corpus_size()
+
+        if self.auto_rebenchmark and self.corpus_size is not None and corpus_size != self.corpus_size:
+            from benchmark_indexes import run_benchmark
+            print(f"🔁 Corpus size changed ({self.corpus_size} → {corpus_size}); re-running benchmark...")
+            run_benchmark()
+
+        try:
+            results = load_benchmark_results(self.results_path, self.recall_floor)
+            self.best_index = get_best_index("hybrid")
+            measured_on = next(iter(results.values()), {}).get("corpus_size")
+            if measured_on is not None and corpus_size is not None and measured_on != corpus_size:
+                print(f"⚠️ Benchmark measured on {measured_on} docs, corpus now has {corpus_size}.")
+        except ValueError as e:
+            print(f"{e} Falling back to {self.default_index}.")
+            self.best_index = self.default_index
+
+        self.evaluated_at = now
+        self.results_mtime = self._results_mtime()
+        self.corpus_size = corpus_size
+        self.corpus_checked_at = now
+        return self.best_index
+
+    def select(self) -> str:
+        """Return the index to query, re-evaluating only when something changed."""
+        with self._lock:
+            if self._needs_refresh(time.time()):
+                self.refresh()
+            return self.best_index
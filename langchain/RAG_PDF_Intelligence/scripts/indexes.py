@@ -1,15 +1,19 @@
 from opensearch_connector import client
-import faiss
-import numpy as np
+from faiss_backend import build_faiss_index
 
 DIM = 384
+VECTOR_ENCODING = "fp32"  # 'fp32' (nmslib HNSW) or 'fp16' (faiss HNSW with the sq fp16 encoder: ~half the graph memory)
+FLAT_EF_SEARCH = 512
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 512
+HNSW_EF_SEARCH = 100      # the k-NN plugin default, set explicitly so benchmarks can match it
 
-def create_flat_index():
+def create_flat_index(index_name="pdf_flat_index", ef_search=FLAT_EF_SEARCH):
     body = {
         "settings": {
             "index": {
                 "knn": True,
-                "knn.algo_param.ef_search": 512
+                "knn.algo_param.ef_search": ef_search
             }
         },
         "mappings": {
@@ -22,14 +26,43 @@ def create_flat_index():
             }
         }
     }
-    client.indices.create(index="pdf_flat_index", body=body)
-    print("[✓] Flat index created.")
+    client.indices.create(index=index_name, body=body)
+    print(f"[✓] Flat index created: {index_name}")
 
-def create_hnsw_index():
+def _hnsw_method(m, ef_construction, encoding):
+    if encoding == "fp32":
+        return {
+            "name": "hnsw",
+            "engine": "nmslib",
+            "space_type": "cosinesimil",
+            "parameters": {
+                "ef_construction": ef_construction,
+                "m": m
+            }
+        }
+    if encoding == "fp16":
+        # MiniLM embeddings are unit-length, so inner product ranks like cosine
+        return {
+            "name": "hnsw",
+            "engine": "faiss",
+            "space_type": "innerproduct",
+            "parameters": {
+                "ef_construction": ef_construction,
+                "m": m,
+                "encoder": {"name": "sq", "parameters": {"type": "fp16"}}
+            }
+        }
+    raise ValueError("Unsupported vector encoding. Choose 'fp32' or 'fp16'.")
+
+def create_hnsw_index(
+    index_name="pdf_hnsw_index", m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, encoding=VECTOR_ENCODING,
+    ef_search=HNSW_EF_SEARCH
+):
     body = {
         "settings": {
             "index": {
-                "knn": True
+                "knn": True,
+                "knn.algo_param.ef_search": ef_search
             }
         },
         "mappings": {
@@ -37,30 +70,21 @@ def create_hnsw_index():
                 "embedding": {
                     "type": "knn_vector",
                     "dimension": DIM,
-                    "method": {
-                        "name": "hnsw",
-                        "engine": "nmslib",
-                        "space_type": "cosinesimil",
-                        "parameters": {
-                            "ef_construction": 512,
-                            "m": 16
-                        }
-                    }
+                    "method": _hnsw_method(m, ef_construction, encoding)
                 },
                 "text": {"type": "text"}
             }
         }
     }
-    client.indices.create(index="pdf_hnsw_index", body=body)
-    print("[✓] HNSW index created.")
+    client.indices.create(index=index_name, body=body)
+    print(f"[✓] HNSW index created: {index_name} (m={m}, {encoding})")
 
-def create_faiss_ivf_index(embedding_matrix, nlist=100):
-    quantizer = faiss.IndexFlatL2(DIM)
-    index_ivf = faiss.IndexIVFFlat(quantizer, DIM, nlist, faiss.METRIC_L2)
-    index_ivf.train(embedding_matrix)
-    index_ivf.add(embedding_matrix)
-    faiss.write_index(index_ivf, "ivf_index.faiss")
-    print("[✓] IVF index trained and saved.")
+def create_faiss_ivf_index(embedded_chunks, nlist=100, index_type="ivf"):
+    """
+    Train the local FAISS IVF index ('pdf_ivf_index') on real chunk embeddings
+    (output of generate_embeddings); see faiss_backend for IVF-PQ / OPQ and int8 / fp16 options.
+    """
+    return build_faiss_index(embedded_chunks, nlist=nlist, index_type=index_type)
 
 if __name__ == "__main__":
     if not client.indices.exists("pdf_flat_index"):
@@ -69,5 +93,9 @@ if __name__ == "__main__":
     if not client.indices.exists("pdf_hnsw_index"):
         create_hnsw_index()
 
-    dummy_vectors = np.random.rand(1000, DIM).astype("float32")
-    create_faiss_ivf_index(dummy_vectors)
+    import os
+    from embedder import generate_embeddings
+    from semantic_chunker import semantic_chunking
+
+    pdf_path = os.path.abspath("../data/business_report.pdf")
+    create_faiss_ivf_index(generate_embeddings(semantic_chunking(pdf_path)))
@@ -0,0 +1,496 @@
+# scripts/ingest_corpus.py
+#
+#   python ingest_corpus.py ../data
+#   python ingest_corpus.py --manifest nightly.txt --extract-workers 4 --index-workers 2
+#   python ingest_corpus.py ../data --sync
+#
+# Files flow through extract -> chunk -> embed -> index stages connected by bounded queues,
+# each stage with its own worker threads. Every finished file is checkpointed to a local
+# state file, so a crashed or interrupted run picks up where it stopped. With --sync only
+# the pages whose fingerprint changed since the last sync are re-extracted and re-embedded,
+# and their superseded chunks are deleted. Without --sync a file that was ingested before is
+# re-processed whole, and any of its chunks not produced this time are deleted.
+import argparse
+import glob
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from bulk_ingest import bulk_insert, delete_stale_chunks, make_doc_id, scan_embedded
+from embedder import generate_embeddings
+from faiss_backend import build_faiss_index
+from parallel_extraction import extract_all_chunks, page_fingerprints
+from semantic_chunker import iter_chunk_groups
+
+# ---------- CONFIG ----------
+STATE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../cache/ingest_state.jsonl"))
+INDEX_NAMES = ["pdf_flat_index", "pdf_hnsw_index"]
+STAGE_WORKERS = {"extract": 2, "chunk": 1, "embed": 1, "index": 2}   # threads per stage
+QUEUE_SIZE = 4              # files waiting between two stages (bounds memory held in flight)
+EXTRACTION_PROCESSES = max(1, (os.cpu_count() or 1) // STAGE_WORKERS["extract"])  # per file being extracted
+OCR_WORKERS = None          # Tesseract threads per extraction process; None = share the CPU budget (ocr_budget)
+SIMILARITY_THRESHOLD = 0.7
+REPORT_EVERY_SEC = 30       # progress line interval
+
+STAGES = ("extract", "chunk", "embed", "index")
+SYNC_FIELDS = ("sync", "file_hash", "pages")   # page-level history a sync diffs against
+_STOP = object()
+
+
+def ocr_budget(extract_workers: int, extraction_processes: int) -> int:
+    """
+    OCR threads per extraction process so that every concurrent Tesseract fits the CPU:
+    extract workers x processes per file x OCR threads per process <= cpu_count.
+    """
+    return max(1, (os.cpu_count() or 1) // max(1, extract_workers * extraction_processes))
+
+
+# ---------- INPUTS ----------
+def discover_pdfs(inputs: Iterable[str] = (), manifest: Optional[str] = None) -> List[str]:
+    """
+    Absolute, de-duplicated PDF paths from files / directories (searched recursively) and
+    an optional manifest: one path per line, '#' comments, relative to the manifest's folder.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths += sorted(glob.glob(os.path.join(item, "**", "*.pdf"), recursive=True))
+        else:
+            paths.append(item)
+
+    if manifest:
+        base_dir = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest) as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    paths.append(os.path.join(base_dir, line))
+
+    seen, unique = set(), []
+    for path in map(os.path.abspath, paths):
+        if path not in seen:
+            seen.add(path)
+            unique.append(path)
+    return unique
+
+
+def file_signature(path: str) -> Dict[str, int]:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def plan_sync(path: str, previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Diff a file against its last synced checkpoint.
+
+    Returns the new file hash and page fingerprints, `changed` (1-based pages to re-extract)
+    and `stale` (pages whose old chunks must go; None = every chunk of the source, used when
+    there is no page-level history yet, e.g. the first sync or an earlier full ingest).
+    """
+    digest = file_hash(path)
+    old_pages = previous.get("pages") if previous and previous.get("sync") else None
+    if old_pages is not None and previous.get("file_hash") == digest:
+        return {"file_hash": digest, "pages": old_pages, "changed": [], "stale": []}
+
+    pages = page_fingerprints(path)
+    if old_pages is None:
+        return {"file_hash": digest, "pages": pages, "changed": list(range(1, len(pages) + 1)), "stale": None}
+
+    changed = [
+        number for number, fingerprint in enumerate(pages, 1)
+        if number > len(old_pages) or old_pages[number - 1] != fingerprint
+    ]
+    removed = list(range(len(pages) + 1, len(old_pages) + 1))
+    return {"file_hash": digest, "pages": pages, "changed": changed, "stale": changed + removed}
+
+
+# ---------- CHECKPOINTS ----------
+class IngestState:
+    """
+    Per-file checkpoint log (JSON lines, last record per path wins).
+
+    A file counts as done when its record says so and its size / mtime still match; failed
+    or changed files are ingested again on the next run. The log is compacted when opened.
+    """
+
+    def __init__(self, path: str = STATE_PATH):
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a crash
+                    self.files[record["path"]] = record
+            self._compact()
+        self._log = open(path, "a")
+
+    def _compact(self) -> None:
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            for record in self.files.values():
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def is_done(self, path: str, signature: Dict[str, int]) -> bool:
+        record = self.files.get(path)
+        return bool(record) and record["status"] == "done" and record["signature"] == signature
+
+    def record(self, path: str, **fields) -> None:
+        record = {"path": path, "updated_at": time.time(), **fields}
+        self.files[path] = record
+        self._log.write(json.dumps(record) + "\n")
+        self._log.flush()
+
+    def close(self) -> None:
+        self._log.close()
+
+
+# ---------- STAGES ----------
+class Stage:
+    """
+    A pool of worker threads applying `fn` to tasks from `inbox` and passing them on.
+
+    A task whose step raises skips the remaining stages: it goes straight to `failed` (the
+    pipeline's final queue) with the error attached. Once every worker has seen a stop
+    marker, the last one forwards stop markers downstream.
+    """
+
+    def __init__(self, name: str, fn: Callable[[Dict], Dict], workers: int,
+                 inbox: queue.Queue, outbox: queue.Queue, failed: queue.Queue,
+                 downstream_workers: int = 1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.inbox, self.outbox, self.failed = inbox, outbox, failed
+        self.downstream_workers = downstream_workers
+        self.files = 0
+        self.chunks = 0
+        self.busy_sec = 0.0
+        self._running = self.workers
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True) for i in range(self.workers)
+        ]
+
+    def start(self) -> "Stage":
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _work(self) -> None:
+        while True:
+            task = self.inbox.get()
+            if task is _STOP:
+                with self._lock:
+                    self._running -= 1
+                    last = self._running == 0
+                if last:
+                    for _ in range(self.downstream_workers):
+                        self.outbox.put(_STOP)
+                return
+
+            start_time = time.perf_counter()
+            try:
+                task = self.fn(task)
+            except Exception as e:
+                task["error"] = f"{self.name}: {type(e).__name__}: {e}"
+                self.failed.put(task)
+                continue
+            finally:
+                elapsed = time.perf_counter() - start_time
+                with self._lock:
+                    self.busy_sec += elapsed
+
+            with self._lock:
+                self.files += 1
+                self.chunks += task["counts"].get(self.name, 0)
+            task["seconds"][self.name] = round(elapsed, 4)
+            self.outbox.put(task)
+
+    def stats(self, wall_sec: float) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "files": self.files,
+            "chunks": self.chunks,
+            "busy_sec": round(self.busy_sec, 2),
+            "files_per_sec": round(self.files / wall_sec, 3) if wall_sec > 0 else 0.0,
+            "chunks_per_sec": round(self.chunks / wall_sec, 2) if wall_sec > 0 else 0.0,
+            "utilization": round(self.busy_sec / (wall_sec * self.workers), 3) if wall_sec > 0 else 0.0,
+        }
+
+
+def make_steps(
+    index_names: List[str],
+    client,
+    extraction_processes: int = EXTRACTION_PROCESSES,
+    similarity_threshold: float = SIMILARITY_THRESHOLD,
+    use_cache: bool = True,
+    sync: bool = False,
+    ocr_workers: Optional[int] = None
+) -> Dict[str, Callable[[Dict], Dict]]:
+    """
+    Per-stage work functions; each consumes the previous stage's payload from the task.
+    With `sync`, extract only reads the changed pages, chunks never span pages, and index
+    deletes the superseded chunks once the new ones are upserted. Without it, a file
+    flagged "replace" (ingested before) has every chunk not in this run deleted.
+    """
+
+    def extract(task):
+        pages = None
+        if sync:
+            task["sync"] = plan_sync(task["path"], task.get("previous"))
+            pages = task["sync"]["changed"]
+        task["pdf_chunks"] = extract_all_chunks(
+            task["path"], max_workers=extraction_processes, use_cache=use_cache, pages=pages, ocr_workers=ocr_workers
+        ) if pages is None or pages else []
+        task["counts"]["extract"] = len(task["pdf_chunks"])
+        return task
+
+    def chunk(task):
+        task["chunks"] = list(iter_chunk_groups(
+            task.pop("pdf_chunks"), os.path.basename(task["path"]),
+            similarity_threshold=similarity_threshold, use_cache=use_cache, page_boundaries=sync
+        ))
+        task["counts"]["chunk"] = len(task["chunks"])
+        return task
+
+    def embed(task):
+        task["embedded"] = generate_embeddings(task.pop("chunks"), use_cache=use_cache)
+        task["counts"]["embed"] = len(task["embedded"])
+        return task
+
+    def index(task):
+        embedded = task.pop("embedded")
+        if embedded:
+            # One refresh for the whole run instead of one per file
+            stats = bulk_insert(embedded, index_names=index_names, client=client, refresh=False)
+            if stats["failed"]:
+                raise RuntimeError(f"{stats['failed']} bulk actions failed, e.g. {stats['errors'][:1]}")
+        task["counts"]["index"] = len(embedded)
+
+        if not sync and task.get("replace"):
+            # The file changed since it was ingested: drop the chunks this run did not produce
+            keep_ids = [make_doc_id(chunk["metadata"], chunk["content"]) for chunk in embedded]
+            task["counts"]["deleted"] = delete_stale_chunks(
+                os.path.basename(task["path"]), None, keep_ids, index_names, client
+            )
+        if sync:
+            plan = task.pop("sync")
+            if plan["stale"] is None or plan["stale"]:
+                keep_ids = [make_doc_id(chunk["metadata"], chunk["content"]) for chunk in embedded]
+                task["counts"]["deleted"] = delete_stale_chunks(
+                    os.path.basename(task["path"]), plan["stale"], keep_ids, index_names, client
+                )
+            task["counts"]["pages_changed"] = len(plan["changed"])
+            task["checkpoint"] = {"sync": True, "file_hash": plan["file_hash"], "pages": plan["pages"]}
+        return task
+
+    return {"extract": extract, "chunk": chunk, "embed": embed, "index": index}
+
+
+# ---------- RUN ----------
+def _report(stages: Dict[str, Stage], wall_sec: float, done: int, failed: int, total: int) -> None:
+    print(f"⏱️  {round(wall_sec, 1)}s | {done + failed}/{total} files ({failed} failed)")
+    for name, stage in stages.items():
+        stats = stage.stats(wall_sec)
+        print(f"   {name:<8} x{stats['workers']} files={stats['files']:<6} chunks={stats['chunks']:<8} "
+              f"{stats['files_per_sec']} files/s {stats['chunks_per_sec']} chunks/s "
+              f"busy={stats['busy_sec']}s util={stats['utilization']}")
+
+
+def ingest_corpus(
+    pdf_paths: List[str],
+    index_names: List[str] = None,
+    state_path: str = STATE_PATH,
+    stage_workers: Dict[str, int] = None,
+    queue_size: int = QUEUE_SIZE,
+    extraction_processes: int = EXTRACTION_PROCESSES,
+    similarity_threshold: float = SIMILARITY_THRESHOLD,
+    use_cache: bool = True,
+    restart: bool = False,
+    sync: bool = False,
+    client=None,
+    steps: Dict[str, Callable[[Dict], Dict]] = None,
+    ocr_workers: Optional[int] = OCR_WORKERS
+) -> Dict[str, Any]:
+    """
+    Run the staged pipeline over `pdf_paths`, skipping files already checkpointed as done
+    (unless `restart`). With `sync`, changed files are diffed page by page against their
+    checkpoint (see plan_sync); otherwise a file with any earlier checkpoint replaces all of
+    its chunks. Returns per-stage throughput and per-file outcome counts.
+    `steps` overrides the stage functions (e.g. a dry run without OpenSearch).
+    """
+    if client is None and steps is None:
+        from opensearch_connector import client
+    index_names = index_names or INDEX_NAMES
+    workers = {**STAGE_WORKERS, **(stage_workers or {})}
+    # Chunks are deleted by file name, so two PDFs sharing one would clobber each other
+    names = [os.path.basename(path) for path in pdf_paths]
+    clashes = sorted({name for name in names if names.count(name) > 1})
+    if clashes and sync:
+        raise ValueError(f"⚠️ Sync needs unique file names; duplicated: {clashes}")
+    if clashes:
+        print(f"⚠️ Duplicated file names, stale chunks will not be cleaned up for: {clashes}")
+    ocr_workers = ocr_workers or ocr_budget(workers["extract"], extraction_processes)
+    steps = steps or make_steps(
+        index_names, client, extraction_processes, similarity_threshold, use_cache, sync, ocr_workers
+    )
+
+    state = IngestState(state_path)
+    pending = []
+    for path in pdf_paths:
+        signature = file_signature(path)
+        if restart or not state.is_done(path, signature):
+            previous = state.files.get(path)
+            pending.append({
+                "path": path, "signature": signature, "counts": {}, "seconds": {},
+                "previous": None if restart else previous,
+                "replace": previous is not None and os.path.basename(path) not in clashes,
+            })
+    skipped = len(pdf_paths) - len(pending)
+    print(f"📚 {len(pdf_paths)} PDFs | {skipped} already ingested | {len(pending)} to process")
+
+    queues = [queue.Queue(maxsize=queue_size) for _ in STAGES] + [queue.Queue()]
+    stages = {}
+    for i, name in enumerate(STAGES):
+        downstream = workers[STAGES[i + 1]] if i + 1 < len(STAGES) else 1
+        stages[name] = Stage(name, steps[name], workers[name], queues[i], queues[i + 1], queues[-1], downstream)
+
+    def _feed():
+        for task in pending:
+            queues[0].put(task)
+        for _ in range(stages[STAGES[0]].workers):
+            queues[0].put(_STOP)
+
+    start_time = time.time()
+    for stage in stages.values():
+        stage.start()
+    threading.Thread(target=_feed, name="ingest-feed", daemon=True).start()
+
+    done, failed, indexed, deleted = 0, 0, 0, 0
+    last_report = start_time
+    try:
+        while done + failed < len(pending):
+            try:
+                task = queues[-1].get(timeout=0.5)
+            except queue.Empty:
+                task = None
+            if task is _STOP:
+                continue
+
+            if task is not None:
+                if "error" in task:
+                    failed += 1
+                    # Keep the last good page history, so the retry still only re-syncs changed pages
+                    previous = state.files.get(task["path"]) or {}
+                    synced = sync and previous.get("sync")
+                    history = {key: previous[key] for key in SYNC_FIELDS if key in previous} if synced else {}
+                    state.record(task["path"], status="failed", signature=task["signature"],
+                                 error=task["error"], **history)
+                    print(f"❌ {task['path']}: {task['error']}")
+                else:
+                    done += 1
+                    counts = task["counts"]
+                    indexed += counts.get("index", 0)
+                    deleted += counts.get("deleted", 0)
+                    state.record(task["path"], status="done", signature=task["signature"],
+                                 chunks=counts.get("index", 0), seconds=task["seconds"], **task.get("checkpoint", {}))
+                    if "pages_changed" in counts:
+                        delta = f" ({counts['pages_changed']} pages changed, {counts.get('deleted', 0)} stale deleted)"
+                    else:
+                        delta = f" ({counts['deleted']} stale deleted)" if counts.get("deleted") else ""
+                    print(f"✅ [{done + failed}/{len(pending)}] {os.path.basename(task['path'])}: "
+                          f"{counts.get('index', 0)} chunks{delta} in {round(sum(task['seconds'].values()), 2)}s")
+
+            if time.time() - last_report >= REPORT_EVERY_SEC:
+                _report(stages, time.time() - start_time, done, failed, len(pending))
+                last_report = time.time()
+    finally:
+        state.close()
+
+    if (indexed or deleted) and client is not None:
+        client.indices.refresh(index=",".join(index_names))
+
+    wall_sec = time.time() - start_time
+    _report(stages, wall_sec, done, failed, len(pending))
+    return {
+        "files": len(pdf_paths),
+        "skipped": skipped,
+        "done": done,
+        "failed": failed,
+        "chunks_indexed": indexed,
+        "chunks_deleted": deleted,
+        "elapsed_sec": round(wall_sec, 2),
+        "stages": {name: stage.stats(wall_sec) for name, stage in stages.items()},
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Ingest a corpus of PDFs into the RAG indexes.")
+    parser.add_argument("inputs", nargs="*", help="PDF files or directories (searched recursively)")
+    parser.add_argument("--manifest", help="text file listing PDFs, one path per line")
+    parser.add_argument("--indexes", default=",".join(INDEX_NAMES), help="comma-separated OpenSearch indexes")
+    parser.add_argument("--state", default=STATE_PATH, help="checkpoint file used to resume")
+    parser.add_argument("--restart", action="store_true", help="ignore checkpoints and re-ingest every file")
+    parser.add_argument("--sync", action="store_true",
+                        help="incremental: re-process only changed pages and delete their stale chunks")
+    for name in STAGES:
+        parser.add_argument(f"--{name}-workers", type=int, default=STAGE_WORKERS[name], help=f"threads in the {name} stage")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="files buffered between stages")
+    parser.add_argument("--extraction-processes", type=int, default=EXTRACTION_PROCESSES,
+                        help="extraction processes per file in the extract stage")
+    parser.add_argument("--ocr-workers", type=int, default=OCR_WORKERS,
+                        help="Tesseract threads per extraction process (default: fit the CPU budget)")
+    parser.add_argument("--similarity-threshold", type=float, default=SIMILARITY_THRESHOLD)
+    parser.add_argument("--no-cache", action="store_true", help="bypass the extraction and embedding caches")
+    parser.add_argument("--build-faiss", action="store_true",
+                        help="rebuild the local FAISS index from the first OpenSearch index afterwards")
+    args = parser.parse_args(argv)
+
+    pdf_paths = discover_pdfs(args.inputs, args.manifest)
+    if not pdf_paths:
+        parser.error("no PDFs found; pass files, directories or --manifest")
+
+    from opensearch_connector import client
+
+    index_names = [name.strip() for name in args.indexes.split(",") if name.strip()]
+    result = ingest_corpus(
+        pdf_paths,
+        index_names=index_names,
+        state_path=args.state,
+        stage_workers={name: getattr(args, f"{name}_workers") for name in STAGES},
+        queue_size=args.queue_size,
+        extraction_processes=args.extraction_processes,
+        similarity_threshold=args.similarity_threshold,
+        use_cache=not args.no_cache,
+        restart=args.restart,
+        sync=args.sync,
+        client=client,
+        ocr_workers=args.ocr_workers,
+    )
+
+    if args.build_faiss and result["done"]:
+        build_faiss_index(scan_embedded(index_names[0], client))
+
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,63 @@
 import os
-import uuid
 from opensearch_connector import client  # ✅ Reuse the existing connection
-from embedder import generate_embeddings
-from semantic_chunker import semantic_chunking
-
-# Load and chunk the PDF
-pdf_path = os.path.abspath("../data/business_report.pdf")
-chunks = semantic_chunking(pdf_path)
-
-# Generate embeddings
-embedded_chunks = generate_embeddings(chunks)
-
-# Index names
-index_names = ["pdf_flat_index", "pdf_hnsw_index", "pdf_ivf_index"]
-
-# Insert documents into each index
-for chunk in embedded_chunks:
-    doc = {
-        "text": chunk["content"],
-        "embedding": chunk["embedding"],
-        **chunk["metadata"]  # page, etc.
-    }
-
-    for index_name in index_names:
-        client.index(
-            index=index_name,
-            id=str(uuid.uuid4()),  # unique document ID
-            body=doc
-        )
-
-print(f"✅ Inserted {len(embedded_chunks)} documents into each index.")
-
-results = client.search(
-    index="pdf_flat_index",
-    body={"query": {"match_all": {}}, "size": 5}
-)
-
-for hit in results["hits"]["hits"]:
-    print("\n📄 Document:")
-    print("Text:", hit["_source"]["text"][:100], "...")
-    print("Vector (first 5):", hit["_source"]["embedding"][:5])
-    print("Page:", hit["_source"].get("page"))
+from embedder import iter_embeddings
+from semantic_chunker import iter_semantic_chunks
+from bulk_ingest import bulk_insert, scan_embedded
+from faiss_backend import build_faiss_index
+
+# OpenSearch index names (pdf_ivf_index is the local FAISS backend)
+INDEX_NAMES = ["pdf_flat_index", "pdf_hnsw_index"]
+PDF_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../data/business_report.pdf"))
+
+
+def insert_pdf(pdf_path: str = PDF_PATH, index_names=None):
+    """
+    Ingest a single PDF. The PDF is streamed: chunks are embedded and indexed while later
+    pages are still being extracted, and none are kept in memory. The local FAISS index is
+    not touched; call rebuild_faiss() once after a batch (see insert_pdfs). For whole
+    corpora use ingest_corpus.py.
+    """
+    index_names = index_names or INDEX_NAMES
+    embedded_chunks = iter_embeddings(iter_semantic_chunks(pdf_path))
+
+    # Bulk-insert into each index (deterministic ids → re-running is an upsert)
+    stats = bulk_insert(embedded_chunks, index_names=index_names, client=client)
+
+    print(f"✅ Inserted {stats['indexed'] // len(index_names)} documents into each index.")
+    return stats
+
+
+def rebuild_faiss(index_names=None):
+    """
+    Re-train pdf_ivf_index from a scan of the (refreshed) first index, so it mirrors OpenSearch.
+    Its cost grows with the corpus, so run it once per batch of inserts, not per file.
+    """
+    index_names = index_names or INDEX_NAMES
+    return build_faiss_index(scan_embedded(index_names[0], client))
+
+
+def insert_pdfs(pdf_paths, index_names=None, build_faiss: bool = True):
+    """insert_pdf for each file, then one FAISS rebuild for the whole batch."""
+    stats = [insert_pdf(pdf_path, index_names) for pdf_path in pdf_paths]
+    if build_faiss and any(item["indexed"] for item in stats):
+        rebuild_faiss(index_names)
+    return stats
+
+
+def main():
+    insert_pdfs([PDF_PATH])
+
+    results = client.search(
+        index="pdf_flat_index",
+        body={"query": {"match_all": {}}, "size": 5}
+    )
+
+    for hit in results["hits"]["hits"]:
+        print("\n📄 Document:")
+        print("Text:", hit["_source"]["text"][:100], "...")
+        print("Vector (first 5):", hit["_source"]["embedding"][:5])
+        print("Page:", hit["_source"].get("page"))
+
+
+if __name__ == "__main__":
+    main()
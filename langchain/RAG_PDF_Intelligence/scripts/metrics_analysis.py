@@ -1,91 +1,123 @@
+import json
 import time
-from opensearch_connector import client
-from embedder import generate_embeddings
-from semantic_chunker import semantic_chunking
+from retriever_pipeline import retrieve_top_k
+from benchmark_indexes import LATEST_RESULTS, run_benchmark
 import os
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 # ---------- CONFIG ----------
 TOP_K = 5
-SIMILARITY_METRIC = "cosine"  # or 'l2'
 INDEX_NAMES = ["pdf_flat_index", "pdf_hnsw_index", "pdf_ivf_index"]
 EMBEDDING_DIM = 384
+BENCHMARK_RESULTS = LATEST_RESULTS
+RECALL_FLOOR = 0.9   # 'hybrid' picks the fastest index whose deployed config reaches this recall@k
 
-# Store results here to be reused
+# Store results here to be reused (measured deployed configuration per index)
 performance_results: Dict[str, Dict] = {}
 
 
 def evaluate_retrieval(query_embedding: List[float]) -> Dict[str, Dict]:
     """
-    Evaluate top-K retrieval performance for each index.
-    Returns a dictionary with average score, time, and top scores.
+    Quick single-query sanity check: native k-NN top-K from each index.
+    Returns a dictionary with average score, time, and top scores per index.
+    Use benchmark_indexes.run_benchmark() for recall/latency numbers.
     """
-    global performance_results
-    performance_results = {}
+    quick_results = {}
 
     for index_name in INDEX_NAMES:
-        start_time = time.time()
-        response = client.search(
-            index=index_name,
-            body={
-                "size": 1000,
-                "_source": ["text", "embedding", "page_number", "chunk_id"],
-                "query": {"match_all": {}}
-            }
-        )
-        hits = response["hits"]["hits"]
-
-        scores = []
-        for hit in hits:
-            doc_vec = np.array(hit["_source"]["embedding"])
-
-            if SIMILARITY_METRIC == "cosine":
-                score = np.dot(query_embedding, doc_vec) / (
-                    np.linalg.norm(query_embedding) * np.linalg.norm(doc_vec)
-                )
-            elif SIMILARITY_METRIC == "l2":
-                score = -np.linalg.norm(query_embedding - doc_vec)
-            else:
-                score = 0
-
-            scores.append(score)
-
-        top_scores = sorted(scores, reverse=True)[:TOP_K]
-        avg_score = np.mean(top_scores)
-        end_time = time.time()
+        start_time = time.perf_counter()
+        docs = retrieve_top_k(query_embedding, index_names=[index_name], top_k=TOP_K)[index_name]
+        elapsed = time.perf_counter() - start_time
+
+        top_scores = [doc["score"] for doc in docs]
+        quick_results[index_name] = {
+            "average_top_k_score": round(float(np.mean(top_scores)), 4) if top_scores else 0.0,
+            "retrieval_time_sec": round(elapsed, 4),
+            "top_k_scores": [round(s, 4) for s in top_scores]
+        }
+
+    return quick_results
+
+
+def _best_row(rows: List[Dict], recall_key: str, recall_floor: float) -> Dict:
+    """Lowest p95 among rows meeting `recall_floor`, else the highest-recall row."""
+    passing = [row for row in rows if row[recall_key] >= recall_floor]
+    if passing:
+        return min(passing, key=lambda row: row["p95_ms"])
+    return max(rows, key=lambda row: (row[recall_key], -row["p95_ms"]))
+
+
+def load_benchmark_results(path: str = BENCHMARK_RESULTS, recall_floor: float = RECALL_FLOOR) -> Dict[str, Dict]:
+    """
+    Load benchmark_indexes output and keep, per index, the row measured with the configuration
+    that is actually deployed (flagged "deployed" by the benchmark). The best swept configuration
+    is reported alongside as `tuned_params` / `tuned_p95_ms` / `tuned_recall`, for information only.
+
+    Each entry also records its `transport`: OpenSearch latencies are timed over HTTP, FAISS
+    in-process, which is how each one is served here.
+    """
+    global performance_results
+
+    if not os.path.exists(path):
+        raise ValueError(f"⚠️ No benchmark results at {path}. Please run benchmark_indexes.run_benchmark() first.")
 
+    with open(path) as f:
+        payload = json.load(f)
+
+    k = payload.get("k", TOP_K)
+    recall_key = f"recall_at_{k}"
+    by_index: Dict[str, List[Dict]] = {}
+    for row in payload["results"]:
+        by_index.setdefault(row["index"], []).append(row)
+
+    performance_results = {}
+    for index_name, rows in by_index.items():
+        deployed = [row for row in rows if row.get("deployed")]
+        if not deployed:
+            continue  # only candidate configurations were measured for this index
+        current = _best_row(deployed, recall_key, recall_floor)
+        tuned = _best_row(rows, recall_key, recall_floor)
         performance_results[index_name] = {
-            "average_top_k_score": round(avg_score, 4),
-            "retrieval_time_sec": round(end_time - start_time, 4),
-            "top_k_scores": [round(s, 4) for s in top_scores]
+            "recall": current[recall_key],
+            "p95_ms": current["p95_ms"],
+            "qps": current["qps"],
+            "params": current["params"],
+            "transport": current.get("transport"),
+            "meets_recall_floor": current[recall_key] >= recall_floor,
+            "tuned_params": tuned["params"],
+            "tuned_recall": tuned[recall_key],
+            "tuned_p95_ms": tuned["p95_ms"],
+            "corpus_size": payload.get("corpus_size"),
+            "measured_at": payload.get("created_at"),
         }
 
+    if not performance_results:
+        raise ValueError(f"⚠️ No deployed-configuration rows in {path}. Please re-run benchmark_indexes.run_benchmark().")
     return performance_results
 
 
-def get_best_index(metric: str = "hybrid") -> str:
+def get_best_index(metric: str = "hybrid", results_path: Optional[str] = None) -> str:
     """
-    Returns the best performing index based on:
-    - 'score': highest average score
-    - 'time': fastest retrieval time
-    - 'hybrid': highest score first, then lower time as tie-breaker
+    Returns the best performing index from measured benchmark numbers:
+    - 'score': highest recall@k
+    - 'time': lowest p95 latency
+    - 'hybrid': lowest p95 among indexes meeting RECALL_FLOOR, else highest recall
     """
-    if not performance_results:
-        raise ValueError("⚠️ No performance results found. Please run evaluate_retrieval() first.")
+    if results_path or not performance_results:
+        load_benchmark_results(results_path or BENCHMARK_RESULTS)
 
     if metric == "score":
-        return max(performance_results, key=lambda k: performance_results[k]["average_top_k_score"])
+        return max(performance_results, key=lambda k: (performance_results[k]["recall"], -performance_results[k]["p95_ms"]))
 
     elif metric == "time":
-        return min(performance_results, key=lambda k: performance_results[k]["retrieval_time_sec"])
+        return min(performance_results, key=lambda k: performance_results[k]["p95_ms"])
 
     elif metric == "hybrid":
-        sorted_indexes = sorted(
-            performance_results.items(),
-            key=lambda x: (-x[1]["average_top_k_score"], x[1]["retrieval_time_sec"])
-        )
-        return sorted_indexes[0][0]
+        passing = [k for k, v in performance_results.items() if v["meets_recall_floor"]]
+        if passing:
+            return min(passing, key=lambda k: performance_results[k]["p95_ms"])
+        return get_best_index("score")
 
     else:
         raise ValueError("❌ Invalid metric. Choose from 'score', 'time', or 'hybrid'.")
@@ -93,6 +125,9 @@ def get_best_index(metric: str = "hybrid") -> str:
 
 # ---------- TEST ----------
 if __name__ == "__main__":
+    from embedder import generate_embeddings
+    from semantic_chunker import semantic_chunking
+
     print("📊 Running Metrics Evaluation...")
 
     pdf_path = os.path.abspath("../data/business_report.pdf")
@@ -100,18 +135,25 @@ if __name__ == "__main__":
     query_embed = generate_embeddings([chunks[0]])[0]["embedding"]
 
     results = evaluate_retrieval(query_embed)
+    print("\n🔎 Single-query check:")
+    for index_name, metrics in results.items():
+        print(f"   - {index_name}: avg top-{TOP_K} score {metrics['average_top_k_score']} "
+              f"in {metrics['retrieval_time_sec']}s")
+
+    run_benchmark()
+    load_benchmark_results()
 
-    print("\n📈 Performance Summary:")
-    sorted_by_score_time = sorted(
-        results.items(),
-        key=lambda x: (-x[1]["average_top_k_score"], x[1]["retrieval_time_sec"])
-    )
+    print("\n📈 Performance Summary (deployed config per index):")
+    sorted_by_latency = sorted(performance_results.items(), key=lambda x: x[1]["p95_ms"])
 
-    for idx, (index_name, metrics) in enumerate(sorted_by_score_time, 1):
+    for idx, (index_name, metrics) in enumerate(sorted_by_latency, 1):
         print(f"\n{idx}. 📌 Index: {index_name}")
-        print(f"   - 🔼 Avg Top-{TOP_K} Score: {metrics['average_top_k_score']}")
-        print(f"   - ⏱️  Retrieval Time: {metrics['retrieval_time_sec']}s")
-        print(f"   - 📈 Top {TOP_K} Scores: {metrics['top_k_scores']}")
+        print(f"   - 🎯 Recall@{TOP_K}: {metrics['recall']} (floor {RECALL_FLOOR}: {'✅' if metrics['meets_recall_floor'] else '❌'})")
+        print(f"   - ⏱️  p95 Latency: {metrics['p95_ms']}ms | QPS: {metrics['qps']} ({metrics['transport']})")
+        print(f"   - ⚙️  Params: {metrics['params']}")
+        if metrics["tuned_params"] != metrics["params"]:
+            print(f"   - 🔧 Best swept: {metrics['tuned_params']} (recall {metrics['tuned_recall']}, "
+                  f"p95 {metrics['tuned_p95_ms']}ms)")
 
     best = get_best_index("hybrid")
     print(f"\n✅ Best performing index (hybrid): {best}")
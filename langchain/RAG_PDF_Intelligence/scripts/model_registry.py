@@ -0,0 +1,80 @@
+# scripts/model_registry.py
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sentence_transformers import SentenceTransformer
+
+# ---------- CONFIG ----------
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+WARMUP_TEXT = "warm-up"
+
+# (model_name, device) -> loaded model / load metrics
+_models: Dict[Tuple[str, str], SentenceTransformer] = {}
+_metrics: Dict[Tuple[str, str], Dict[str, float]] = {}
+_key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def canonical_model_name(model_name: str) -> str:
+    """'all-MiniLM-L6-v2' and 'sentence-transformers/all-MiniLM-L6-v2' are the same weights."""
+    if "/" not in model_name:
+        return f"sentence-transformers/{model_name}"
+    return model_name
+
+
+def _key(model_name: str, device: Optional[str]) -> Tuple[str, str]:
+    return canonical_model_name(model_name), device or "auto"
+
+
+def _key_lock(key: Tuple[str, str]) -> threading.Lock:
+    with _registry_lock:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def get_model(model_name: str = DEFAULT_MODEL_NAME, device: Optional[str] = None) -> SentenceTransformer:
+    """
+    Return the process-wide SentenceTransformer for (model_name, device), loading it on first use.
+    Concurrent callers for the same key wait on a per-key lock so the model is built exactly once.
+    """
+    key = _key(model_name, device)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _key_lock(key):
+        model = _models.get(key)
+        if model is None:
+            start_time = time.time()
+            model = SentenceTransformer(key[0], device=device)
+            _metrics[key] = {
+                "load_time_sec": round(time.time() - start_time, 4),
+                "loaded_at": time.time(),
+                "warmup_time_sec": 0.0,
+            }
+            _models[key] = model
+    return model
+
+
+def warm_up(model_name: str = DEFAULT_MODEL_NAME, device: Optional[str] = None) -> SentenceTransformer:
+    """Load the model and run one dummy encode so the first real query skips lazy CUDA/tokenizer init."""
+    model = get_model(model_name, device)
+    key = _key(model_name, device)
+    with _key_lock(key):  # get_model writes _metrics under the same lock
+        start_time = time.time()
+        model.encode([WARMUP_TEXT])
+        _metrics[key]["warmup_time_sec"] = round(time.time() - start_time, 4)
+    return model
+
+
+def get_load_metrics() -> Dict[str, Dict[str, float]]:
+    """Load/warm-up timings per loaded model, keyed by 'model_name@device'."""
+    return {f"{name}@{device}": dict(stats) for (name, device), stats in _metrics.items()}
+
+
+def clear_registry() -> None:
+    """Drop every cached model (mainly for tests / freeing GPU memory)."""
+    with _registry_lock:
+        _models.clear()
+        _metrics.clear()
+        _key_locks.clear()
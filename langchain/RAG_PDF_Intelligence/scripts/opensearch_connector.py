@@ -1,14 +1,205 @@
-from opensearchpy import OpenSearch
-
-# Initialize the client
-client = OpenSearch(
-    hosts=[{"host": "localhost", "port": 9200}],
-    http_compress=True,
-    use_ssl=False,  # because security is disabled
-)
-
-# Test connection
-if client.ping():
-    print("✅ Successfully connected to OpenSearch!")
-else:
+import asyncio
+import atexit
+import os
+import random
+import threading
+import weakref
+from typing import Any, Dict, List, Tuple
+
+from opensearchpy import AsyncOpenSearch, OpenSearch
+from opensearchpy.exceptions import ConnectionError, ConnectionTimeout, TransportError
+
+# ---------- CONFIG ----------
+OPENSEARCH_HOSTS = [{
+    "host": os.getenv("OPENSEARCH_HOST", "localhost"),
+    "port": int(os.getenv("OPENSEARCH_PORT", "9200")),
+}]
+POOL_MAXSIZE = 20                 # pooled keep-alive connections per host
+TIMEOUT_SEC = 30
+MAX_RETRIES = 3                   # sync client: transport retries; async helpers: with_retry attempts
+RETRY_ON_STATUS = (429, 502, 503, 504)
+BACKOFF_BASE_SEC = 0.2            # async helpers: exponential backoff with jitter
+BACKOFF_MAX_SEC = 5.0
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()   # event loop -> AsyncOpenSearch
+_bg_loop = None
+_bg_lock = threading.Lock()
+
+
+def _common_kwargs(max_retries: int = MAX_RETRIES) -> Dict[str, Any]:
+    return {
+        "hosts": OPENSEARCH_HOSTS,
+        "http_compress": True,
+        "use_ssl": False,  # because security is disabled
+        "timeout": TIMEOUT_SEC,
+        "max_retries": max_retries,
+        "retry_on_timeout": True,
+        "retry_on_status": RETRY_ON_STATUS,
+        "headers": {"Connection": "keep-alive"},
+    }
+
+
+def get_client() -> OpenSearch:
+    """Shared synchronous client, constructed on first use (no network I/O at import)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenSearch(pool_maxsize=POOL_MAXSIZE, **_common_kwargs())
+    return _client
+
+
+def get_async_client() -> AsyncOpenSearch:
+    """
+    AsyncOpenSearch for the running event loop (aiohttp sessions are loop-bound),
+    with a connection pool of POOL_MAXSIZE. Its transport does not retry: the async helpers
+    retry through with_retry, so a failing node gets MAX_RETRIES + 1 attempts, not (N+1)².
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncOpenSearch(maxsize=POOL_MAXSIZE, **_common_kwargs(max_retries=0))
+    return client
+
+
+def ping() -> bool:
+    """Explicit connectivity check (used to run as a side effect of importing this module)."""
+    if get_client().ping():
+        print("✅ Successfully connected to OpenSearch!")
+        return True
     print("❌ Failed to connect.")
+    return False
+
+
+def __getattr__(name):
+    # Keeps `from opensearch_connector import client` working, but lazily
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# ---------- ASYNC HELPERS ----------
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (ConnectionError, ConnectionTimeout)):
+        return True
+    return isinstance(error, TransportError) and error.status_code in RETRY_ON_STATUS
+
+
+async def with_retry(fn, *args, retries: int = MAX_RETRIES, **kwargs):
+    """Await fn(*args, **kwargs), retrying transient failures with exponential backoff + jitter."""
+    for attempt in range(retries + 1):
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries or not _is_retryable(e):
+                raise
+            delay = min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * 2 ** attempt)
+            await asyncio.sleep(delay * (0.5 + random.random() / 2))
+
+
+async def asearch_all(searches: List[Tuple[str, Dict]]) -> List[Dict]:
+    """Run (index_name, body) searches concurrently as separate requests; responses in input order."""
+    if not searches:
+        return []
+    client = get_async_client()
+    return list(await asyncio.gather(*(
+        with_retry(client.search, index=index_name, body=body) for index_name, body in searches
+    )))
+
+
+async def asearch_many(requests: Dict[str, Dict]) -> Dict[str, Dict]:
+    """
+    Search several indexes concurrently ({index_name: body} -> {index_name: response}),
+    so fan-out latency is the slowest index rather than the sum of all of them.
+    """
+    names = list(requests)
+    responses = await asearch_all([(name, requests[name]) for name in names])
+    return dict(zip(names, responses))
+
+
+async def amsearch(searches: List[Tuple[str, Dict]]) -> List[Dict]:
+    """One _msearch round trip for many (index_name, body) searches; responses in input order."""
+    if not searches:
+        return []
+    body = []
+    for index_name, search_body in searches:
+        body.append({"index": index_name})
+        body.append(search_body)
+    response = await with_retry(get_async_client().msearch, body=body)
+    return response["responses"]
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """A long-lived event loop thread, so sync callers reuse one pooled async client."""
+    global _bg_loop
+    if _bg_loop is None:
+        with _bg_lock:
+            if _bg_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="opensearch-async", daemon=True).start()
+                _bg_loop = loop
+    return _bg_loop
+
+
+def _loop_for_sync_caller(awaitable) -> asyncio.AbstractEventLoop:
+    # Blocking on the background loop from its own thread would wait forever
+    loop = _background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        awaitable.close()
+        raise RuntimeError("⚠️ Sync OpenSearch helper called from the connector's event loop; await the async API instead.")
+    return loop
+
+
+def run_sync(coro):
+    """Run a coroutine on the background loop and block for its result (for sync callers)."""
+    return asyncio.run_coroutine_threadsafe(coro, _loop_for_sync_caller(coro)).result()
+
+
+def iter_sync(agen):
+    """Drive an async generator on the background loop from synchronous code."""
+    loop = _loop_for_sync_caller(agen)
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+
+def search_many(requests: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Sync wrapper around asearch_many."""
+    return run_sync(asearch_many(requests))
+
+
+def msearch(searches: List[Tuple[str, Dict]]) -> List[Dict]:
+    """Sync wrapper around amsearch."""
+    return run_sync(amsearch(searches))
+
+
+async def _close_async_client():
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+@atexit.register
+def close():
+    """Close pooled connections (the background loop's async client and the sync client)."""
+    global _client
+    if _bg_loop is not None and _bg_loop.is_running():
+        run_sync(_close_async_client())
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+if __name__ == "__main__":
+    ping()
@@ -0,0 +1,129 @@
+# scripts/page_source.py
+from typing import Iterator, List, Optional
+
+import fitz
+import pdfplumber
+
+# ---------- CONFIG ----------
+SHRINK_EVERY = 16   # pages between MuPDF store trims (keeps memory flat on large scans)
+
+
+class PageView:
+    """
+    One decoded fitz page shared by the text, table and image extractors.
+
+    Every accessor is computed on first use and cached, so each extractor reads the same
+    decoded page instead of re-opening the file. Like the document it comes from, a view
+    must be used from the thread that owns the PageSource (except `plumber_page`).
+    """
+
+    def __init__(self, source: "PageSource", index: int):
+        self.source = source
+        self.index = index
+        self.number = index + 1   # 1-based, as stored on PDFChunk.page
+        self.page = source.doc[index]
+        self._text: Optional[str] = None
+        self._images: Optional[List[tuple]] = None
+        self._drawings: Optional[List[dict]] = None
+        self._tables = None
+        self._plumber_page = None
+
+    @property
+    def doc(self):
+        return self.source.doc
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.page.get_text()
+        return self._text
+
+    @property
+    def images(self) -> List[tuple]:
+        """Image entries of page.get_images(full=True): (xref, smask, width, height, ...)."""
+        if self._images is None:
+            self._images = self.page.get_images(full=True)
+        return self._images
+
+    def image_bytes(self, xref: int) -> bytes:
+        return self.doc.extract_image(xref)["image"]
+
+    @property
+    def drawings(self) -> List[dict]:
+        """Vector paths of the page (page.get_drawings()); cheap compared with any table finder."""
+        if self._drawings is None:
+            self._drawings = self.page.get_drawings()
+        return self._drawings
+
+    @property
+    def table_candidates(self):
+        """Tables located by PyMuPDF's table finder on this page (no second parse of the file)."""
+        if self._tables is None:
+            self._tables = self.page.find_tables().tables
+        return self._tables
+
+    @property
+    def plumber_page(self):
+        """The matching pdfplumber page; the pdfplumber handle is only opened if some page asks for it."""
+        if self._plumber_page is None:
+            self._plumber_page = self.source.plumber.pages[self.index]
+        return self._plumber_page
+
+    def release(self) -> None:
+        """Drop everything this page decoded; called as soon as the extractors are done with it."""
+        if self._plumber_page is not None:
+            self._plumber_page.close()  # drop pdfplumber's per-page object cache
+        self._text = self._images = self._drawings = self._tables = self._plumber_page = None
+        self.page = None
+        self.source._page_released()
+
+
+class PageSource:
+    """
+    A PDF opened once for all extractors.
+
+    `pages()` yields a PageView per page and releases it when the consumer moves on;
+    MuPDF's object store is trimmed every SHRINK_EVERY pages so memory stays flat.
+    """
+
+    def __init__(self, pdf_path: str):
+        self.pdf_path = pdf_path
+        self.doc = fitz.open(pdf_path)
+        self._plumber = None
+        self._released = 0
+
+    def __len__(self) -> int:
+        return len(self.doc)
+
+    def __enter__(self) -> "PageSource":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def plumber(self):
+        if self._plumber is None:
+            self._plumber = pdfplumber.open(self.pdf_path)
+        return self._plumber
+
+    def pages(self, start: int = 0, end: Optional[int] = None) -> Iterator[PageView]:
+        for index in range(start, len(self.doc) if end is None else end):
+            view = PageView(self, index)
+            try:
+                yield view
+            finally:
+                view.release()
+
+    def _page_released(self) -> None:
+        self._released += 1
+        if self._released % SHRINK_EVERY == 0:
+            fitz.TOOLS.store_shrink(100)
+
+    def close(self) -> None:
+        if self._plumber is not None:
+            self._plumber.close()
+            self._plumber = None
+        if not self.doc.is_closed:
+            self.doc.close()
+        fitz.TOOLS.store_shrink(100)
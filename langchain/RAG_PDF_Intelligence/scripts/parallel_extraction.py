@@ -0,0 +1,230 @@
+# scripts/parallel_extraction.py
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from models import PDFChunk
+from extract_text import extract_page_text
+import extract_tables
+from extract_tables import extract_page_tables, page_may_have_tables
+from extract_images import OcrStage, limit_tesseract_threads, merge_ocr_stats
+from extraction_cache import CACHE_PATH, ExtractionCache, page_fingerprint
+from page_source import PageSource
+
+# ---------- CONFIG ----------
+EXTRACTION_WORKERS = os.cpu_count() or 1   # processes; 1 = extract in-process
+PAGES_PER_SHARD = 8                        # contiguous pages handled by one worker task
+TIME_BUDGET_SEC: Optional[float] = None    # per-document wall-clock budget (None = unlimited)
+USE_CACHE = True                           # reuse per-page results from extraction_cache
+SHARDS_IN_FLIGHT = 2                       # submitted-but-unconsumed shards per worker process
+
+
+def _extract_page(view, pool: ThreadPoolExecutor, ocr_stage: OcrStage) -> List[PDFChunk]:
+    """
+    Run the three extractors for one page concurrently, all reading the same PageView.
+
+    fitz documents are not thread-safe, so text, image bytes, the ruling-line pre-classifier
+    and the pymupdf table backend run on this thread; pdfplumber table detection and
+    Tesseract OCR (the OcrStage worker pool) then overlap. Pages the pre-classifier rules
+    out never reach a table finder.
+    """
+    ocr_futures = ocr_stage.submit_page(view)
+    backend = extract_tables.TABLE_BACKEND
+    table_chunks, table_future = [], None
+    if not extract_tables.PRECLASSIFY or page_may_have_tables(view):
+        if backend == "pdfplumber":
+            table_future = pool.submit(extract_page_tables, view, backend, False)
+        else:
+            table_chunks = extract_page_tables(view, backend, False)
+    text_chunks = extract_page_text(view)
+
+    if table_future is not None:
+        table_chunks = table_future.result()
+    return text_chunks + table_chunks + ocr_stage.collect(ocr_futures, view.number)
+
+
+def _cache_variant() -> str:
+    """
+    Table settings that change a page's output, folded into its cache key. Read through the
+    module at call time, so changing extract_tables.TABLE_BACKEND / PRECLASSIFY takes effect.
+    """
+    variant = f"{extract_tables.TABLE_BACKEND}|preclassify={int(extract_tables.PRECLASSIFY)}"
+    if extract_tables.PRECLASSIFY:
+        variant += (
+            f"|{extract_tables.MIN_RULING_LINES}|{extract_tables.MIN_EDGE_LENGTH}|{extract_tables.AXIS_TOLERANCE}"
+        )
+    return variant
+
+
+def _extract_shard(
+    pdf_path: str, start: int, end: int, cache_path: Optional[str] = None, ocr_workers: Optional[int] = None
+) -> Tuple[List[Tuple[int, List[PDFChunk]]], Dict[str, float]]:
+    """
+    Worker entry point: open one private PageSource and extract pages [start, end).
+    With a cache, pages whose fingerprint is already stored skip extraction entirely (and
+    pdfplumber is never opened if every page hits), and OCR text is shared with every other
+    shard through the cache's ocr table. Returns (pages, OCR stats).
+    """
+    results = []
+    cache = ExtractionCache(cache_path) if cache_path else None
+    ocr_stage = OcrStage(cache=cache, workers=ocr_workers)
+    variant = _cache_variant()
+    memo: Dict[int, bytes] = {}
+    try:
+        with PageSource(pdf_path) as source, ThreadPoolExecutor(max_workers=1) as pool:
+            for view in source.pages(start, end):
+                key = page_fingerprint(view.doc, view.page, variant=variant, memo=memo) if cache else None
+                chunks = cache.get(key, view.number) if cache else None
+
+                if chunks is None:
+                    chunks = _extract_page(view, pool, ocr_stage)
+                    if cache:
+                        cache.put(key, chunks)
+
+                results.append((view.number, chunks))
+    finally:
+        if cache:
+            cache.close()
+    return results, ocr_stage.stats()
+
+
+def _mp_context():
+    """
+    Start workers from a clean process rather than forking the caller: iter_pdf_chunks runs
+    inside ingest stage threads, next to the embedder, the connector's event loop and the OCR
+    pool, and a forked child could inherit a lock one of those threads held. The forkserver
+    preloads this module, so each worker starts with the extractors already imported.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+def page_count(pdf_path: str) -> int:
+    with PageSource(pdf_path) as source:
+        return len(source)
+
+
+def page_fingerprints(pdf_path: str) -> List[str]:
+    """Per-page content fingerprints (the extraction-cache keys), in page order."""
+    variant, memo = _cache_variant(), {}
+    with PageSource(pdf_path) as source:
+        return [page_fingerprint(view.doc, view.page, variant=variant, memo=memo) for view in source.pages()]
+
+
+def _shards(page_numbers: Iterable[int], n_pages: int, pages_per_shard: int) -> List[Tuple[int, int]]:
+    """Group 1-based page numbers into contiguous [start, end) index ranges of at most pages_per_shard."""
+    shards = []
+    for number in sorted(set(page_numbers)):
+        if not 1 <= number <= n_pages:
+            continue
+        index = number - 1
+        if shards and shards[-1][1] == index and index - shards[-1][0] < pages_per_shard:
+            shards[-1] = (shards[-1][0], index + 1)
+        else:
+            shards.append((index, index + 1))
+    return shards
+
+
+def iter_pdf_chunks(
+    pdf_path: str,
+    max_workers: int = None,
+    time_budget_sec: Optional[float] = TIME_BUDGET_SEC,
+    pages_per_shard: int = PAGES_PER_SHARD,
+    use_cache: bool = USE_CACHE,
+    pages: Optional[Iterable[int]] = None,
+    ocr_workers: Optional[int] = None,
+    ocr_stats: Optional[Dict[str, float]] = None
+) -> Iterator[PDFChunk]:
+    """
+    Extract text, table and OCR chunks from a PDF with pages sharded across a process pool.
+
+    Chunks are yielded in page order (text, then tables, then images within a page) as soon
+    as every earlier shard has finished. Raises TimeoutError if the whole document takes
+    longer than `time_budget_sec`. Unchanged pages are served from the extraction cache.
+    `pages` (1-based numbers) restricts extraction to those pages, e.g. the changed pages
+    of an incremental sync. `ocr_workers` sizes each process's OCR pool (default
+    extract_images.OCR_WORKERS). If an `ocr_stats` dict is passed, it is updated with this
+    call's OCR counters and timings, summed over shards. At most SHARDS_IN_FLIGHT shards per
+    worker are submitted ahead of the one being yielded, so finished results do not pile up.
+    """
+    max_workers = max_workers or EXTRACTION_WORKERS
+    cache_path = CACHE_PATH if use_cache else None
+    n_pages = page_count(pdf_path)
+    shards = _shards(range(1, n_pages + 1) if pages is None else pages, n_pages, pages_per_shard)
+    deadline = time.time() + time_budget_sec if time_budget_sec else None
+    shard_stats = []
+
+    def _record(stats):
+        shard_stats.append(stats)
+        if ocr_stats is not None:
+            ocr_stats.update(merge_ocr_stats(shard_stats))
+
+    # Small documents or a single worker: skip the process-pool overhead
+    if max_workers <= 1 or len(shards) <= 1:
+        for start, end in shards:
+            if deadline and time.time() > deadline:
+                raise TimeoutError(f"Extraction of {pdf_path} exceeded {time_budget_sec}s budget.")
+            results, stats = _extract_shard(pdf_path, start, end, cache_path, ocr_workers)
+            _record(stats)
+            for _, chunks in results:
+                yield from chunks
+        return
+
+    max_workers = min(max_workers, len(shards))
+    executor = ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=_mp_context(), initializer=limit_tesseract_threads
+    )
+    try:
+        pending, futures = deque(shards), deque()
+        while pending or futures:
+            while pending and len(futures) < SHARDS_IN_FLIGHT * max_workers:
+                start, end = pending.popleft()
+                futures.append(executor.submit(_extract_shard, pdf_path, start, end, cache_path, ocr_workers))
+            future = futures.popleft()
+            timeout = max(deadline - time.time(), 0) if deadline else None
+            try:
+                results, stats = future.result(timeout=timeout)
+            except FutureTimeout:
+                raise TimeoutError(f"Extraction of {pdf_path} exceeded {time_budget_sec}s budget.")
+            _record(stats)
+            for _, chunks in results:
+                yield from chunks
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_all_chunks(
+    pdf_path: str,
+    max_workers: int = None,
+    time_budget_sec: Optional[float] = TIME_BUDGET_SEC,
+    use_cache: bool = USE_CACHE,
+    pages: Optional[Iterable[int]] = None,
+    ocr_workers: Optional[int] = None,
+    ocr_stats: Optional[Dict[str, float]] = None
+) -> List[PDFChunk]:
+    """Eager convenience wrapper around iter_pdf_chunks."""
+    return list(iter_pdf_chunks(
+        pdf_path, max_workers=max_workers, time_budget_sec=time_budget_sec, use_cache=use_cache, pages=pages,
+        ocr_workers=ocr_workers, ocr_stats=ocr_stats
+    ))
+
+
+if __name__ == "__main__":
+    base_dir = os.path.dirname(__file__)
+    pdf_path = os.path.abspath(os.path.join(base_dir, "../data/business_report.pdf"))
+
+    start_time, ocr_stats = time.time(), {}
+    chunks = extract_all_chunks(pdf_path, ocr_stats=ocr_stats)
+    print(f"✅ Extracted {len(chunks)} chunks from {page_count(pdf_path)} pages "
+          f"with {EXTRACTION_WORKERS} workers in {round(time.time() - start_time, 2)}s")
+    print(f"🖼️ OCR: {ocr_stats}")
+
+    cache = ExtractionCache()
+    print(f"🗄️  Extraction cache: {cache.stats()}")
+    cache.close()
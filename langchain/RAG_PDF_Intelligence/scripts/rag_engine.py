@@ -1,9 +1,17 @@
 # rag_engine.py
 
-from opensearch_connector import client
+import asyncio
+import time
+from typing import Dict, List
+
+from opensearch_connector import iter_sync, run_sync
 from embedder import generate_embeddings
-from retriever_pipeline import retrieve_top_k
-from reranking import mmr_rerank
+from model_registry import warm_up, get_load_metrics
+from retriever_pipeline import aretrieve_top_k, aretrieve_top_k_batch, retrieve_top_k
+from index_router import IndexRouter
+from answer_cache import get_answer_cache
+from context_packer import pack_context
+from reranking import mmr_rerank, mmr_rerank_batch
 from langchain_core.prompts import PromptTemplate
 from docx import Document
 
@@ -15,6 +23,16 @@ from dotenv import load_dotenv
 # ---------- CONFIG ----------
 TOP_K_RETRIEVAL = 10
 TOP_N_FINAL = 3
+RETRIEVAL_MODE = "knn"  # or 'hybrid': BM25 + k-NN fused with RRF (see retriever_pipeline.FUSION_*)
+LLM_CONCURRENCY = 8   # max in-flight completions for run_rag_batch
+USE_ANSWER_CACHE = True  # serve repeat (semantically equivalent) questions from answer_cache
+USE_CONTEXT_PACKER = True  # dedup + trim + token budget (context_packer) before the LLM call
+
+# Per-stage timings (seconds) of the most recent run_rag_batch call
+last_batch_timings: Dict[str, float] = {}
+
+# Picks the index from the latest benchmark results (recall floor + lowest p95)
+index_router = IndexRouter()
 
 # Load environment variables
 load_dotenv()
@@ -38,35 +56,74 @@ QA_PROMPT = PromptTemplate.from_template(
     """
 )
 
-def run_rag_pipeline(query_text: str):
+def build_prompt(query_text: str, context_docs: List[Dict]) -> str:
+    context_text = "\n\n".join([doc["text"] for doc in context_docs])
+    return QA_PROMPT.format(context=context_text, question=query_text)
+
+
+def pack_prompt(query_text: str, query_embedding: List[float], context_docs: List[Dict]):
+    """Prompt for the LLM plus the packing report (None when the packer is disabled)."""
+    if not USE_CONTEXT_PACKER:
+        return build_prompt(query_text, context_docs), None
+    packed = pack_context(query_embedding, context_docs)
+    return build_prompt(query_text, packed["docs"]), packed
+
+
+def _packing_summary(packed) -> str:
+    if packed is None:
+        return "✂️ Context packing disabled"
+    return (f"✂️ Context: {packed['tokens']} tokens (saved {packed['tokens_saved']} of "
+            f"{packed['original_tokens']}, dropped {packed['duplicates_dropped']} near-duplicates)")
+
+
+def _cache_scope(index_name: str, mode: str) -> str:
+    # Answers retrieved in another mode come from different context, so they are cached apart
+    return index_name if mode == "knn" else f"{index_name}|{mode}"
+
+
+def _answer_text(answer) -> str:
+    # Extract only the content
+    if hasattr(answer, "content"):
+        return answer.content
+    return str(answer)
+
+
+def run_rag_pipeline(query_text: str, use_cache: bool = USE_ANSWER_CACHE, mode: str = RETRIEVAL_MODE):
     # Step 1: Embed the query
     query_chunk = {"content": query_text, "metadata": {}}
     embedded_query = generate_embeddings([query_chunk])[0]["embedding"]
 
     # Step 2: Get best index
-    best_index = "pdf_hnsw_index"
+    best_index = index_router.select()
     print(f"📌 Using best index: {best_index}")
 
-    # Step 3: Retrieve top-K docs
-    all_retrieved = retrieve_top_k(embedded_query)
+    # Repeat question on an unchanged corpus: skip retrieval, reranking and the LLM
+    if use_cache:
+        cached = get_answer_cache().lookup(embedded_query, _cache_scope(best_index, mode))
+        if cached:
+            print(f"⚡ Answer cache hit (similarity {round(cached['similarity'], 4)} to: {cached['query']!r})")
+            print("\n🧠 Final Answer:")
+            print(cached["answer"])
+            return query_text, cached["answer"], cached["docs"]
+
+    # Step 3: Retrieve top-K docs (only from the selected index)
+    all_retrieved = retrieve_top_k(
+        embedded_query, index_names=[best_index], top_k=TOP_K_RETRIEVAL, mode=mode,
+        include_embeddings=True, query_text=query_text
+    )
     retrieved_docs = all_retrieved[best_index]
 
     # Step 4: MMR Reranking
     final_docs = mmr_rerank(embedded_query, retrieved_docs, top_n=TOP_N_FINAL)
 
     # Step 5: Build context and run LLM
-    context_text = "\n\n".join([doc["text"] for doc in final_docs])
-    formatted_prompt = QA_PROMPT.format(context=context_text, question=query_text)
+    formatted_prompt, packed = pack_prompt(query_text, embedded_query, final_docs)
+    print(_packing_summary(packed))
 
     # Step 6: Run LLM   
-    answer = llm.invoke(formatted_prompt)
-
-    # Extract only the content
-    if hasattr(answer, "content"):
-        answer_text = answer.content
-    else:
-        answer_text = str(answer)
-
+    answer_text = _answer_text(llm.invoke(formatted_prompt))
+    if use_cache:
+        get_answer_cache().store(query_text, embedded_query, _cache_scope(best_index, mode), answer_text, final_docs)
 
     print("\n🧠 Final Answer:")
     print(answer_text)
@@ -80,6 +137,205 @@ def run_rag_pipeline(query_text: str):
     return query_text, answer_text, final_docs
 
 
+def _store_answers(scope: str, queries: List[str], query_embeddings, answers: List[str], docs: List[List[Dict]]):
+    cache = get_answer_cache()
+    for query, query_embedding, answer, query_docs in zip(queries, query_embeddings, answers, docs):
+        cache.store(query, query_embedding, scope, answer, query_docs)
+
+
+async def arun_rag_batch(
+    queries: List[str],
+    max_concurrency: int = LLM_CONCURRENCY,
+    mode: str = RETRIEVAL_MODE,
+    use_cache: bool = USE_ANSWER_CACHE
+):
+    """
+    Answer many questions at once: one embedding pass for all queries, one _msearch for
+    retrieval, one vectorized MMR pass, then llm.abatch with at most `max_concurrency`
+    completions in flight. `mode` is the retrieval mode ('knn' or 'hybrid'). Like
+    run_rag_pipeline, questions found in the answer cache skip retrieval and the LLM, and
+    fresh answers are stored.
+
+    Returns (query, answer, docs) tuples in input order, like run_rag_pipeline, and records
+    per-stage timings in `last_batch_timings`.
+    """
+    timings = {}
+    if not queries:
+        last_batch_timings.clear()
+        return []
+
+    # Step 1: Embed every query in one model call
+    start_time = time.perf_counter()
+    embedded = await asyncio.to_thread(generate_embeddings, [{"content": query, "metadata": {}} for query in queries])
+    query_embeddings = [item["embedding"] for item in embedded]
+    timings["embed_sec"] = time.perf_counter() - start_time
+
+    # Step 2: Pick the index and answer repeat questions from the cache
+    start_time = time.perf_counter()
+    best_index = await asyncio.to_thread(index_router.select)
+    scope = _cache_scope(best_index, mode)
+    cached = [None] * len(queries)
+    if use_cache:
+        cached = await asyncio.to_thread(
+            lambda: [get_answer_cache().lookup(query_embedding, scope) for query_embedding in query_embeddings]
+        )
+    pending = [i for i, hit in enumerate(cached) if not hit]
+    pending_queries = [queries[i] for i in pending]
+    pending_embeddings = [query_embeddings[i] for i in pending]
+    timings["cache_sec"] = time.perf_counter() - start_time
+
+    answers, final_docs, tokens_saved = [], [], 0
+    if pending:
+        # Step 3: Retrieve for the remaining queries through a single _msearch
+        start_time = time.perf_counter()
+        retrieved = await aretrieve_top_k_batch(
+            pending_embeddings, index_names=[best_index], top_k=TOP_K_RETRIEVAL, mode=mode,
+            include_embeddings=True, query_texts=pending_queries
+        )
+        timings["retrieve_sec"] = time.perf_counter() - start_time
+
+        # Step 4: Rerank every candidate list in one pass
+        start_time = time.perf_counter()
+        final_docs = mmr_rerank_batch(
+            pending_embeddings, [results[best_index] for results in retrieved], top_n=TOP_N_FINAL
+        )
+        timings["rerank_sec"] = time.perf_counter() - start_time
+
+        # Step 5: Pack each context into the token budget
+        start_time = time.perf_counter()
+        packed = await asyncio.to_thread(lambda: [
+            pack_prompt(query, query_embedding, docs)
+            for query, query_embedding, docs in zip(pending_queries, pending_embeddings, final_docs)
+        ])
+        prompts = [prompt for prompt, _ in packed]
+        tokens_saved = sum(report["tokens_saved"] for _, report in packed if report)
+        timings["pack_sec"] = time.perf_counter() - start_time
+
+        # Step 6: Run the LLM calls concurrently
+        start_time = time.perf_counter()
+        responses = await llm.abatch(prompts, config={"max_concurrency": max_concurrency})
+        answers = [_answer_text(response) for response in responses]
+        timings["llm_sec"] = time.perf_counter() - start_time
+
+        if use_cache:
+            await asyncio.to_thread(
+                _store_answers, scope, pending_queries, pending_embeddings, answers, final_docs
+            )
+
+    timings["total_sec"] = sum(timings.values())
+    last_batch_timings.clear()
+    last_batch_timings.update({stage: round(sec, 4) for stage, sec in timings.items()})
+    print(f"⏱️ Batch of {len(queries)} queries using {best_index} "
+          f"({len(queries) - len(pending)} from the answer cache): {last_batch_timings}")
+    print(f"✂️ Context packing saved {tokens_saved} prompt tokens across the batch")
+
+    results = [(query, hit["answer"], hit["docs"]) if hit else None for query, hit in zip(queries, cached)]
+    for i, answer, docs in zip(pending, answers, final_docs):
+        results[i] = (queries[i], answer, docs)
+    return results
+
+
+def _context_summary(doc: Dict) -> Dict:
+    """What the UI needs to show a source before the answer arrives (no embedding)."""
+    return {
+        "page_number": doc["metadata"]["page_number"],
+        "chunk_id": doc["metadata"]["chunk_id"],
+        "score": doc["score"],
+        "text": doc["text"][:100],
+    }
+
+
+async def astream_rag_pipeline(query_text: str, use_cache: bool = USE_ANSWER_CACHE, mode: str = RETRIEVAL_MODE):
+    """
+    Streaming run_rag_pipeline. Yields, in order:
+      {"type": "context", ...}  retrieved context metadata, as soon as reranking is done
+      {"type": "token", ...}    answer tokens from llm.astream as they arrive
+      {"type": "final", ...}    full answer, context docs, scores and timings
+    An answer cache hit yields the whole answer as a single token event.
+    """
+    start_time = time.perf_counter()
+
+    # Steps 1-4: embed, pick the index, retrieve and rerank (same as run_rag_pipeline)
+    query_chunk = {"content": query_text, "metadata": {}}
+    embedded_query = (await asyncio.to_thread(generate_embeddings, [query_chunk]))[0]["embedding"]
+    best_index = await asyncio.to_thread(index_router.select)
+
+    scope = _cache_scope(best_index, mode)
+    cached = await asyncio.to_thread(get_answer_cache().lookup, embedded_query, scope) if use_cache else None
+    if cached:
+        total_sec = round(time.perf_counter() - start_time, 4)
+        yield {"type": "context", "index": best_index, "docs": [_context_summary(doc) for doc in cached["docs"]]}
+        yield {"type": "token", "text": cached["answer"]}
+        yield {
+            "type": "final",
+            "query": query_text,
+            "answer": cached["answer"],
+            "index": best_index,
+            "docs": cached["docs"],
+            "scores": [doc["score"] for doc in cached["docs"]],
+            "cached": True,
+            "timings": {"retrieval_sec": total_sec, "first_token_sec": total_sec, "total_sec": total_sec},
+        }
+        return
+
+    all_retrieved = await aretrieve_top_k(
+        embedded_query, index_names=[best_index], top_k=TOP_K_RETRIEVAL, mode=mode,
+        include_embeddings=True, query_text=query_text
+    )
+    final_docs = mmr_rerank(embedded_query, all_retrieved[best_index], top_n=TOP_N_FINAL)
+    retrieval_sec = time.perf_counter() - start_time
+
+    yield {"type": "context", "index": best_index, "docs": [_context_summary(doc) for doc in final_docs]}
+
+    # Steps 5-6: stream the answer
+    parts, first_token_sec = [], None
+    prompt, packed = await asyncio.to_thread(pack_prompt, query_text, embedded_query, final_docs)
+    async for chunk in llm.astream(prompt):
+        text = _answer_text(chunk)
+        if not text:
+            continue
+        if first_token_sec is None:
+            first_token_sec = time.perf_counter() - start_time
+        parts.append(text)
+        yield {"type": "token", "text": text}
+
+    total_sec = time.perf_counter() - start_time
+    answer_text = "".join(parts)
+    if use_cache:
+        await asyncio.to_thread(get_answer_cache().store, query_text, embedded_query, scope, answer_text, final_docs)
+    yield {
+        "type": "final",
+        "query": query_text,
+        "answer": answer_text,
+        "index": best_index,
+        "docs": final_docs,
+        "scores": [doc["score"] for doc in final_docs],
+        "cached": False,
+        "context_tokens": packed["tokens"] if packed else None,
+        "tokens_saved": packed["tokens_saved"] if packed else 0,
+        "timings": {
+            "retrieval_sec": round(retrieval_sec, 4),
+            "first_token_sec": round(first_token_sec if first_token_sec is not None else total_sec, 4),
+            "total_sec": round(total_sec, 4),
+        },
+    }
+
+
+def stream_rag_pipeline(query_text: str, use_cache: bool = USE_ANSWER_CACHE, mode: str = RETRIEVAL_MODE):
+    """Synchronous generator over astream_rag_pipeline's events."""
+    return iter_sync(astream_rag_pipeline(query_text, use_cache, mode))
+
+
+def run_rag_batch(
+    queries: List[str],
+    max_concurrency: int = LLM_CONCURRENCY,
+    mode: str = RETRIEVAL_MODE,
+    use_cache: bool = USE_ANSWER_CACHE
+):
+    """Synchronous entry point for arun_rag_batch (runs on the connector's event loop)."""
+    return run_sync(arun_rag_batch(queries, max_concurrency, mode, use_cache))
+
+
     # Save to DOCX
 def save_answer_to_docx(query, answer, context_docs, output_path="../outputs/rag_response_output.docx"):
     doc = Document()
@@ -104,7 +360,34 @@ def save_answer_to_docx(query, answer, context_docs, output_path="../outputs/rag
     doc.save(output_path)
     print(f"\n📄 Document saved as: {output_path}")
 
+def save_stream_to_docx(events, output_path="../outputs/rag_response_output.docx"):
+    """
+    Consume a stream_rag_pipeline event stream, echoing tokens as they arrive,
+    then save the finished answer with save_answer_to_docx. Returns the final record.
+    """
+    final = None
+    for event in events:
+        if event["type"] == "context":
+            print(f"📚 Context from {event['index']}: " + ", ".join(
+                f"p.{doc['page_number']} ({round(doc['score'], 4)})" for doc in event["docs"]
+            ))
+            print("\n🧠 Answer: ", end="", flush=True)
+        elif event["type"] == "token":
+            print(event["text"], end="", flush=True)
+        elif event["type"] == "final":
+            final = event
+
+    if final is None:
+        raise ValueError("⚠️ Stream ended without a final record.")
+
+    print(f"\n\n⏱️ Timings: {final['timings']}")
+    save_answer_to_docx(final["query"], final["answer"], final["docs"], output_path)
+    return final
+
 if __name__ == "__main__":
+    # Load the embedding model up front so the query below measures steady-state latency
+    warm_up()
+    print(f"🔥 Embedding model ready: {get_load_metrics()}")
+
     sample_query = "How does the brain process images and what are the key areas involved in visual perception?"
-    query_text, answer, final_docs = run_rag_pipeline(sample_query)
-    save_answer_to_docx(query_text, answer, final_docs)
\ No newline at end of file
+    save_stream_to_docx(stream_rag_pipeline(sample_query))
\ No newline at end of file
@@ -1,7 +1,7 @@
 from opensearch_connector import client
 from embedder import generate_embeddings
 from semantic_chunker import semantic_chunking
-from embedder import generate_embeddings
+from scoring import CandidateMatrix, as_matrix, normalize_rows
 import numpy as np
 import os
 
@@ -13,10 +13,6 @@ EMBEDDING_DIM = 384
 LAMBDA_PARAM = 0.6    # MMR diversity-relevance balance
 
 
-
-def cosine_similarity(a, b):
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
-
 # ---------- Step 1: Retrieve from OpenSearch ----------
 def retrieve_from_hnsw(query_embedding):
     response = client.search(
@@ -44,35 +40,105 @@ def retrieve_from_hnsw(query_embedding):
 
 
 # ---------- Step 2: MMR Reranking ----------
-def mmr_rerank(query_embedding, documents, top_n=3, lambda_param=0.5):
+def _document_embeddings(documents, doc_embeddings=None):
     """
-    Rerank retrieved documents using Maximal Marginal Relevance (MMR).
+    Use embeddings that came back with the documents (or were passed in explicitly);
+    only documents without one are embedded, in a single batch through embedding_cache.
     """
-    # Step 1: Generate embeddings for retrieved documents
-    docs_for_embedding = [{"content": doc["text"], "metadata": {}} for doc in documents]
-    embedded_docs = generate_embeddings(docs_for_embedding)
+    if doc_embeddings is not None:
+        return doc_embeddings
 
-    for i, doc in enumerate(documents):
-        doc["embedding"] = embedded_docs[i]["embedding"]
+    missing = [i for i, doc in enumerate(documents) if doc.get("embedding") is None]
+    if missing:
+        embedded_docs = generate_embeddings(
+            [{"content": documents[i]["text"], "metadata": {}} for i in missing]
+        )
+        for i, embedded in zip(missing, embedded_docs):
+            documents[i]["embedding"] = embedded["embedding"]
 
-    doc_embeddings = np.array([doc["embedding"] for doc in documents])
-    selected = []
-    unselected = list(range(len(documents)))
+    return [doc["embedding"] for doc in documents]
 
-    for _ in range(min(top_n, len(documents))):
-        mmr_scores = []
 
-        for i in unselected:
-            sim_to_query = cosine_similarity(query_embedding, doc_embeddings[i])
-            sim_to_selected = max([cosine_similarity(doc_embeddings[i], doc_embeddings[j]) for j in selected], default=0)
-            mmr_score = lambda_param * sim_to_query - (1 - lambda_param) * sim_to_selected
-            mmr_scores.append((i, mmr_score))
+def _mmr_select(query_sims, pairwise_sims, valid, top_n, lambda_param):
+    """
+    Vectorized MMR selection for a batch of queries.
 
-        best_idx = max(mmr_scores, key=lambda x: x[1])[0]
-        selected.append(best_idx)
-        unselected.remove(best_idx)
+    query_sims: (Q, n) similarity of each candidate to its query
+    pairwise_sims: (Q, n, n) candidate-candidate similarity, computed once
+    valid: (Q, n) mask of real (non-padding) candidates
+    Keeps a running max-similarity-to-selected vector instead of recomputing it per step.
+    """
+    n_queries, n_docs = query_sims.shape
+    rows = np.arange(n_queries)
+    max_sim = np.zeros((n_queries, n_docs), dtype=np.float32)
+    available = valid.copy()
+    steps = min(top_n, n_docs)
+    selected = np.full((n_queries, steps), -1, dtype=np.int64)
 
-    return [documents[i] for i in selected]
+    for step in range(steps):
+        mmr_scores = lambda_param * query_sims - (1 - lambda_param) * max_sim
+        mmr_scores = np.where(available, mmr_scores, -np.inf)
+        best = np.argmax(mmr_scores, axis=1)
+        has_candidate = available[rows, best]
+        selected[:, step] = np.where(has_candidate, best, -1)
+        available[rows, best] = False
+
+        # Running max: the first pick replaces the empty-set default of 0
+        best_sims = pairwise_sims[rows, best]
+        max_sim = best_sims if step == 0 else np.maximum(max_sim, best_sims)
+
+    return selected
+
+
+def mmr_rerank(query_embedding, documents, top_n=3, lambda_param=0.5, doc_embeddings=None):
+    """
+    Rerank retrieved documents using Maximal Marginal Relevance (MMR).
+
+    Embeddings already attached to the documents (retrieve_top_k(..., include_embeddings=True))
+    are reused, so no model forward pass is needed at query time.
+    """
+    if not documents:
+        return []
+
+    candidates = CandidateMatrix(_document_embeddings(documents, doc_embeddings))
+    query_sims = candidates.cosine(query_embedding)
+    pairwise_sims = (candidates.normalized @ candidates.normalized.T)[None, :, :]
+    valid = np.ones(query_sims.shape, dtype=bool)
+
+    selected = _mmr_select(query_sims, pairwise_sims, valid, top_n, lambda_param)[0]
+    return [documents[i] for i in selected if i >= 0]
+
+
+def mmr_rerank_batch(query_embeddings, documents_per_query, top_n=3, lambda_param=0.5):
+    """
+    Rerank the candidate lists of many queries in one vectorized pass.
+    Candidate lists may differ in length; shorter ones are padded and masked out.
+
+    Returns:
+        One reranked document list per query, in input order.
+    """
+    n_queries = len(documents_per_query)
+    max_docs = max((len(docs) for docs in documents_per_query), default=0)
+    if n_queries == 0 or max_docs == 0:
+        return [[] for _ in range(n_queries)]
+
+    queries = normalize_rows(as_matrix(query_embeddings))
+    dim = queries.shape[1]
+    stacked = np.zeros((n_queries, max_docs, dim), dtype=np.float32)
+    valid = np.zeros((n_queries, max_docs), dtype=bool)
+    for q, docs in enumerate(documents_per_query):
+        if docs:
+            stacked[q, :len(docs)] = normalize_rows(as_matrix(_document_embeddings(docs)))
+            valid[q, :len(docs)] = True
+
+    query_sims = np.einsum("qnd,qd->qn", stacked, queries)
+    pairwise_sims = stacked @ stacked.transpose(0, 2, 1)
+
+    selected = _mmr_select(query_sims, pairwise_sims, valid, top_n, lambda_param)
+    return [
+        [docs[i] for i in selected[q] if i >= 0]
+        for q, docs in enumerate(documents_per_query)
+    ]
 
 
 # ---------- MAIN ----------
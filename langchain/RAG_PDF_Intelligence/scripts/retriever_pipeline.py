@@ -1,76 +1,348 @@
-from opensearch_connector import client
+import asyncio
+from opensearch_connector import amsearch, asearch_all, run_sync
 from typing import List, Dict
-import numpy as np
+from scoring import CandidateMatrix, score_batch, top_k_indices
+from faiss_backend import FAISS_INDEX_NAME, FaissRetriever, get_faiss_retriever
 
 # ---------- CONFIG ----------
 INDEX_NAMES = ["pdf_flat_index", "pdf_hnsw_index", "pdf_ivf_index"]
+LOCAL_INDEX_NAMES = {FAISS_INDEX_NAME}  # served in-process by faiss_backend, not OpenSearch
 TOP_K = 5
 SIMILARITY_METRIC = "cosine"  # Change to 'l2' for Euclidean
 EMBEDDING_DIM = 384  # depends on your embedding model
+RETRIEVAL_MODE = "knn"  # 'knn' = server-side ANN search, 'exact' = match_all + client-side scoring,
+                        # 'hybrid' = BM25 + k-NN fused (needs query_text)
+VECTOR_FIELD = "embedding"
+TEXT_FIELD = "text"
+FUSION_METHOD = "rrf"   # 'rrf' = reciprocal rank fusion, 'weighted' = blend of min-max normalized scores
+FUSION_WEIGHTS = {"bm25": 0.5, "knn": 0.5}
+RRF_K = 60              # rank constant from the RRF paper; larger flattens the rank curve
+HYBRID_CANDIDATE_FACTOR = 2  # each side of a hybrid query fetches top_k * this before fusion
+SOURCE_FIELDS = ["text", "page", "page_number", "chunk_id", "type", "source"]
+
+_missing_local: set = set()   # local indexes already reported as not built
 
 # ---------- HELPER FUNCTION ----------
 def cosine_similarity_score(query_vec, doc_vec):
     """Compute cosine similarity between two vectors."""
-    query_vec = np.array(query_vec)
-    doc_vec = np.array(doc_vec)
-    if np.linalg.norm(query_vec) == 0 or np.linalg.norm(doc_vec) == 0:
-        return 0
-    return np.dot(query_vec, doc_vec) / (np.linalg.norm(query_vec) * np.linalg.norm(doc_vec))
+    return float(score_batch(query_vec, doc_vec, "cosine")[0, 0])
 
 
 def l2_distance_score(query_vec, doc_vec):
     """Compute negative Euclidean distance (closer = higher score)."""
-    query_vec = np.array(query_vec)
-    doc_vec = np.array(doc_vec)
-    return -np.linalg.norm(query_vec - doc_vec)
+    return float(score_batch(query_vec, doc_vec, "l2")[0, 0])
+
+
+def _format_hit(hit: Dict, score: float, include_embeddings: bool = False) -> Dict:
+    """Convert an OpenSearch hit into the retriever's result dict."""
+    source = hit["_source"]
+    doc = {
+        "text": source["text"],
+        "metadata": {
+            "page_number": source.get("page_number", source.get("page")),
+            "chunk_id": source.get("chunk_id")
+        },
+        "score": score
+    }
+    if include_embeddings:
+        doc["embedding"] = source[VECTOR_FIELD]
+    return doc
+
 
+def _source_filter(include_embeddings: bool) -> Dict:
+    if include_embeddings:
+        return {"includes": SOURCE_FIELDS + [VECTOR_FIELD]}
+    return {"includes": SOURCE_FIELDS, "excludes": [VECTOR_FIELD]}
 
-# ---------- RETRIEVER FUNCTION ----------
-def retrieve_top_k(query_embedding: List[float]) -> Dict[str, List[Dict]]:
+
+def build_knn_query(query_embedding: List[float], top_k: int = TOP_K, include_embeddings: bool = False) -> Dict:
     """
-    Query all 3 indexes and return top K documents for each with score and metadata.
+    Build a k-NN search body against the knn_vector field defined in indexes.py.
+    The embedding is excluded from _source unless the caller wants it for reranking.
     """
+    return {
+        "size": top_k,
+        "_source": _source_filter(include_embeddings),
+        "query": {
+            "knn": {
+                VECTOR_FIELD: {
+                    "vector": [float(x) for x in query_embedding],
+                    "k": top_k
+                }
+            }
+        }
+    }
+
+
+def build_bm25_query(query_text: str, top_k: int = TOP_K, include_embeddings: bool = False) -> Dict:
+    """Lexical match on the analyzed text field, for exact figures and table labels."""
+    return {
+        "size": top_k,
+        "_source": _source_filter(include_embeddings),
+        "query": {"match": {TEXT_FIELD: {"query": query_text}}}
+    }
+
+
+def _exact_query() -> Dict:
+    """Legacy path: download every vector and score it client-side (capped at 1000 docs)."""
+    return {
+        "size": 1000,  # fetch all and filter later
+        "_source": SOURCE_FIELDS + [VECTOR_FIELD],
+        "query": {"match_all": {}}
+    }
+
+
+def _index_searches(
+    mode: str, query_embedding: List[float], query_text: str, top_k: int, include_embeddings: bool
+) -> List[Dict]:
+    """Search bodies to run against one OpenSearch index for one query."""
+    if mode == "knn":
+        # Let the index's HNSW/IVF/flat structure do the scoring server-side
+        return [build_knn_query(query_embedding, top_k, include_embeddings)]
+    if mode == "exact":
+        return [_exact_query()]
+    if mode == "hybrid":
+        if not query_text:
+            raise ValueError("⚠️ Hybrid retrieval needs the query text.")
+        depth = top_k * HYBRID_CANDIDATE_FACTOR
+        return [
+            build_bm25_query(query_text, depth, include_embeddings),
+            build_knn_query(query_embedding, depth, include_embeddings),
+        ]
+    raise ValueError("Unsupported retrieval mode. Choose 'knn', 'exact' or 'hybrid'.")
+
+
+def _local_retrievers(index_names: List[str]) -> Dict[str, FaissRetriever]:
+    """
+    FAISS retrievers for the local indexes in `index_names`. One that has not been built yet
+    is skipped with a warning (it then returns no hits) instead of failing the whole fan-out.
+    """
+    retrievers = {}
+    for name in index_names:
+        if name not in LOCAL_INDEX_NAMES:
+            continue
+        try:
+            retrievers[name] = get_faiss_retriever(name)
+        except FileNotFoundError as e:
+            if name not in _missing_local:
+                _missing_local.add(name)
+                print(f"{e} Skipping {name}.")
+    return retrievers
+
+
+def _hits(response: Dict) -> List[Dict]:
+    if "error" in response:  # a failed entry inside an _msearch response
+        raise RuntimeError(f"⚠️ Search failed: {response['error']}")
+    return response["hits"]["hits"]
+
+
+def fuse_hits(
+    ranked_hits: Dict[str, List[Dict]],
+    top_k: int = TOP_K,
+    method: str = FUSION_METHOD,
+    weights: Dict[str, float] = None,
+    rrf_k: int = RRF_K
+) -> List[tuple]:
+    """
+    Fuse ranked hit lists ({'bm25': hits, 'knn': hits}) by document _id.
+
+    'rrf' scores each document sum(weight / (rrf_k + rank)); 'weighted' blends each list's
+    scores after min-max normalization (a document missing from a list contributes 0; a list
+    whose scores are all equal, e.g. a single hit, counts as full strength).
+    Returns the top_k (hit, fused_score, {list_name: raw_score}) tuples, best first.
+    """
+    weights = weights or FUSION_WEIGHTS
+    fused, first_hit, components = {}, {}, {}
+    for name, hits in ranked_hits.items():
+        weight = weights.get(name, 0.0)
+        if method == "weighted" and hits:
+            scores = [hit["_score"] for hit in hits]
+            low, span = min(scores), max(scores) - min(scores)
+        elif method != "rrf":
+            raise ValueError("Unsupported fusion method. Choose 'rrf' or 'weighted'.")
+
+        for rank, hit in enumerate(hits, 1):
+            doc_id = hit["_id"]
+            first_hit.setdefault(doc_id, hit)
+            components.setdefault(doc_id, {})[name] = hit["_score"]
+            if method == "rrf":
+                contribution = 1.0 / (rrf_k + rank)
+            else:
+                contribution = (hit["_score"] - low) / span if span else 1.0
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight * contribution
+
+    ranked = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    return [(first_hit[doc_id], fused[doc_id], components[doc_id]) for doc_id in ranked]
+
+
+def _index_results(
+    responses: List[Dict],
+    mode: str,
+    query_embedding: List[float],
+    top_k: int,
+    include_embeddings: bool,
+    fusion: str = FUSION_METHOD,
+    weights: Dict[str, float] = None
+) -> List[Dict]:
+    """Turn one index's search response(s) into result dicts (scoring / fusing client-side)."""
+    if mode == "hybrid":
+        bm25_hits, knn_hits = (_hits(response) for response in responses)
+        results = []
+        for hit, score, components in fuse_hits({"bm25": bm25_hits, "knn": knn_hits}, top_k, fusion, weights):
+            doc = _format_hit(hit, score, include_embeddings)
+            doc["component_scores"] = components
+            results.append(doc)
+        return results
+
+    hits = _hits(responses[0])
+    if mode == "knn":
+        return [_format_hit(hit, hit["_score"], include_embeddings) for hit in hits]
+    if not hits:
+        return []
+
+    # Score every hit in one matmul, then take top-K with argpartition
+    candidates = CandidateMatrix([hit["_source"][VECTOR_FIELD] for hit in hits])
+    scores = candidates.scores(query_embedding, SIMILARITY_METRIC)[0]
+    return [
+        _format_hit(hits[i], float(scores[i]), include_embeddings)
+        for i in top_k_indices(scores, top_k)
+    ]
+
+
+# ---------- RETRIEVER FUNCTIONS ----------
+async def aretrieve_top_k(
+    query_embedding: List[float],
+    index_names: List[str] = None,
+    top_k: int = TOP_K,
+    mode: str = RETRIEVAL_MODE,
+    include_embeddings: bool = False,
+    nprobe: int = None,
+    query_text: str = None,
+    fusion: str = FUSION_METHOD,
+    weights: Dict[str, float] = None
+) -> Dict[str, List[Dict]]:
+    """
+    Async retrieve_top_k: every OpenSearch request (one per index, two per index in hybrid
+    mode) goes out concurrently through asyncio.gather while the local FAISS index is
+    searched in a worker thread, so the fan-out costs roughly the slowest request.
+    """
+    index_names = index_names or INDEX_NAMES
+    remote = [name for name in index_names if name not in LOCAL_INDEX_NAMES]
+    local = _local_retrievers(index_names)
+
+    per_index = {name: _index_searches(mode, query_embedding, query_text, top_k, include_embeddings) for name in remote}
+    searches = [(name, body) for name in remote for body in per_index[name]]
+    responses, *local_results = await asyncio.gather(
+        asearch_all(searches),
+        *(
+            asyncio.to_thread(retriever.retrieve_top_k, query_embedding, top_k, nprobe, include_embeddings)
+            for retriever in local.values()
+        )
+    )
+
     results = {}
+    responses = iter(responses)
+    for name in remote:
+        index_responses = [next(responses) for _ in per_index[name]]
+        results[name] = _index_results(index_responses, mode, query_embedding, top_k, include_embeddings, fusion, weights)
+    for local_result in local_results:
+        results.update(local_result)
+    # Keep the caller's index order
+    return {name: results.get(name, []) for name in index_names}
 
-    for index_name in INDEX_NAMES:
-        response = client.search(
-            index=index_name,
-            body={
-                "size": 1000,  # fetch all and filter later
-                "_source": ["text", "embedding", "page_number", "chunk_id"],
-                "query": {"match_all": {}}
-            }
+
+def retrieve_top_k(
+    query_embedding: List[float],
+    index_names: List[str] = None,
+    top_k: int = TOP_K,
+    mode: str = RETRIEVAL_MODE,
+    include_embeddings: bool = False,
+    nprobe: int = None,
+    query_text: str = None,
+    fusion: str = FUSION_METHOD,
+    weights: Dict[str, float] = None
+) -> Dict[str, List[Dict]]:
+    """
+    Query each index and return top K documents for each with score and metadata.
+
+    mode='knn' issues a native k-NN query so the ANN structure is used and the corpus
+    is not truncated; mode='exact' keeps the old match_all + client-side scoring path.
+    mode='hybrid' runs a BM25 match on `query_text` and a k-NN query in parallel against
+    each index and fuses them (`fusion` 'rrf' or 'weighted', per-side `weights`); 'score'
+    is then the fused score and 'component_scores' holds the raw BM25 / k-NN scores.
+    include_embeddings=True also returns each document's stored vector (used by mmr_rerank).
+    'pdf_ivf_index' is answered by the local FAISS backend (nprobe=None uses its default);
+    it has no text index, so it stays vector-only in hybrid mode, and until it has been built
+    it returns no hits.
+    Indexes are queried concurrently (see aretrieve_top_k).
+    """
+    return run_sync(aretrieve_top_k(
+        query_embedding, index_names, top_k, mode, include_embeddings, nprobe, query_text, fusion, weights
+    ))
+
+
+async def aretrieve_top_k_batch(
+    query_embeddings: List[List[float]],
+    index_names: List[str] = None,
+    top_k: int = TOP_K,
+    mode: str = RETRIEVAL_MODE,
+    include_embeddings: bool = False,
+    nprobe: int = None,
+    query_texts: List[str] = None,
+    fusion: str = FUSION_METHOD,
+    weights: Dict[str, float] = None
+) -> List[Dict[str, List[Dict]]]:
+    """
+    retrieve_top_k for many queries at once: every (query, OpenSearch index) search goes
+    out in a single _msearch request while FAISS searches the whole query batch in one call.
+    Returns one {index_name: [result dicts]} per query, in input order.
+    """
+    index_names = index_names or INDEX_NAMES
+    remote = [name for name in index_names if name not in LOCAL_INDEX_NAMES]
+    local = _local_retrievers(index_names) if len(query_embeddings) else {}
+    query_texts = query_texts or [None] * len(query_embeddings)
+
+    per_query = [
+        {name: _index_searches(mode, query_embedding, query_text, top_k, include_embeddings) for name in remote}
+        for query_embedding, query_text in zip(query_embeddings, query_texts)
+    ]
+    searches = [(name, body) for bodies in per_query for name in remote for body in bodies[name]]
+    responses, *local_docs = await asyncio.gather(
+        amsearch(searches),
+        *(
+            asyncio.to_thread(retriever.retrieve_batch, query_embeddings, top_k, nprobe, include_embeddings)
+            for retriever in local.values()
         )
+    )
 
-        hits = response["hits"]["hits"]
+    responses = iter(responses)
+    batch = [{} for _ in query_embeddings]
+    for query_embedding, bodies, results in zip(query_embeddings, per_query, batch):
+        for name in remote:
+            index_responses = [next(responses) for _ in bodies[name]]
+            results[name] = _index_results(index_responses, mode, query_embedding, top_k, include_embeddings, fusion, weights)
+    for name, docs in zip(local, local_docs):
+        for results, query_docs in zip(batch, docs):
+            results[name] = query_docs
 
-        # Compute similarity
-        scored_hits = []
-        for hit in hits:
-            source = hit["_source"]
-            doc_vec = source["embedding"]
+    return [{name: results.get(name, []) for name in index_names} for results in batch]
 
-            if SIMILARITY_METRIC == "cosine":
-                score = cosine_similarity_score(query_embedding, doc_vec)
-            elif SIMILARITY_METRIC == "l2":
-                score = l2_distance_score(query_embedding, doc_vec)
-            else:
-                raise ValueError("Unsupported similarity metric.")
-
-            scored_hits.append({
-                "text": source["text"],
-                "metadata": {
-                    "page_number": source.get("page_number"),
-                    "chunk_id": source.get("chunk_id")
-                },
-                "score": score
-            })
-
-        # Sort and take top-K
-        sorted_hits = sorted(scored_hits, key=lambda x: x["score"], reverse=True)[:TOP_K]
-        results[index_name] = sorted_hits
-
-    return results
+
+def retrieve_top_k_batch(
+    query_embeddings: List[List[float]],
+    index_names: List[str] = None,
+    top_k: int = TOP_K,
+    mode: str = RETRIEVAL_MODE,
+    include_embeddings: bool = False,
+    nprobe: int = None,
+    query_texts: List[str] = None,
+    fusion: str = FUSION_METHOD,
+    weights: Dict[str, float] = None
+) -> List[Dict[str, List[Dict]]]:
+    """Synchronous wrapper around aretrieve_top_k_batch (one _msearch for all queries)."""
+    return run_sync(aretrieve_top_k_batch(
+        query_embeddings, index_names, top_k, mode, include_embeddings, nprobe, query_texts, fusion, weights
+    ))
 
 
 # ---------- TEST ----------
@@ -0,0 +1,94 @@
+# scripts/scoring.py
+import numpy as np
+from typing import Sequence, Union
+
+MatrixLike = Union[Sequence[Sequence[float]], np.ndarray]
+
+SUPPORTED_METRICS = ("cosine", "l2")
+
+
+# ---------- HELPERS ----------
+def as_matrix(vectors: MatrixLike) -> np.ndarray:
+    """Stack vectors into a single C-contiguous float32 matrix of shape (n, dim)."""
+    matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return matrix
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row; zero rows stay zero instead of becoming NaN."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores along the last axis, best first.
+    Uses argpartition (O(n)) and only sorts the k survivors.
+    """
+    scores = np.asarray(scores)
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        part = np.broadcast_to(np.arange(n), scores.shape).copy()
+
+    part_scores = np.take_along_axis(scores, part, axis=-1)
+    order = np.argsort(-part_scores, axis=-1, kind="stable")
+    return np.take_along_axis(part, order, axis=-1)
+
+
+# ---------- SCORING ENGINE ----------
+class CandidateMatrix:
+    """
+    Candidate embeddings stacked once into a contiguous float32 matrix.
+
+    Row norms and the normalized copy are computed up front, so scoring a batch of
+    queries is a single matmul regardless of how many candidates there are.
+    """
+
+    def __init__(self, embeddings: MatrixLike):
+        self.matrix = as_matrix(embeddings)
+        self.sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        self.normalized = normalize_rows(self.matrix)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def cosine(self, queries: MatrixLike) -> np.ndarray:
+        """Cosine similarity, shape (n_queries, n_candidates)."""
+        return normalize_rows(as_matrix(queries)) @ self.normalized.T
+
+    def l2(self, queries: MatrixLike) -> np.ndarray:
+        """Negative Euclidean distance (closer = higher score), shape (n_queries, n_candidates)."""
+        q = as_matrix(queries)
+        q_sq = np.einsum("ij,ij->i", q, q)[:, None]
+        sq_dist = q_sq + self.sq_norms[None, :] - 2.0 * (q @ self.matrix.T)
+        return -np.sqrt(np.maximum(sq_dist, 0.0))
+
+    def scores(self, queries: MatrixLike, metric: str = "cosine") -> np.ndarray:
+        if metric == "cosine":
+            return self.cosine(queries)
+        if metric == "l2":
+            return self.l2(queries)
+        raise ValueError(f"Unsupported similarity metric: {metric}. Choose from {SUPPORTED_METRICS}.")
+
+    def top_k(self, queries: MatrixLike, k: int, metric: str = "cosine"):
+        """
+        Return (indices, scores), each of shape (n_queries, k), best first.
+        """
+        scores = self.scores(queries, metric)
+        idx = top_k_indices(scores, k)
+        return idx, np.take_along_axis(scores, idx, axis=-1)
+
+
+def score_batch(queries: MatrixLike, candidates: MatrixLike, metric: str = "cosine") -> np.ndarray:
+    """One-shot convenience wrapper: scores of shape (n_queries, n_candidates)."""
+    return CandidateMatrix(candidates).scores(queries, metric)
+
@@ -1,99 +1,219 @@
 # scripts/semantic_chunker.py
 
+import hashlib
 import os
-import uuid
+from itertools import islice
+from typing import Iterable, Iterator
 import nltk
+import numpy as np
 from nltk.tokenize import sent_tokenize
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 
 from models import PDFChunk
-from extract_text import extract_text_chunks
-from extract_tables import extract_table_chunks
-from extract_images import extract_ocr_chunks
+from model_registry import DEFAULT_MODEL_NAME
+from embedding_cache import embed_texts
+from parallel_extraction import TIME_BUDGET_SEC, iter_pdf_chunks
+from scoring import as_matrix, normalize_rows
 
 nltk.download("punkt", quiet=True)
 
+# ---------- CONFIG ----------
+BREAKPOINT_METHODS = ("fixed", "percentile", "gradient")
+BREAKPOINT_PERCENTILE = 10.0   # percentile/gradient: break at the lowest 10% of similarities / sharpest 10% drops
+SENTENCE_BATCH_SIZE = 256      # streaming mode: sentences embedded per micro-batch
+
+
+def adjacent_similarities(embeddings) -> np.ndarray:
+    """Cosine similarity of every sentence with the next one, as a single row-wise dot product."""
+    normed = normalize_rows(as_matrix(embeddings))
+    if normed.shape[0] < 2:
+        return np.zeros(0, dtype=np.float32)
+    return np.einsum("ij,ij->i", normed[:-1], normed[1:])
+
+
+def find_breakpoints(
+    similarities: np.ndarray,
+    similarity_threshold: float = 0.7,
+    method: str = "fixed",
+    percentile: float = BREAKPOINT_PERCENTILE
+) -> np.ndarray:
+    """
+    Indices of the sentences that start a new chunk (always > 0), found with NumPy masks.
+
+    - 'fixed': break where similarity <= similarity_threshold (the original rule)
+    - 'percentile': threshold = the given percentile of this document's similarities
+    - 'gradient': break where the drop in similarity (np.gradient) is in the top `percentile`%
+    """
+    similarities = np.asarray(similarities)
+    if similarities.size == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    if method == "fixed":
+        mask = similarities <= similarity_threshold
+    elif method == "percentile":
+        mask = similarities <= np.percentile(similarities, percentile)
+    elif method == "gradient":
+        drops = -np.gradient(similarities) if similarities.size > 1 else np.zeros_like(similarities)
+        mask = drops >= np.percentile(drops, 100 - percentile)
+    else:
+        raise ValueError(f"Unsupported breakpoint method: {method}. Choose from {BREAKPOINT_METHODS}.")
+
+    return np.flatnonzero(mask) + 1
+
+
+def _make_chunk(sentences: list[str], metas: list[dict], filename: str) -> dict:
+    first_meta = metas[0]
+    content = " ".join(sentences)
+    # Derived from the content, so re-chunking an unchanged page reproduces the same ids
+    chunk_id = f"{first_meta['type']}_{first_meta['page']}_{hashlib.sha1(content.encode('utf-8')).hexdigest()[:6]}"
+    return {
+        "content": content,
+        "metadata": {
+            "page": first_meta["page"],
+            "type": first_meta["type"],
+            "chunk_id": chunk_id,
+            "source": filename
+        }
+    }
+
+
+def _iter_sentences(chunks) -> Iterator[tuple[str, dict]]:
+    """Split extracted PDFChunks into (sentence, {'page', 'type'}) pairs, lazily."""
+    for chunk in chunks:
+        for sent in sent_tokenize(chunk.content):
+            if sent.strip():
+                yield sent.strip(), {"page": chunk.page, "type": chunk.type}
+
+
+def iter_chunk_groups(
+    pdf_chunks: Iterable[PDFChunk],
+    filename: str,
+    similarity_threshold: float = 0.7,
+    model_name: str = DEFAULT_MODEL_NAME,
+    use_cache: bool = True,
+    batch_size: int = SENTENCE_BATCH_SIZE,
+    page_boundaries: bool = False
+) -> Iterator[dict]:
+    """
+    Fixed-threshold semantic chunking of already extracted PDFChunks (in page order).
+
+    Sentences are embedded in micro-batches of `batch_size`; the open buffer (and the last
+    sentence embedding) carries across page and batch boundaries, and every chunk is yielded
+    as soon as the next boundary is seen, so peak memory is bounded by the batch size.
+    With `page_boundaries`, a new page always starts a new chunk, so every chunk belongs to
+    exactly one page and a changed page can be re-chunked on its own (incremental sync).
+    """
+    sentence_iter = _iter_sentences(pdf_chunks)
+
+    buffer, meta_buffer = [], []
+    prev_embedding = None
+
+    while True:
+        batch = list(islice(sentence_iter, batch_size))
+        if not batch:
+            break
+
+        sentences = [sentence for sentence, _ in batch]
+        embeddings = embed_texts(sentences, model_name=model_name, use_cache=use_cache)
+
+        if prev_embedding is None:
+            starts = set(find_breakpoints(adjacent_similarities(embeddings), similarity_threshold).tolist())
+        else:
+            # Prepend the previous batch's last sentence so the cross-batch pair is scored too
+            stacked = np.vstack([prev_embedding[None, :], embeddings])
+            starts = set((find_breakpoints(adjacent_similarities(stacked), similarity_threshold) - 1).tolist())
+
+        for j, (sentence, meta) in enumerate(batch):
+            if buffer and (j in starts or (page_boundaries and meta["page"] != meta_buffer[-1]["page"])):
+                yield _make_chunk(buffer, meta_buffer, filename)
+                buffer, meta_buffer = [], []
+            buffer.append(sentence)
+            meta_buffer.append(meta)
+
+        prev_embedding = embeddings[-1]
+
+    # Final flush
+    if buffer:
+        yield _make_chunk(buffer, meta_buffer, filename)
+
+
+def iter_semantic_chunks(
+    pdf_path: str,
+    similarity_threshold: float = 0.7,
+    model_name: str = DEFAULT_MODEL_NAME,
+    max_workers: int = None,
+    time_budget_sec: float = TIME_BUDGET_SEC,
+    use_cache: bool = True,
+    batch_size: int = SENTENCE_BATCH_SIZE
+) -> Iterator[dict]:
+    """
+    Streaming variant of semantic_chunking (fixed-threshold breakpoints).
+
+    Pages are consumed as extraction yields them and chunked by iter_chunk_groups. Output
+    is identical to semantic_chunking(..., breakpoint_method='fixed') while peak memory stays
+    bounded by the batch size instead of the document size.
+    """
+    pdf_chunks = iter_pdf_chunks(pdf_path, max_workers=max_workers, time_budget_sec=time_budget_sec, use_cache=use_cache)
+    yield from iter_chunk_groups(
+        pdf_chunks, os.path.basename(pdf_path), similarity_threshold, model_name, use_cache, batch_size
+    )
+
 
 def semantic_chunking(
     pdf_path: str,
-    similarity_threshold: float = 0.7
+    similarity_threshold: float = 0.7,
+    model_name: str = DEFAULT_MODEL_NAME,
+    max_workers: int = None,
+    time_budget_sec: float = TIME_BUDGET_SEC,
+    use_cache: bool = True,
+    breakpoint_method: str = "fixed",
+    breakpoint_percentile: float = BREAKPOINT_PERCENTILE
 ) -> list[dict]:
     """
     Extracts and semantically chunks PDF content with metadata.
+    Pages are extracted in parallel (see parallel_extraction) and processed in page order;
+    with use_cache, unchanged pages come from the extraction cache and previously seen
+    sentences from the embedding cache. breakpoint_method picks a fixed similarity
+    threshold or a percentile/gradient threshold derived from the document itself.
     Returns: List of dictionaries containing 'content' and 'metadata'.
     """
 
+    if breakpoint_method == "fixed":
+        # Fixed thresholds only need adjacent pairs, so stream with bounded memory
+        return list(iter_semantic_chunks(
+            pdf_path, similarity_threshold, model_name, max_workers, time_budget_sec, use_cache
+        ))
+
+    # Percentile/gradient thresholds need the whole document's similarity vector
     filename = os.path.basename(pdf_path)
 
-    # Step 1: Extract chunks
-    text_chunks = extract_text_chunks(pdf_path)
-    table_chunks = extract_table_chunks(pdf_path)
-    image_chunks = extract_ocr_chunks(pdf_path)
-    all_chunks: list[PDFChunk] = text_chunks + table_chunks + image_chunks
+    # Step 1: Extract chunks (text, tables and OCR per page, pages sharded across processes)
+    all_chunks: list[PDFChunk] = list(
+        iter_pdf_chunks(pdf_path, max_workers=max_workers, time_budget_sec=time_budget_sec, use_cache=use_cache)
+    )
 
     # Step 2: Tokenize into sentences + track metadata
-    sentence_blocks = []
-    for chunk in all_chunks:
-        for sent in sent_tokenize(chunk.content):
-            if sent.strip():
-                sentence_blocks.append({
-                    "page": chunk.page,
-                    "type": chunk.type,
-                    "sentence": sent.strip(),
-                })
+    sentence_blocks = list(_iter_sentences(all_chunks))
 
     if not sentence_blocks:
         return []
 
-    sentences = [item["sentence"] for item in sentence_blocks]
-    sentence_meta = [{"page": item["page"], "type": item["type"]} for item in sentence_blocks]
-
-    # Step 3: Embed sentences
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    embeddings = model.encode(sentences)
+    sentences = [sentence for sentence, _ in sentence_blocks]
+    sentence_meta = [meta for _, meta in sentence_blocks]
 
-    # Step 4: Semantic grouping
-    semantic_chunks = []
-    buffer = [sentences[0]]
-    meta_buffer = [sentence_meta[0]]
+    # Step 3: Embed sentences (cached, deduplicated)
+    embeddings = embed_texts(sentences, model_name=model_name, use_cache=use_cache)
 
-    for i in range(1, len(sentences)):
-        sim = cosine_similarity([embeddings[i - 1]], [embeddings[i]])[0][0]
+    # Step 4: Semantic grouping (boundaries from one vectorized pass)
+    similarities = adjacent_similarities(embeddings)
+    starts = [0] + find_breakpoints(
+        similarities, similarity_threshold, breakpoint_method, breakpoint_percentile
+    ).tolist()
+    ends = starts[1:] + [len(sentences)]
 
-        if sim > similarity_threshold:
-            buffer.append(sentences[i])
-            meta_buffer.append(sentence_meta[i])
-        else:
-            merged = " ".join(buffer)
-            first_meta = meta_buffer[0]
-            chunk_id = f"{first_meta['type']}_{first_meta['page']}_{uuid.uuid4().hex[:6]}"
-            semantic_chunks.append({
-                "content": merged,
-                "metadata": {
-                    "page": first_meta["page"],
-                    "type": first_meta["type"],
-                    "chunk_id": chunk_id,
-                    "source": filename
-                }
-            })
-            buffer = [sentences[i]]
-            meta_buffer = [sentence_meta[i]]
-
-    # Final flush
-    if buffer:
-        merged = " ".join(buffer)
-        first_meta = meta_buffer[0]
-        chunk_id = f"{first_meta['type']}_{first_meta['page']}_{uuid.uuid4().hex[:6]}"
-        semantic_chunks.append({
-            "content": merged,
-            "metadata": {
-                "page": first_meta["page"],
-                "type": first_meta["type"],
-                "chunk_id": chunk_id,
-                "source": filename
-            }
-        })
+    semantic_chunks = [
+        _make_chunk(sentences[start:end], sentence_meta[start:end], filename)
+        for start, end in zip(starts, ends)
+    ]
 
     return semantic_chunks
 
@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# The scripts import each other as top-level modules (they are run from scripts/)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../scripts")))
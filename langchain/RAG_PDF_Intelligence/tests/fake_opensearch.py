@@ -0,0 +1,79 @@
+# tests/fake_opensearch.py
+import json
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List
+
+from opensearchpy.serializer import JSONSerializer
+
+
+class _FakeIndices:
+    def __init__(self):
+        self.refreshed: List[str] = []
+
+    def refresh(self, index: str, **params) -> Dict[str, Any]:
+        self.refreshed.append(index)
+        return {"_shards": {"failed": 0}}
+
+
+class FakeOpenSearch:
+    """
+    In-memory stand-in for the slice of the OpenSearch client used by the ingestion code:
+    `bulk` (index actions), `delete_by_query` (bool filter of term / terms plus must_not ids)
+    and `indices.refresh`. Documents whose id is in `fail_ids` are rejected with a 400.
+    """
+
+    def __init__(self, fail_ids: Iterable[str] = ()):
+        self.docs: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.fail_ids = set(fail_ids)
+        self.bulk_params: List[Dict[str, Any]] = []
+        self.indices = _FakeIndices()
+        self.transport = SimpleNamespace(serializer=JSONSerializer())  # used by helpers to encode actions
+        self._lock = threading.Lock()
+
+    def bulk(self, body, **params) -> Dict[str, Any]:
+        if isinstance(body, bytes):
+            body = body.decode("utf-8")
+        lines = [json.loads(line) for line in body.splitlines() if line.strip()]
+        items = []
+        with self._lock:
+            self.bulk_params.append(params)
+            for action, source in zip(lines[::2], lines[1::2]):
+                op_type, meta = next(iter(action.items()))
+                index, doc_id = meta["_index"], meta["_id"]
+                if doc_id in self.fail_ids:
+                    items.append({op_type: {
+                        "_index": index, "_id": doc_id, "status": 400,
+                        "error": {"type": "mapper_parsing_exception", "reason": "rejected by fake"},
+                    }})
+                    continue
+                created = doc_id not in self.docs.setdefault(index, {})
+                self.docs[index][doc_id] = source
+                items.append({op_type: {"_index": index, "_id": doc_id, "status": 201 if created else 200}})
+        return {"took": 1, "errors": any(item[next(iter(item))]["status"] >= 300 for item in items), "items": items}
+
+    @staticmethod
+    def _matches(doc_id: str, source: Dict[str, Any], query: Dict[str, Any]) -> bool:
+        clauses = query["bool"]
+        for clause in clauses.get("filter", []):
+            kind, condition = next(iter(clause.items()))
+            field, expected = next(iter(condition.items()))
+            value = source.get(field[:-len(".keyword")] if field.endswith(".keyword") else field)
+            if kind == "term" and value != expected:
+                return False
+            if kind == "terms" and value not in expected:
+                return False
+        for clause in clauses.get("must_not", []):
+            if "ids" in clause and doc_id in clause["ids"]["values"]:
+                return False
+        return True
+
+    def delete_by_query(self, index: str, body: Dict[str, Any], **params) -> Dict[str, Any]:
+        deleted = 0
+        with self._lock:
+            for name in index.split(","):
+                docs = self.docs.get(name, {})
+                for doc_id in [i for i, source in docs.items() if self._matches(i, source, body["query"])]:
+                    del docs[doc_id]
+                    deleted += 1
+        return {"deleted": deleted, "version_conflicts": 0, "failures": []}
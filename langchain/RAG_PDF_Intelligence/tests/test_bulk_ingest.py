@@ -0,0 +1,134 @@
+# tests/test_bulk_ingest.py
+import pytest
+
+import bulk_ingest
+from bulk_ingest import bulk_insert, delete_stale_chunks, make_doc_id
+from fake_opensearch import FakeOpenSearch
+
+INDEXES = ["idx_a", "idx_b"]
+
+
+@pytest.fixture(autouse=True)
+def version_bumps(monkeypatch):
+    bumps = []
+    monkeypatch.setattr(bulk_ingest, "bump_corpus_version", lambda reason="": bumps.append(reason) or len(bumps))
+    return bumps
+
+
+def make_chunks(n, source="report.pdf"):
+    return [
+        {
+            "content": f"chunk number {i}",
+            "embedding": [0.1 * i, 0.2],
+            "metadata": {"page": i + 1, "type": "text", "chunk_id": f"text_{i + 1}", "source": source},
+        }
+        for i in range(n)
+    ]
+
+
+def test_doc_id_is_deterministic():
+    meta = {"source": "report.pdf", "page": 3}
+    assert make_doc_id(meta, "same text") == make_doc_id(dict(meta), "same text")
+    assert make_doc_id(meta, "same text") != make_doc_id({**meta, "page": 4}, "same text")
+    assert make_doc_id(meta, "same text") != make_doc_id(meta, "other text")
+
+
+def test_iter_bulk_actions_one_action_per_index():
+    actions = list(bulk_ingest.iter_bulk_actions(make_chunks(2), INDEXES))
+    assert [(a["_index"], a["_op_type"]) for a in actions] == [
+        ("idx_a", "index"), ("idx_b", "index"), ("idx_a", "index"), ("idx_b", "index")
+    ]
+    assert actions[0]["_id"] == actions[1]["_id"]
+    assert actions[0]["_source"]["text"] == "chunk number 0"
+    assert actions[0]["_source"]["page"] == 1
+
+
+def test_reingest_is_an_upsert():
+    client = FakeOpenSearch()
+    chunks = make_chunks(5)
+
+    first = bulk_insert(chunks, index_names=INDEXES, client=client, batch_size=2, thread_count=2)
+    second = bulk_insert(iter(chunks), index_names=INDEXES, client=client, batch_size=2, thread_count=2)
+
+    assert first["indexed"] == second["indexed"] == 10
+    assert {name: len(docs) for name, docs in client.docs.items()} == {"idx_a": 5, "idx_b": 5}
+
+
+def test_failures_are_counted_not_raised(version_bumps):
+    chunks = make_chunks(4)
+    bad_id = make_doc_id(chunks[1]["metadata"], chunks[1]["content"])
+    client = FakeOpenSearch(fail_ids=[bad_id])
+
+    stats = bulk_insert(chunks, index_names=INDEXES, client=client)
+
+    assert stats["indexed"] == 6
+    assert stats["failed"] == 2
+    assert len(stats["errors"]) == 2
+    assert bad_id not in client.docs["idx_a"]
+    assert len(version_bumps) == 1
+
+
+def test_refresh_once_at_end_by_default():
+    client = FakeOpenSearch()
+    bulk_insert(make_chunks(3), index_names=INDEXES, client=client, batch_size=1)
+
+    assert client.indices.refreshed == ["idx_a,idx_b"]
+    assert all("refresh" not in params for params in client.bulk_params)
+
+
+def test_refresh_per_batch_and_disabled():
+    client = FakeOpenSearch()
+    bulk_insert(make_chunks(3), index_names=INDEXES, client=client, batch_size=1, refresh="wait_for")
+    assert client.indices.refreshed == []
+    assert client.bulk_params and all(params.get("refresh") == "wait_for" for params in client.bulk_params)
+
+    client = FakeOpenSearch()
+    bulk_insert(make_chunks(3), index_names=INDEXES, client=client, refresh=False)
+    assert client.indices.refreshed == []
+
+
+def test_no_version_bump_when_nothing_indexed(version_bumps):
+    stats = bulk_insert([], index_names=INDEXES, client=FakeOpenSearch())
+    assert stats["indexed"] == 0
+    assert version_bumps == []
+
+
+def _doc_id(chunk):
+    return make_doc_id(chunk["metadata"], chunk["content"])
+
+
+def test_delete_stale_chunks_scoped_to_source_pages_and_keep_ids(version_bumps):
+    client = FakeOpenSearch()
+    report, other = make_chunks(4, "report.pdf"), make_chunks(4, "other.pdf")
+    bulk_insert(report + other, index_names=INDEXES, client=client)
+    version_bumps.clear()
+
+    # Pages 2-3 of report.pdf were re-extracted; page 2's chunk came back unchanged
+    deleted = delete_stale_chunks("report.pdf", [2, 3], [_doc_id(report[1])], INDEXES, client)
+
+    assert deleted == 2   # report page 3, in both indexes
+    for name in INDEXES:
+        assert set(client.docs[name]) == {_doc_id(chunk) for chunk in report + other} - {_doc_id(report[2])}
+    assert len(version_bumps) == 1
+
+
+def test_delete_stale_chunks_whole_source(version_bumps):
+    client = FakeOpenSearch()
+    report, other = make_chunks(3, "report.pdf"), make_chunks(2, "other.pdf")
+    bulk_insert(report + other, index_names=INDEXES, client=client)
+
+    deleted = delete_stale_chunks("report.pdf", None, [_doc_id(report[0])], INDEXES, client)
+
+    assert deleted == 4
+    assert set(client.docs["idx_b"]) == {_doc_id(report[0])} | {_doc_id(chunk) for chunk in other}
+
+
+def test_delete_stale_chunks_noop(version_bumps):
+    client = FakeOpenSearch()
+    bulk_insert(make_chunks(2), index_names=INDEXES, client=client)
+    version_bumps.clear()
+
+    assert delete_stale_chunks("report.pdf", [], (), INDEXES, client) == 0
+    assert delete_stale_chunks("missing.pdf", None, (), INDEXES, client) == 0
+    assert version_bumps == []
+    assert len(client.docs["idx_a"]) == 2
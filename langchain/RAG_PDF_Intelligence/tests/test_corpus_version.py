@@ -0,0 +1,34 @@
+# tests/test_corpus_version.py
+import json
+import multiprocessing
+
+import corpus_version
+from corpus_version import bump_corpus_version, get_corpus_version
+
+
+def _bumper(path: str, count: int) -> None:
+    for _ in range(count):
+        bump_corpus_version("test", path=path)
+
+
+def test_concurrent_processes_never_lose_a_bump(tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus_version, "LEGACY_VERSION_PATH", str(tmp_path / "none.json"))
+    path = str(tmp_path / "version.sqlite")
+    assert get_corpus_version(path) == 0
+    workers = [multiprocessing.Process(target=_bumper, args=(path, 25)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert all(worker.exitcode == 0 for worker in workers)
+    assert get_corpus_version(path) == 100
+
+
+def test_continues_from_the_json_counter(tmp_path, monkeypatch):
+    legacy = tmp_path / "corpus_version.json"
+    legacy.write_text(json.dumps({"version": 7, "updated_at": 0}))
+    monkeypatch.setattr(corpus_version, "LEGACY_VERSION_PATH", str(legacy))
+
+    path = str(tmp_path / "version.sqlite")
+    assert get_corpus_version(path) == 7
+    assert bump_corpus_version("ingest", path=path) == 8
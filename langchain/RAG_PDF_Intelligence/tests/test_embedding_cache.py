@@ -0,0 +1,82 @@
+# tests/test_embedding_cache.py
+import multiprocessing
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from embedding_cache import EmbeddingCache  # noqa: E402
+
+DIM = 8
+
+
+def _vector(i: int) -> np.ndarray:
+    return np.full(DIM, i, dtype=np.float32)
+
+
+def _writer(cache_dir: str, offset: int, count: int) -> None:
+    cache = EmbeddingCache("test-model", DIM, cache_dir=cache_dir)
+    for i in range(offset, offset + count, 5):
+        keys = [f"{n:040x}" for n in range(i, i + 5)]
+        cache.put_many(keys, np.stack([_vector(n) for n in range(i, i + 5)]))
+
+
+def test_processes_never_share_a_slot(tmp_path):
+    cache_dir = str(tmp_path)
+    EmbeddingCache("test-model", DIM, cache_dir=cache_dir)  # create the layout before the race
+    workers = [multiprocessing.Process(target=_writer, args=(cache_dir, n * 1000, 200)) for n in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert all(worker.exitcode == 0 for worker in workers)
+
+    cache = EmbeddingCache("test-model", DIM, cache_dir=cache_dir)
+    keys = [f"{n:040x}" for w in range(4) for n in range(w * 1000, w * 1000 + 200)]
+    found = cache.get_many(keys)
+    assert len(found) == len(keys)
+    for key, vector in found.items():
+        assert np.array_equal(vector, _vector(int(key, 16)))
+
+
+def test_overwritten_slot_reads_as_miss(tmp_path):
+    cache = EmbeddingCache("test-model", DIM, cache_dir=str(tmp_path))
+    cache.put_many(["a" * 40, "b" * 40], np.stack([_vector(1), _vector(2)]))
+    cache.vectors[0] = _vector(99)  # what a concurrent recycle of slot 0 looks like mid-read
+
+    found = cache.get_many(["a" * 40, "b" * 40])
+    assert list(found) == ["b" * 40]
+    assert cache.stats()["misses"] == 1
+
+
+def test_recycles_least_recently_used(tmp_path):
+    cache = EmbeddingCache("test-model", DIM, max_bytes=3 * DIM * 4, cache_dir=str(tmp_path), touch_after_sec=0)
+    cache.put_many(["a" * 40, "b" * 40, "c" * 40], np.stack([_vector(1), _vector(2), _vector(3)]))
+    cache.get_many(["a" * 40])
+    cache.put_many(["d" * 40], np.stack([_vector(4)]))
+
+    found = cache.get_many(["a" * 40, "b" * 40, "c" * 40, "d" * 40])
+    assert set(found) == {"a" * 40, "c" * 40, "d" * 40} or set(found) == {"a" * 40, "b" * 40, "d" * 40}
+    assert np.array_equal(found["d" * 40], _vector(4))
+
+
+def test_recent_hits_do_not_write(tmp_path):
+    cache = EmbeddingCache("test-model", DIM, cache_dir=str(tmp_path))
+    cache.put_many(["a" * 40], np.stack([_vector(1)]))
+    writes = []
+    cache.conn.set_trace_callback(lambda sql: writes.append(sql) if sql.startswith(("BEGIN", "UPDATE")) else None)
+
+    for _ in range(3):
+        assert "a" * 40 in cache.get_many(["a" * 40])
+    assert writes == []
+
+
+def test_another_budget_leaves_the_store_intact(tmp_path):
+    cache = EmbeddingCache("test-model", DIM, cache_dir=str(tmp_path))
+    cache.put_many(["a" * 40], np.stack([_vector(1)]))
+
+    smaller = EmbeddingCache("test-model", DIM, max_bytes=10 * DIM * 4, cache_dir=str(tmp_path))
+    assert smaller.get_many(["a" * 40]) == {}
+    assert np.array_equal(cache.get_many(["a" * 40])["a" * 40], _vector(1))
+    assert EmbeddingCache("test-model", DIM, cache_dir=str(tmp_path)).get_many(["a" * 40])
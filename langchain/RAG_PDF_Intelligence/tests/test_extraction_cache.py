@@ -0,0 +1,124 @@
+# tests/test_extraction_cache.py
+import os
+
+import fitz
+
+from extraction_cache import ExtractionCache, page_fingerprint
+from models import PDFChunk
+
+
+def _text_page(text: str) -> fitz.Document:
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), text)
+    return doc
+
+
+def _xobject_page(text: str) -> fitz.Document:
+    """A page whose content stream only draws a Form XObject (`/fzFrm0 Do`) holding `text`."""
+    doc = fitz.open()
+    doc.new_page().show_pdf_page(fitz.Rect(0, 0, 595, 842), _text_page(text), 0)
+    return doc
+
+
+def _fingerprint(doc: fitz.Document) -> str:
+    return page_fingerprint(doc, doc[0])
+
+
+def test_fingerprint_sees_form_xobject_contents():
+    first, second = _xobject_page("Revenue grew 4%"), _xobject_page("Revenue fell 9%")
+    assert first[0].read_contents() == second[0].read_contents()
+    assert _fingerprint(first) != _fingerprint(second)
+
+
+def test_fingerprint_is_stable_across_files():
+    assert _fingerprint(_xobject_page("same page")) == _fingerprint(_xobject_page("same page"))
+    assert _fingerprint(_text_page("same page")) == _fingerprint(_text_page("same page"))
+
+
+def test_fingerprint_sees_fonts():
+    first, second = fitz.open(), fitz.open()
+    first.new_page().insert_text((72, 72), "Total", fontname="helv")
+    second.new_page().insert_text((72, 72), "Total", fontname="tiro")
+    assert _fingerprint(first) != _fingerprint(second)
+
+
+def test_fingerprint_variant_changes_key():
+    doc = _text_page("table page")
+    assert page_fingerprint(doc, doc[0], variant="pdfplumber") != page_fingerprint(doc, doc[0], variant="pymupdf")
+
+
+def test_writes_do_not_hold_the_lock(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first, second = ExtractionCache(path), ExtractionCache(path)
+    try:
+        first.put("a", [PDFChunk(page=1, type="text", content="alpha")])
+        assert first.get("a", 3)[0].page == 3
+        second.put("b", [PDFChunk(page=1, type="text", content="beta")])  # would raise "database is locked"
+        assert second.get("a", 1)[0].content == "alpha"
+        assert first.get("b", 1)[0].content == "beta"
+    finally:
+        first.close()
+        second.close()
+    reopened = ExtractionCache(path)
+    assert reopened.stats()["hits"] == 3
+    reopened.close()
+
+
+def test_eviction_keeps_store_under_budget(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite"), max_bytes=2_000)
+    for i in range(50):
+        cache.put(f"k{i}", [PDFChunk(page=1, type="text", content=os.urandom(200).hex())])
+    assert cache.stats()["evictions"] > 0
+    assert cache.stats()["size_bytes"] <= 2_000
+    assert cache.get("k49", 1) is not None
+    cache.close()
+
+
+def test_ocr_text_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first, second = ExtractionCache(path), ExtractionCache(path)
+    assert second.get_ocr("sha1|4000000|1|160") is None
+    first.put_ocr("sha1|4000000|1|160", "ACME Corp")
+    assert second.get_ocr("sha1|4000000|1|160") == "ACME Corp"
+    assert second.stats()["ocr_entries"] == 1
+    first.close()
+    second.close()
+
+
+def test_running_size_matches_the_stored_records(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite"), max_bytes=3_000)
+    for i in range(40):
+        cache.put(f"k{i % 25}", [PDFChunk(page=1, type="text", content=os.urandom(100 + i).hex())])
+    stored = cache.conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+    assert cache.stats()["size_bytes"] == stored <= 3_000
+
+    cache.clear()
+    cache.put("k0", [PDFChunk(page=1, type="text", content="alpha")])
+    assert cache.stats()["size_bytes"] == cache.conn.execute("SELECT size FROM pages").fetchone()[0]
+    cache.close()
+
+
+def test_total_is_seeded_for_an_existing_store(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ExtractionCache(path)
+    cache.put("a", [PDFChunk(page=1, type="text", content="alpha")])
+    size = cache.stats()["size_bytes"]
+    cache.conn.execute("DELETE FROM stats WHERE name = 'size_bytes'")   # as written before the total existed
+    cache.close()
+
+    reopened = ExtractionCache(path)
+    assert reopened.stats()["size_bytes"] == size > 0
+    reopened.close()
+
+
+def test_ocr_text_shares_the_byte_budget(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite"), max_bytes=2_000)
+    cache.put("page", [PDFChunk(page=1, type="text", content="alpha")])
+    for i in range(40):
+        cache.put_ocr(f"img{i}", os.urandom(100).hex())
+    stats = cache.stats()
+    assert stats["evictions"] > 0
+    assert stats["size_bytes"] <= 2_000
+    assert cache.get("page", 1) is None            # least recently used, whichever table it is in
+    assert cache.get_ocr("img39") is not None
+    cache.close()
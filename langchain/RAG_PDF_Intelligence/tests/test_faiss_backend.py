@@ -0,0 +1,29 @@
+# tests/test_faiss_backend.py
+import os
+
+import numpy as np
+import pytest
+
+from faiss_backend import FaissRetriever, build_faiss_index
+
+
+def _chunks(n: int, dim: int = 16, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    for i in range(n):
+        yield {"content": f"chunk {i}", "embedding": rng.normal(size=dim).tolist(), "metadata": {"page": i}}
+
+
+def test_builds_from_a_generator_across_batches(tmp_path):
+    stats = build_faiss_index(_chunks(700), name="gen", index_type="flat", store_dir=str(tmp_path), batch_size=256)
+    assert stats["vectors"] == 700
+
+    query = next(iter(_chunks(700)))["embedding"]
+    hit = FaissRetriever("gen", str(tmp_path)).retrieve_top_k(query, top_k=1)["gen"][0]
+    assert hit["text"] == "chunk 0"
+    assert sorted(os.listdir(tmp_path)) == ["gen.faiss", "gen.meta.sqlite"]
+
+
+def test_empty_input_leaves_no_files(tmp_path):
+    with pytest.raises(ValueError):
+        build_faiss_index(iter([]), name="empty", store_dir=str(tmp_path))
+    assert os.listdir(tmp_path) == []
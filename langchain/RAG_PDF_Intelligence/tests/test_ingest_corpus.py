@@ -0,0 +1,234 @@
+# tests/test_ingest_corpus.py
+import hashlib
+import os
+
+import fitz
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+import bulk_ingest  # noqa: E402
+import embedding_cache  # noqa: E402
+import ingest_corpus  # noqa: E402
+import semantic_chunker  # noqa: E402
+from fake_opensearch import FakeOpenSearch  # noqa: E402
+
+INDEXES = ["idx_a", "idx_b"]
+
+
+@pytest.fixture(autouse=True)
+def no_version_bumps(monkeypatch):
+    monkeypatch.setattr(bulk_ingest, "bump_corpus_version", lambda reason="": 0)
+
+
+def _steps(client, texts_by_page, sync=False):
+    """Real index stage; extract / chunk / embed replaced by canned chunks for the file."""
+    steps = ingest_corpus.make_steps(INDEXES, client, extraction_processes=1, use_cache=False, sync=sync)
+
+    def embed(task):
+        source = os.path.basename(task["path"])
+        task["embedded"] = [
+            {"content": text, "embedding": [0.1, 0.2], "metadata": {"source": source, "page": page, "type": "text"}}
+            for page, text in texts_by_page.items()
+        ]
+        return task
+
+    steps.update(extract=lambda task: task, chunk=lambda task: task, embed=embed)
+    return steps
+
+
+def _texts(client, index="idx_a"):
+    return sorted(doc["text"] for doc in client.docs.get(index, {}).values())
+
+
+def _edit(path, content: bytes):
+    with open(path, "wb") as f:
+        f.write(content)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_reingesting_a_changed_file_replaces_its_chunks(tmp_path):
+    pdf, other = tmp_path / "report.pdf", tmp_path / "other.pdf"
+    _edit(pdf, b"v1")
+    _edit(other, b"v1")
+    state_path, client = str(tmp_path / "state.jsonl"), FakeOpenSearch()
+
+    ingest_corpus.ingest_corpus([str(other)], INDEXES, state_path, client=client,
+                                steps=_steps(client, {1: "other page"}))
+    ingest_corpus.ingest_corpus([str(pdf)], INDEXES, state_path, client=client,
+                                steps=_steps(client, {1: "intro", 2: "old figures"}))
+    assert _texts(client) == ["intro", "old figures", "other page"]
+
+    _edit(pdf, b"v2")
+    result = ingest_corpus.ingest_corpus([str(pdf)], INDEXES, state_path, client=client,
+                                         steps=_steps(client, {1: "intro", 2: "new figures"}))
+    assert result["chunks_deleted"] == 2   # "old figures" in both indexes
+    assert _texts(client) == _texts(client, "idx_b") == ["intro", "new figures", "other page"]
+
+
+def test_first_ingest_deletes_nothing(tmp_path):
+    pdf = tmp_path / "report.pdf"
+    _edit(pdf, b"v1")
+    client = FakeOpenSearch()
+    client.docs["idx_a"] = {"foreign": {"text": "same name, other run", "source": "report.pdf", "page": 1}}
+
+    result = ingest_corpus.ingest_corpus([str(pdf)], INDEXES, str(tmp_path / "state.jsonl"), client=client,
+                                         steps=_steps(client, {1: "intro"}))
+    assert result["chunks_deleted"] == 0
+    assert "foreign" in client.docs["idx_a"]
+
+
+def _save_pdf(path, page_texts, via_xobject=False):
+    """One page per text; with `via_xobject` each page only draws a Form XObject holding it."""
+    doc = fitz.open()
+    for text in page_texts:
+        page = doc.new_page()
+        if via_xobject:
+            source = fitz.open()
+            source.new_page().insert_text((72, 72), text)
+            page.show_pdf_page(page.rect, source, 0)
+        else:
+            page.insert_text((72, 72), text)
+    doc.save(str(path))
+
+
+def _synced(plan):
+    return {"sync": True, "file_hash": plan["file_hash"], "pages": plan["pages"]}
+
+
+def test_plan_sync_first_run_replaces_everything(tmp_path):
+    pdf = tmp_path / "report.pdf"
+    _save_pdf(pdf, ["one", "two", "three"])
+
+    plan = ingest_corpus.plan_sync(str(pdf))
+    assert plan["changed"] == [1, 2, 3]
+    assert plan["stale"] is None
+
+    # A checkpoint from a plain (non-sync) ingest has no page history either
+    assert ingest_corpus.plan_sync(str(pdf), {"status": "done", "file_hash": plan["file_hash"]})["stale"] is None
+
+
+def test_plan_sync_unchanged_file(tmp_path):
+    pdf = tmp_path / "report.pdf"
+    _save_pdf(pdf, ["one", "two"])
+    first = ingest_corpus.plan_sync(str(pdf))
+
+    again = ingest_corpus.plan_sync(str(pdf), _synced(first))
+    assert again["changed"] == again["stale"] == []
+    assert again["pages"] == first["pages"]
+
+
+@pytest.mark.parametrize("via_xobject", [False, True])
+def test_plan_sync_finds_the_edited_page(tmp_path, via_xobject):
+    pdf = tmp_path / "report.pdf"
+    _save_pdf(pdf, ["one", "two", "three"], via_xobject)
+    first = ingest_corpus.plan_sync(str(pdf))
+
+    _save_pdf(pdf, ["one", "TWO (restated)", "three"], via_xobject)
+    plan = ingest_corpus.plan_sync(str(pdf), _synced(first))
+    assert plan["changed"] == plan["stale"] == [2]
+
+
+def test_plan_sync_removed_and_added_pages(tmp_path):
+    pdf = tmp_path / "report.pdf"
+    _save_pdf(pdf, ["one", "two", "three", "four"])
+    first = ingest_corpus.plan_sync(str(pdf))
+
+    _save_pdf(pdf, ["one", "two"])
+    shorter = ingest_corpus.plan_sync(str(pdf), _synced(first))
+    assert shorter["changed"] == []
+    assert shorter["stale"] == [3, 4]
+
+    _save_pdf(pdf, ["one", "two", "five"])
+    longer = ingest_corpus.plan_sync(str(pdf), _synced(shorter))
+    assert longer["changed"] == longer["stale"] == [3]
+
+
+def test_ocr_budget_fits_the_cpu(monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 16)
+    assert ingest_corpus.ocr_budget(2, 8) == 1
+    assert ingest_corpus.ocr_budget(2, 2) == 4
+    assert ingest_corpus.ocr_budget(4, 8) == 1
+
+
+class _HashModel:
+    """Deterministic stand-in for the sentence-transformers model (one vector per text)."""
+
+    def get_sentence_embedding_dimension(self):
+        return 8
+
+    def encode(self, texts, **kwargs):
+        seeds = [int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16) for text in texts]
+        return np.stack([np.random.default_rng(seed).normal(size=8) for seed in seeds])
+
+
+@pytest.fixture
+def synced_pipeline(tmp_path, monkeypatch):
+    """Real extract / chunk / embed / index steps in sync mode, against FakeOpenSearch."""
+    monkeypatch.setattr(embedding_cache, "get_model", lambda model_name=None, device=None: _HashModel())
+    monkeypatch.setattr(semantic_chunker, "sent_tokenize", str.splitlines)  # no punkt data needed
+    extracted = []
+    extract_all_chunks = ingest_corpus.extract_all_chunks
+
+    def spy(path, **kwargs):
+        extracted.append(kwargs["pages"])
+        return extract_all_chunks(path, **kwargs)
+
+    monkeypatch.setattr(ingest_corpus, "extract_all_chunks", spy)
+    client, state_path = FakeOpenSearch(), str(tmp_path / "state.jsonl")
+
+    def run(pdf):
+        extracted.clear()
+        return ingest_corpus.ingest_corpus([str(pdf)], INDEXES, state_path, extraction_processes=1,
+                                           use_cache=False, sync=True, client=client, ocr_workers=1)
+
+    return run, client, extracted, state_path
+
+
+def _pages(client, index="idx_a"):
+    return {doc["page"]: (doc_id, doc["text"]) for doc_id, doc in client.docs.get(index, {}).items()}
+
+
+def test_sync_reindexes_only_the_changed_page(tmp_path, synced_pipeline):
+    run, client, extracted, _ = synced_pipeline
+    pdf = tmp_path / "report.pdf"
+    _save_pdf(pdf, ["Revenue grew.", "Costs were flat.", "Outlook is stable."])
+
+    first = run(pdf)
+    assert extracted == [[1, 2, 3]]
+    assert first["done"] == 1 and first["chunks_deleted"] == 0
+    before = _pages(client)
+    assert sorted(before) == [1, 2, 3]
+
+    _save_pdf(pdf, ["Revenue grew.", "Costs fell sharply.", "Outlook is stable."])
+    second = run(pdf)
+    assert extracted == [[2]]               # unchanged pages are not re-extracted
+    assert second["chunks_indexed"] == 1
+    assert second["chunks_deleted"] == 2    # the old page-2 chunk, in both indexes
+    after = _pages(client)
+    assert after[1] == before[1] and after[3] == before[3]
+    assert "fell sharply" in after[2][1] and after[2][0] != before[2][0]
+    assert _pages(client, "idx_b") == after
+
+    assert run(pdf)["skipped"] == 1
+
+
+def test_failed_sync_keeps_the_page_history(tmp_path, synced_pipeline, monkeypatch):
+    run, client, extracted, state_path = synced_pipeline
+    pdf = tmp_path / "report.pdf"
+    _save_pdf(pdf, ["Revenue grew.", "Costs were flat.", "Outlook is stable."])
+    run(pdf)
+    synced_pages = ingest_corpus.IngestState(state_path).files[str(pdf)]["pages"]
+
+    _save_pdf(pdf, ["Revenue grew.", "Costs fell sharply.", "Outlook is stable."])
+    with monkeypatch.context() as patch:
+        patch.setattr(ingest_corpus, "generate_embeddings", lambda *a, **k: 1 / 0)
+        assert run(pdf)["failed"] == 1
+    record = ingest_corpus.IngestState(state_path).files[str(pdf)]
+    assert record["status"] == "failed" and record["pages"] == synced_pages
+
+    retry = run(pdf)
+    assert extracted == [[2]]               # not a full resync
+    assert retry["done"] == 1 and retry["chunks_deleted"] == 2
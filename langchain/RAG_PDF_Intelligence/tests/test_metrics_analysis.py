@@ -0,0 +1,63 @@
+# tests/test_metrics_analysis.py
+import json
+
+import pytest
+
+import metrics_analysis
+
+
+def _row(index, params, recall, p95, deployed, transport="http"):
+    return {
+        "backend": index, "index": index, "params": params, "deployed": deployed, "transport": transport,
+        "recall_at_5": recall, "p50_ms": p95 / 2, "p95_ms": p95, "p99_ms": p95 * 2, "qps": 1000 / p95,
+    }
+
+
+def _write(tmp_path, rows):
+    path = tmp_path / "benchmark_latest.json"
+    path.write_text(json.dumps({"created_at": 0, "corpus_size": 100, "k": 5, "results": rows}))
+    return str(path)
+
+
+def test_routes_on_deployed_configuration_only(tmp_path):
+    path = _write(tmp_path, [
+        _row("pdf_hnsw_index", {"m": 16, "ef_search": 100}, 0.95, 9.0, True),
+        _row("pdf_hnsw_index", {"m": 8, "ef_search": 16}, 0.92, 1.0, False),   # swept, not deployed
+        _row("pdf_ivf_index", {"nlist": 100, "nprobe": 10}, 0.93, 4.0, True, "in_process"),
+        _row("pdf_flat_index", {"ef_search": 512}, 1.0, 12.0, True),
+    ])
+
+    results = metrics_analysis.load_benchmark_results(path, recall_floor=0.9)
+    assert results["pdf_hnsw_index"]["params"] == {"m": 16, "ef_search": 100}
+    assert results["pdf_hnsw_index"]["tuned_params"] == {"m": 8, "ef_search": 16}
+    assert results["pdf_ivf_index"]["transport"] == "in_process"
+    assert metrics_analysis.get_best_index("hybrid") == "pdf_ivf_index"
+    assert metrics_analysis.get_best_index("score") == "pdf_flat_index"
+
+
+def test_index_without_deployed_rows_is_not_routed(tmp_path):
+    path = _write(tmp_path, [
+        _row("pdf_hnsw_index", {"m": 16, "ef_search": 100}, 0.95, 9.0, True),
+        _row("pdf_ivf_index", {"nlist": 16, "nprobe": 32}, 0.99, 1.0, False, "in_process"),
+    ])
+    assert set(metrics_analysis.load_benchmark_results(path)) == {"pdf_hnsw_index"}
+
+
+def test_variant_rows_never_stand_in_for_the_live_index(tmp_path):
+    path = _write(tmp_path, [
+        _row("pdf_hnsw_index", {"m": 16, "ef_search": 100}, 0.95, 9.0, True),
+        _row("pdf_hnsw_index:fp16", {"m": 16, "ef_search": 100, "encoder": "sq_fp16"}, 0.95, 2.0, False),
+        _row("pdf_ivf_index", {"nlist": 100, "nprobe": 10}, 0.91, 6.0, True, "in_process"),
+        _row("pdf_ivf_index:sq8", {"factory": "SQ8", "rescore_factor": 4}, 0.99, 1.0, False, "in_process"),
+    ])
+    results = metrics_analysis.load_benchmark_results(path, recall_floor=0.9)
+    assert set(results) == {"pdf_hnsw_index", "pdf_ivf_index"}
+    assert results["pdf_hnsw_index"]["p95_ms"] == 9.0
+    assert metrics_analysis.get_best_index("hybrid") == "pdf_ivf_index"
+
+
+def test_results_without_deployed_flags_are_rejected(tmp_path):
+    rows = [_row("pdf_hnsw_index", {"m": 16}, 0.95, 9.0, True)]
+    del rows[0]["deployed"]
+    with pytest.raises(ValueError):
+        metrics_analysis.load_benchmark_results(_write(tmp_path, rows))
@@ -0,0 +1,61 @@
+# tests/test_parallel_extraction.py
+import fitz
+import pytest
+
+import extract_tables
+import parallel_extraction
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    doc = fitz.open()
+    for i in range(3):
+        doc.new_page().insert_text((72, 72), f"Quarterly report page {i}")
+    path = str(tmp_path / "report.pdf")
+    doc.save(path)
+    return path
+
+
+def test_cache_keys_follow_table_settings(pdf_path, monkeypatch):
+    baseline = parallel_extraction.page_fingerprints(pdf_path)
+    assert len(set(baseline)) == 3
+
+    monkeypatch.setattr(extract_tables, "TABLE_BACKEND", "pymupdf")
+    by_backend = parallel_extraction.page_fingerprints(pdf_path)
+    monkeypatch.setattr(extract_tables, "PRECLASSIFY", not extract_tables.PRECLASSIFY)
+    by_preclassify = parallel_extraction.page_fingerprints(pdf_path)
+
+    assert not set(baseline) & set(by_backend)
+    assert not set(by_backend) & set(by_preclassify)
+
+
+def test_extraction_reads_table_settings_at_call_time(pdf_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(extract_tables, "PRECLASSIFY", False)
+    monkeypatch.setattr(extract_tables, "TABLE_BACKEND", "pymupdf")
+    monkeypatch.setattr(parallel_extraction, "extract_page_tables",
+                        lambda view, backend, preclassify: calls.append(backend) or [])
+
+    chunks = parallel_extraction.extract_all_chunks(pdf_path, max_workers=1, use_cache=False)
+    assert calls == ["pymupdf"] * 3
+    assert [chunk.page for chunk in chunks if chunk.type == "text"] == [1, 2, 3]
+
+
+def test_ocr_stats_are_reported_per_call(pdf_path):
+    first, second = {}, {}
+    parallel_extraction.extract_all_chunks(pdf_path, max_workers=1, use_cache=False, ocr_stats=first)
+    parallel_extraction.extract_all_chunks(pdf_path, max_workers=1, use_cache=False, pages=[2], ocr_stats=second)
+    assert first["images_seen"] == second["images_seen"] == 0
+    assert set(first) == set(second) and "ocr_sec" in first
+
+
+def test_process_pool_yields_pages_in_order(tmp_path, monkeypatch):
+    doc = fitz.open()
+    for i in range(7):
+        doc.new_page().insert_text((72, 72), f"Section {i}")
+    path = str(tmp_path / "long.pdf")
+    doc.save(path)
+    monkeypatch.setattr(parallel_extraction, "SHARDS_IN_FLIGHT", 1)
+
+    chunks = list(parallel_extraction.iter_pdf_chunks(path, max_workers=2, pages_per_shard=1, use_cache=False))
+    assert [chunk.content for chunk in chunks if chunk.type == "text"] == [f"Section {i}" for i in range(7)]
@@ -0,0 +1,55 @@
+# tests/test_retriever_pipeline.py
+import pytest
+
+import retriever_pipeline
+from retriever_pipeline import fuse_hits
+
+
+def _hits(*pairs):
+    return [{"_id": doc_id, "_score": score} for doc_id, score in pairs]
+
+
+def test_weighted_single_hit_list_counts_fully():
+    fused = fuse_hits({"bm25": _hits(("a", 7.2)), "knn": _hits(("b", 0.9), ("c", 0.4))},
+                      method="weighted", weights={"bm25": 0.5, "knn": 0.5})
+    scores = {hit["_id"]: score for hit, score, _ in fused}
+    assert scores == {"a": 0.5, "b": 0.5, "c": 0.0}
+
+
+def test_weighted_tied_scores_are_not_zeroed():
+    fused = fuse_hits({"knn": _hits(("a", 0.8), ("b", 0.8))}, method="weighted", weights={"knn": 1.0})
+    assert [score for _, score, _ in fused] == [1.0, 1.0]
+
+
+def test_rrf_rewards_agreement():
+    fused = fuse_hits({"bm25": _hits(("a", 9.0), ("b", 5.0)), "knn": _hits(("b", 0.9), ("c", 0.8))},
+                      method="rrf", weights={"bm25": 1.0, "knn": 1.0})
+    assert fused[0][0]["_id"] == "b"
+    assert fused[0][2] == {"bm25": 5.0, "knn": 0.9}
+
+
+def test_unbuilt_local_index_is_skipped(monkeypatch, capsys):
+    def missing(name):
+        raise FileNotFoundError(f"⚠️ FAISS index not found for {name}.")
+
+    monkeypatch.setattr(retriever_pipeline, "get_faiss_retriever", missing)
+    monkeypatch.setattr(retriever_pipeline, "_missing_local", set())
+    name = retriever_pipeline.FAISS_INDEX_NAME
+
+    assert retriever_pipeline.retrieve_top_k([0.1, 0.2], index_names=[name]) == {name: []}
+    assert retriever_pipeline.retrieve_top_k_batch([[0.1, 0.2]], index_names=[name]) == [{name: []}]
+    assert capsys.readouterr().out.count("Skipping") == 1
+
+
+def test_run_sync_refuses_to_block_its_own_loop():
+    from opensearch_connector import run_sync
+
+    async def outer():
+        async def inner():
+            return 1
+        with pytest.raises(RuntimeError):
+            run_sync(inner())
+        return "ok"
+
+    assert run_sync(outer()) == "ok"
+    assert run_sync(outer()) == "ok"  # the loop is still usable afterwards